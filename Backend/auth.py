@@ -0,0 +1,37 @@
+"""Access checks for the routes only the scraper or an operator may call."""
+import hmac
+import os
+from typing import Optional
+
+from fastapi import Header, HTTPException, Request
+
+# Shared secret writers (the scraper) send as X-Notify-Token. When unset, only clients on
+# the loopback interface may publish or signal changes: set it whenever the API runs behind a proxy.
+NOTIFY_TOKEN = os.getenv("NOTIFY_TOKEN", "")
+
+# Shared secret operators send as X-Admin-Token to switch model versions or profiling;
+# those routes answer 403 while it is unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+LOOPBACK_HOSTS = {"127.0.0.1", "::1"}
+
+
+def token_matches(sent, expected):
+    return bool(sent) and hmac.compare_digest(sent.encode("utf-8"), expected.encode("utf-8"))
+
+
+async def require_writer(request: Request, x_notify_token: Optional[str] = Header(None)):
+    """Dependency of the event routes: the writer token, or a local client when no token is configured."""
+    if NOTIFY_TOKEN:
+        if not token_matches(x_notify_token, NOTIFY_TOKEN):
+            raise HTTPException(status_code=401, detail="Missing or invalid X-Notify-Token")
+    elif request.client is None or request.client.host not in LOOPBACK_HOSTS:
+        raise HTTPException(status_code=403, detail="Only local writers may publish unless NOTIFY_TOKEN is set")
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Dependency of the operator routes: the admin token, which must be configured."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Operator routes are disabled unless ADMIN_TOKEN is set")
+    if not token_matches(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Missing or invalid X-Admin-Token")
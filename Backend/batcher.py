@@ -0,0 +1,159 @@
+import asyncio
+import time
+from collections import deque
+
+
+class InferenceBatcher:
+    """
+    Collects concurrent scoring requests and runs them through the model as one batch.
+
+    A batch is flushed as soon as it holds `max_batch_size` texts or the oldest
+    text has waited `max_wait_ms`, whichever comes first. Up to `max_concurrent_batches`
+    batches are scored at once, which only helps when score_fn runs outside the GIL
+    (e.g. in an inference process pool).
+    """
+
+    def __init__(self, score_fn, max_batch_size=64, max_wait_ms=5.0, latency_window=2048, max_concurrent_batches=1):
+        # score_fn takes a list of texts and returns (one toxicity probability per text,
+        # version of the model that produced them)
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_concurrent_batches = max_concurrent_batches
+        self.queue = None
+        self._worker = None
+        # Scoring task -> the batch it is scoring
+        self._in_flight = {}
+        # Requests taken off the queue by the batch being collected
+        self._collecting = []
+
+        # Metrics
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.batch_sizes = deque(maxlen=latency_window)
+        self.queue_latencies = deque(maxlen=latency_window)
+        self.predict_latencies = deque(maxlen=latency_window)
+
+    def start(self):
+        """Start the background task that drains the queue."""
+        if self._worker is None or self._worker.done():
+            self.queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task, failing every request still queued, being collected or being scored."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        pending = list(self._collecting)
+        self._collecting = []
+        in_flight = dict(self._in_flight)
+        for task, batch in in_flight.items():
+            task.cancel()
+            pending.extend(batch)
+        await asyncio.gather(*in_flight, return_exceptions=True)
+        while self.queue is not None and not self.queue.empty():
+            pending.append(self.queue.get_nowait())
+        for _, future, _ in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Inference batcher stopped"))
+
+    async def predict(self, text):
+        """Queue one text and wait for (its toxicity probability, the model version that scored it)."""
+        if self._worker is None:
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((text, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        """Wait for the first request, then gather more until the batch is full or the wait expires."""
+        batch = self._collecting = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        self._collecting = []
+        return batch
+
+    async def _run(self):
+        slots = asyncio.Semaphore(self.max_concurrent_batches)
+        while True:
+            await slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                slots.release()
+                raise
+            task = asyncio.create_task(self._score(batch))
+            self._in_flight[task] = batch
+            task.add_done_callback(lambda done: self._in_flight.pop(done, None))
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _score(self, batch):
+        started = time.perf_counter()
+        for _, _, enqueued in batch:
+            self.queue_latencies.append(started - enqueued)
+
+        texts = [text for text, _, _ in batch]
+        try:
+            scores, model_version = await asyncio.to_thread(self.score_fn, texts)
+        except Exception as e:
+            self.errors += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.items += len(batch)
+        self.batch_sizes.append(len(batch))
+        self.predict_latencies.append(time.perf_counter() - started)
+        for (_, future, _), score in zip(batch, scores):
+            if not future.done():
+                future.set_result((float(score), model_version))
+
+    def stats(self):
+        """Return batch fill and latency figures over the recent window."""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "in_flight": len(self._in_flight),
+            "batches": self.batches,
+            "items": self.items,
+            "errors": self.errors,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "avg_batch_size": _mean(self.batch_sizes),
+            "avg_batch_fill": _mean(self.batch_sizes) / self.max_batch_size,
+            "queue_latency_ms": _percentiles(self.queue_latencies),
+            "predict_latency_ms": _percentiles(self.predict_latencies),
+        }
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+
+def _percentiles(values):
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(values)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": ordered[-1] * 1000}
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import logging
+import time
+
+from .metrics import WS_SEND_SECONDS
+
+# What to do with a message for a client whose outbound queue is full
+DROP_OLDEST = "drop_oldest"   # coalesce: discard the oldest pending message
+DROP_NEWEST = "drop_newest"   # discard the new message
+DISCONNECT = "disconnect"     # close the slow client
+SLOW_CLIENT_POLICIES = (DROP_OLDEST, DROP_NEWEST, DISCONNECT)
+
+logger = logging.getLogger(__name__)
+
+
+class ClientConnection:
+    """One WebSocket client with its own bounded outbound queue and writer task."""
+
+    def __init__(self, websocket, queue_size):
+        self.websocket = websocket
+        self.queue = asyncio.Queue(queue_size)
+        self.writer = None
+        self.dropped = 0
+        self.sent = 0
+        self.last_send = time.monotonic()
+        # Enqueue time of the oldest message not sent yet, None while there is none
+        self.oldest_pending = None
+
+    def send(self, message):
+        """Queue a text message without waiting; returns False when the queue is full."""
+        try:
+            self.queue.put_nowait((time.monotonic(), message))
+            return True
+        except asyncio.QueueFull:
+            return False
+
+
+class Broadcaster:
+    """
+    Fans notifications out to every connected WebSocket client.
+
+    Each message is serialized once and put on every client's bounded queue; a
+    writer task per client sends it. A slow or dead client only fills its own
+    queue and is handled according to `policy`, so it never delays the others.
+    """
+
+    def __init__(self, queue_size=100, policy=DROP_OLDEST, send_timeout=5.0, heartbeat_interval=20.0):
+        if policy not in SLOW_CLIENT_POLICIES:
+            raise ValueError(f"Unknown slow client policy: {policy}")
+        self.queue_size = queue_size
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.clients = set()
+        self._heartbeat = None
+
+        self.broadcasts = 0
+        self.dropped = 0
+        self.disconnected_slow = 0
+
+    def start(self):
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(self._check_stalled())
+
+    async def stop(self):
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        for client in list(self.clients):
+            await self.disconnect(client, close=True)
+
+    async def connect(self, websocket):
+        await websocket.accept()
+        client = ClientConnection(websocket, self.queue_size)
+        client.writer = asyncio.create_task(self._write(client))
+        self.clients.add(client)
+        return client
+
+    async def disconnect(self, client, close=False):
+        self.clients.discard(client)
+        if client.writer is not None and client.writer is not asyncio.current_task():
+            client.writer.cancel()
+        if close:
+            try:
+                await client.websocket.close()
+            except Exception:
+                pass
+
+    def broadcast(self, payload):
+        """Serialize `payload` once and queue it for every client."""
+        message = payload if isinstance(payload, str) else json.dumps(payload)
+        self.broadcasts += 1
+        for client in list(self.clients):
+            if client.send(message):
+                continue
+            if self.policy == DROP_OLDEST:
+                client.queue.get_nowait()
+                client.send(message)
+            elif self.policy == DISCONNECT:
+                # Out of the set right away, so later broadcasts do not count it again
+                self.clients.discard(client)
+                self.disconnected_slow += 1
+                asyncio.create_task(self.disconnect(client, close=True))
+                continue
+            client.dropped += 1
+            self.dropped += 1
+
+    async def _write(self, client):
+        try:
+            while True:
+                client.oldest_pending, message = await client.queue.get()
+                with WS_SEND_SECONDS.time():
+                    await asyncio.wait_for(client.websocket.send_text(message), self.send_timeout)
+                client.oldest_pending = None
+                client.sent += 1
+                client.last_send = time.monotonic()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Dead or stuck client: drop it so it stops taking messages
+            logger.warning("event=ws_client_dropped error=%r", e)
+            await self.disconnect(client, close=True)
+
+    async def _check_stalled(self):
+        """Heartbeat: close clients whose writer died or whose oldest pending message has waited too long."""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            now = time.monotonic()
+            for client in list(self.clients):
+                # A live writer holds the oldest message until it is sent
+                oldest = client.oldest_pending
+                stalled = oldest is not None and now - oldest > 2 * self.heartbeat_interval
+                if client.writer.done() or stalled:
+                    await self.disconnect(client, close=True)
+
+    def stats(self):
+        return {
+            "clients": len(self.clients),
+            "policy": self.policy,
+            "broadcasts": self.broadcasts,
+            "dropped": self.dropped,
+            "disconnected_slow": self.disconnected_slow,
+            "queued": sum(client.queue.qsize() for client in self.clients),
+        }
@@ -1,10 +1,77 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, delete, func, or_, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm import aliased
 from . import models
 
-async def get_articles(db: AsyncSession, skip: int = 0, limit: int = 10):
-    result = await db.execute(select(models.Article).offset(skip).limit(limit))
-    return result.scalars().all()
+def to_dict(obj):
+    """Column values of an ORM object."""
+    return {column.name: getattr(obj, column.name) for column in obj.__table__.columns}
+
+def encode_cursor(moment, id):
+    payload = json.dumps([moment.isoformat() if moment else None, id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor."""
+    try:
+        moment, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (datetime.fromisoformat(moment) if moment else None), int(id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def after_cursor(column, id_column, cursor):
+    """Keyset condition for rows after `cursor` in (column DESC, id DESC) order."""
+    moment, id = decode_cursor(cursor)
+    if moment is None:
+        return and_(column.is_(None), id_column < id)
+    return or_(column < moment, and_(column == moment, id_column < id), column.is_(None))
+
+async def get_articles(db: AsyncSession, cursor: str = None, limit: int = 10):
+    """
+    Fetch one page of articles, newest first, using keyset pagination on (scraped_at, id).
+    Returns the articles and the cursor of the next page (None on the last page).
+    """
+    query = select(models.Article).order_by(models.Article.scraped_at.desc(), models.Article.id.desc())
+    if cursor:
+        query = query.where(after_cursor(models.Article.scraped_at, models.Article.id, cursor))
+    result = await db.execute(query.limit(limit + 1))
+    articles = result.scalars().all()
+
+    next_cursor = None
+    if len(articles) > limit:
+        articles = articles[:limit]
+        next_cursor = encode_cursor(articles[-1].scraped_at, articles[-1].id)
+    return articles, next_cursor
+
+async def get_top_comments(db: AsyncSession, article_ids, per_article: int):
+    """
+    Fetch the newest `per_article` comments of every article in one batched query.
+    """
+    if not article_ids or per_article <= 0:
+        return {}
+    rank = func.row_number().over(
+        partition_by=models.Comment.article_id,
+        order_by=(models.Comment.created_at.desc(), models.Comment.id.desc()),
+    ).label("rank")
+    ranked = (
+        select(models.Comment, rank)
+        .where(models.Comment.article_id.in_(article_ids))
+        .subquery()
+    )
+    comment = aliased(models.Comment, ranked)
+    result = await db.execute(
+        select(comment).where(ranked.c.rank <= per_article).order_by(ranked.c.article_id, ranked.c.rank)
+    )
+
+    comments = {id: [] for id in article_ids}
+    for row in result.scalars().all():
+        comments[row.article_id].append(row)
+    return comments
 
 async def create_article(db: AsyncSession, article: models.Article):
     db.add(article)
@@ -12,11 +79,90 @@ async def create_article(db: AsyncSession, article: models.Article):
     await db.refresh(article)
     return article
 
-async def get_comments_article(db: AsyncSession, id:int):
+async def get_comments_article(db: AsyncSession, id:int, cursor: str = None, limit: int = 50):
     """
-    Fetch all comments related to a specific article.
+    Fetch one page of comments of a specific article, newest first, using keyset
+    pagination on (created_at, id). Returns the comments and the next page cursor.
     """
-    result = await db.execute(
-        select(models.Comment).where(models.Comment.article_id == id)
+    query = (
+        select(models.Comment)
+        .where(models.Comment.article_id == id)
+        .order_by(models.Comment.created_at.desc(), models.Comment.id.desc())
     )
+    if cursor:
+        query = query.where(after_cursor(models.Comment.created_at, models.Comment.id, cursor))
+    result = await db.execute(query.limit(limit + 1))
+    comments = result.scalars().all()
+
+    next_cursor = None
+    if len(comments) > limit:
+        comments = comments[:limit]
+        next_cursor = encode_cursor(comments[-1].created_at, comments[-1].id)
+    return comments, next_cursor
+
+async def get_daily_counts(db: AsyncSession, start=None, end=None):
+    """
+    Fetch the daily non-toxic/toxic comment counts, optionally within [start, end].
+    """
+    query = select(models.CommentDailyStats).order_by(models.CommentDailyStats.day)
+    if start is not None:
+        query = query.where(models.CommentDailyStats.day >= start)
+    if end is not None:
+        query = query.where(models.CommentDailyStats.day <= end)
+    result = await db.execute(query)
     return result.scalars().all()
+
+async def has_daily_counts(db: AsyncSession):
+    result = await db.execute(select(models.CommentDailyStats.day).limit(1))
+    return result.first() is not None
+
+async def rebuild_daily_counts(db: AsyncSession):
+    """
+    Recompute the daily rollup from the comments table, e.g. after a rescoring run.
+
+    Days before the oldest comment left (archived or dropped by the retention job)
+    keep their counts.
+    """
+    first = (await db.execute(select(func.min(models.Comment.created_at)))).scalar()
+    if first is None:
+        return
+    await db.execute(delete(models.CommentDailyStats).where(models.CommentDailyStats.day >= first.date()))
+    await db.execute(text(
+        "INSERT INTO comment_daily_stats (day, non_toxic, toxic) "
+        "SELECT DATE(created_at), SUM(CASE WHEN is_toxic THEN 0 ELSE 1 END), SUM(CASE WHEN is_toxic THEN 1 ELSE 0 END) "
+        "FROM comments WHERE created_at >= :first GROUP BY DATE(created_at)"
+    ), {"first": datetime.combine(first.date(), datetime.min.time())})
+    await db.commit()
+
+EXPORT_COLUMNS = ["id", "article_id", "username", "user_id", "comment", "timestamp", "created_at", "is_toxic", "model_version"]
+
+async def stream_comments(session_factory, article_id=None, start=None, end=None, is_toxic=None, batch_size=1000):
+    """
+    Stream comments matching the filters in batches of rows, through a server-side cursor.
+
+    The session is opened here rather than taken from a request dependency because the
+    generator keeps running while the response is being sent.
+    """
+    conditions, params = [], {}
+    if article_id is not None:
+        conditions.append("article_id = :article_id")
+        params["article_id"] = article_id
+    if start is not None:
+        conditions.append("created_at >= :start")
+        params["start"] = start
+    if end is not None:
+        conditions.append("created_at < :end")
+        params["end"] = end
+    if is_toxic is not None:
+        conditions.append("is_toxic = :is_toxic")
+        params["is_toxic"] = int(is_toxic)
+
+    query = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM comments"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY id"
+
+    async with session_factory() as db:
+        result = await db.stream(text(query).execution_options(yield_per=batch_size), params)
+        async for rows in result.partitions(batch_size):
+            yield rows
@@ -0,0 +1,270 @@
+"""
+Content fingerprints of scraped comments.
+
+A comment is identified by its article, Vuukle user id, creation time and normalized
+text. comments.fingerprint holds the sha256 of those, and the scraper adds it to
+comment_fingerprints (primary key fingerprint) in the same transaction as the comment,
+so a comment scraped again is never stored twice, even once comments is partitioned
+and its fingerprint index can no longer be unique. The scraper also keeps the
+fingerprints it has seen in memory to skip known comments before scoring them.
+
+Databases created before the column existed are migrated once with
+
+    python -m Backend.dedup migrate --batch-size 5000
+
+which fills in the fingerprints, deletes duplicates (keeping the oldest row of each),
+creates the unique index and fills comment_fingerprints, all in batches. Duplicates are found by walking a
+temporary non-unique index on fingerprint in order, so each batch only reads the
+fingerprints after the previous one.
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from .models import CommentFingerprint
+from .prediction_cache import normalize_text
+
+# Fingerprints the scraper remembers between cycles
+SEEN_COMMENTS_SIZE = int(os.getenv("SEEN_COMMENTS_SIZE", "200000"))
+# Rows per batch of the migration
+DEDUP_BATCH_SIZE = int(os.getenv("DEDUP_BATCH_SIZE", "5000"))
+
+FINGERPRINT_INDEX = "ux_comments_fingerprint"
+# Non-unique index the migration walks duplicates with, dropped once the unique one exists
+FINGERPRINT_SCAN_INDEX = "ix_comments_fingerprint_scan"
+
+logger = logging.getLogger(__name__)
+
+
+def _format_created_at(value):
+    """
+    createAt as the DATETIME column stores it, whether it is the scraped string or the
+    value read back. The column keeps whole seconds and MySQL rounds fractional ones
+    (it does not truncate them), so both are rounded the same way here.
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.strip())
+        except ValueError:
+            return value.strip()
+    if isinstance(value, datetime):
+        value = value.replace(tzinfo=None)
+        if value.microsecond >= 500000:
+            value += timedelta(seconds=1)
+        return value.replace(microsecond=0).isoformat(sep=" ")
+    return "" if value is None else str(value)
+
+
+def comment_fingerprint(article_id, user_id, created_at, comment):
+    """Hex sha256 identifying a comment; `article_id` is the articles.id it is stored under."""
+    text_hash = hashlib.sha256(normalize_text(comment).encode("utf-8")).hexdigest()
+    payload = "\0".join((str(article_id), str(user_id or ""), _format_created_at(created_at), text_hash))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SeenComments:
+    """Bounded LRU set of comment fingerprints already stored."""
+
+    def __init__(self, max_entries=SEEN_COMMENTS_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, fingerprint):
+        if fingerprint in self._entries:
+            self._entries.move_to_end(fingerprint)
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def add_many(self, fingerprints):
+        for fingerprint in fingerprints:
+            self._entries[fingerprint] = None
+            self._entries.move_to_end(fingerprint)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {"size": len(self._entries), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+
+_select_unfingerprinted = text(
+    "SELECT id, article_id, user_id, timestamp, comment FROM comments "
+    "WHERE id > :last_id AND fingerprint IS NULL ORDER BY id LIMIT :limit"
+)
+_select_duplicates = text(
+    "SELECT fingerprint, MIN(id) FROM comments WHERE fingerprint > :after "
+    "GROUP BY fingerprint HAVING COUNT(*) > 1 ORDER BY fingerprint LIMIT :limit"
+)
+_select_fingerprints = text(
+    "SELECT id, fingerprint FROM comments WHERE id > :last_id AND fingerprint IS NOT NULL ORDER BY id LIMIT :limit"
+)
+_select_registered = text(
+    "SELECT fingerprint FROM comment_fingerprints WHERE fingerprint IN :fingerprints"
+).bindparams(bindparam("fingerprints", expanding=True))
+_insert_fingerprint = text("INSERT INTO comment_fingerprints (fingerprint) VALUES (:fingerprint)")
+_delete_duplicates = text(
+    "DELETE FROM comments WHERE fingerprint IN :fingerprints AND id NOT IN :keep"
+).bindparams(bindparam("fingerprints", expanding=True), bindparam("keep", expanding=True))
+
+
+async def ensure_fingerprint_column(engine):
+    async with engine.begin() as conn:
+        columns = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_columns("comments"))
+        if "fingerprint" not in {column["name"] for column in columns}:
+            await conn.execute(text("ALTER TABLE comments ADD COLUMN fingerprint VARCHAR(64)"))
+
+
+async def backfill_fingerprints(session_factory, batch_size=DEDUP_BATCH_SIZE):
+    """Fingerprint the rows that have none, one keyset-paginated batch per transaction."""
+    last_id, updated = 0, 0
+    while True:
+        async with session_factory() as db:
+            rows = (await db.execute(_select_unfingerprinted, {"last_id": last_id, "limit": batch_size})).fetchall()
+            if not rows:
+                return updated
+            await db.execute(
+                text("UPDATE comments SET fingerprint = :fingerprint WHERE id = :id"),
+                [
+                    {"id": id, "fingerprint": comment_fingerprint(article_id, user_id, timestamp, comment)}
+                    for id, article_id, user_id, timestamp, comment in rows
+                ],
+            )
+            await db.commit()
+        last_id = rows[-1][0]
+        updated += len(rows)
+        logger.info("event=dedup_backfill last_id=%s updated=%s", last_id, updated)
+
+
+async def _index_names(conn):
+    indexes = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_indexes("comments"))
+    return {index["name"] for index in indexes}
+
+
+async def create_scan_index(engine):
+    """Index fingerprints (non-unique, duplicates still present) unless the unique index already exists."""
+    async with engine.begin() as conn:
+        if not {FINGERPRINT_INDEX, FINGERPRINT_SCAN_INDEX} & await _index_names(conn):
+            await conn.execute(text(f"CREATE INDEX {FINGERPRINT_SCAN_INDEX} ON comments (fingerprint)"))
+
+
+async def collapse_duplicates(session_factory, batch_size=DEDUP_BATCH_SIZE):
+    """
+    Delete every copy but the oldest of each fingerprint, `batch_size` fingerprints at a
+    time, walking the fingerprints in index order from where the previous batch stopped.
+    """
+    after, deleted = "", 0
+    while True:
+        async with session_factory() as db:
+            groups = (await db.execute(_select_duplicates, {"after": after, "limit": batch_size})).fetchall()
+            if not groups:
+                return deleted
+            result = await db.execute(
+                _delete_duplicates,
+                {"fingerprints": [fingerprint for fingerprint, _ in groups], "keep": [id for _, id in groups]},
+            )
+            await db.commit()
+        after = groups[-1][0]
+        deleted += result.rowcount
+        logger.info("event=dedup_collapse groups=%s deleted=%s", len(groups), deleted)
+
+
+async def create_fingerprint_index(engine):
+    """Add the unique index, then drop the migration's scan index."""
+    async with engine.begin() as conn:
+        names = await _index_names(conn)
+        if FINGERPRINT_INDEX not in names:
+            await conn.execute(text(f"CREATE UNIQUE INDEX {FINGERPRINT_INDEX} ON comments (fingerprint)"))
+        if FINGERPRINT_SCAN_INDEX in names:
+            on_table = " ON comments" if conn.dialect.name == "mysql" else ""
+            await conn.execute(text(f"DROP INDEX {FINGERPRINT_SCAN_INDEX}{on_table}"))
+
+
+async def register_fingerprints(session_factory, batch_size=DEDUP_BATCH_SIZE):
+    """Add the fingerprints of stored comments missing from comment_fingerprints."""
+    last_id, added = 0, 0
+    while True:
+        async with session_factory() as db:
+            rows = (await db.execute(_select_fingerprints, {"last_id": last_id, "limit": batch_size})).fetchall()
+            if not rows:
+                return added
+            fingerprints = {fingerprint for _, fingerprint in rows}
+            registered = {row[0] for row in await db.execute(_select_registered, {"fingerprints": list(fingerprints)})}
+            missing = fingerprints - registered
+            if missing:
+                await db.execute(_insert_fingerprint, [{"fingerprint": fingerprint} for fingerprint in missing])
+                await db.commit()
+        last_id = rows[-1][0]
+        added += len(missing)
+        logger.info("event=dedup_register last_id=%s added=%s", last_id, added)
+
+
+async def duplicates_rejected(engine):
+    """
+    Check that the database itself refuses a second copy of a fingerprint: a probe is
+    inserted twice into comment_fingerprints and everything is rolled back.
+    """
+    probe = {"fingerprint": "duplicate-check"}
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            await conn.execute(_insert_fingerprint, probe)
+            try:
+                await conn.execute(_insert_fingerprint, probe)
+            except IntegrityError:
+                return True
+            return False
+        finally:
+            await transaction.rollback()
+
+
+async def migrate(batch_size=DEDUP_BATCH_SIZE):
+    """
+    Fingerprint existing comments, collapse duplicates, add the unique index and
+    register the fingerprints in comment_fingerprints.
+
+    Safe to re-run. Stop the scraper first: rows it inserts without a fingerprint in
+    the meantime are picked up by a second run.
+    """
+    from .crud import rebuild_daily_counts
+    from .database import async_session, create_tables, engine
+
+    await ensure_fingerprint_column(engine)
+    updated = await backfill_fingerprints(async_session, batch_size)
+    await create_scan_index(engine)
+    deleted = await collapse_duplicates(async_session, batch_size)
+    await create_fingerprint_index(engine)
+    await create_tables([CommentFingerprint.__table__])
+    registered = await register_fingerprints(async_session, batch_size)
+    if deleted:
+        # The rollup counted every copy
+        async with async_session() as db:
+            await rebuild_daily_counts(db)
+    return {"fingerprinted": updated, "deleted": deleted, "registered": registered}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("migrate", help="fingerprint comments and collapse duplicates")
+    command.add_argument("--batch-size", type=int, default=DEDUP_BATCH_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s level=%(levelname)s logger=%(name)s %(message)s")
+    print(asyncio.run(migrate(args.batch_size)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import asyncio
+from collections import defaultdict
+
+
+class EventBus:
+    """
+    In-process async pub-sub.
+
+    Every subscriber gets its own bounded queue; when a subscriber falls behind,
+    its oldest pending event is dropped so publishers never block.
+    """
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self._subscribers = defaultdict(set)
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, topic):
+        queue = asyncio.Queue(self.maxsize)
+        self._subscribers[topic].add(queue)
+        return queue
+
+    def unsubscribe(self, topic, queue):
+        self._subscribers[topic].discard(queue)
+
+    def publish(self, topic, event):
+        self.published += 1
+        for queue in self._subscribers[topic]:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+
+    def stats(self):
+        return {
+            "published": self.published,
+            "dropped": self.dropped,
+            "subscribers": {topic: len(queues) for topic, queues in self._subscribers.items()},
+            "queue_depth": {
+                topic: sum(queue.qsize() for queue in queues) for topic, queues in self._subscribers.items()
+            },
+        }
+
+
+bus = EventBus()
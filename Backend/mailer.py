@@ -0,0 +1,247 @@
+import asyncio
+import html
+import logging
+import os
+import random
+import smtplib
+import time
+from datetime import datetime
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+# SMTP server and addresses. Alerts are dropped until MAIL_FROM and MAIL_TO are set;
+# the login is skipped when SMTP_USER / SMTP_PASSWORD are empty (local relays)
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.email")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+MAIL_FROM = os.getenv("MAIL_FROM", "")
+MAIL_TO = os.getenv("MAIL_TO", "")
+
+# Alerts are coalesced into one digest per DIGEST_WINDOW seconds or DIGEST_MAX_COMMENTS
+# comments, whichever comes first; at most OUTBOX_SIZE alerts wait to be sent
+DIGEST_WINDOW = float(os.getenv("DIGEST_WINDOW", "60"))
+DIGEST_MAX_COMMENTS = int(os.getenv("DIGEST_MAX_COMMENTS", "50"))
+OUTBOX_SIZE = int(os.getenv("OUTBOX_SIZE", "1000"))
+SMTP_MAX_RETRIES = int(os.getenv("SMTP_MAX_RETRIES", "5"))
+# Reconnect instead of reusing a connection idle for longer than this (servers drop them)
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", "60"))
+
+logger = logging.getLogger(__name__)
+
+
+class SmtpConnection:
+    """
+    One SMTP session kept open between messages.
+
+    smtplib is blocking, so every method here is meant to run in a worker thread.
+    The session is opened (EHLO, STARTTLS, login) on first use and reopened when the
+    server dropped it or it sat idle too long.
+    """
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, user=SMTP_USER, password=SMTP_PASSWORD,
+                 starttls=SMTP_STARTTLS, idle_timeout=SMTP_IDLE_TIMEOUT, timeout=30):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.smtp = None
+        self.last_used = 0.0
+        self.connects = 0
+
+    def connect(self):
+        self.close()
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            smtp.starttls()
+        if self.user and self.password:
+            smtp.login(self.user, self.password)
+        self.smtp = smtp
+        self.connects += 1
+
+    def send(self, sender, recipients, message):
+        if self.smtp is None or time.monotonic() - self.last_used > self.idle_timeout:
+            self.connect()
+        try:
+            self.smtp.sendmail(sender, recipients, message)
+        except smtplib.SMTPServerDisconnected:
+            # Dropped since the last message: one fresh session, then let the caller retry
+            self.connect()
+            self.smtp.sendmail(sender, recipients, message)
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except Exception:
+                pass
+            self.smtp = None
+
+
+def build_digest(alerts, sender=MAIL_FROM, recipient=MAIL_TO):
+    """One email listing every alert of the digest."""
+    message = MIMEMultipart("alternative")
+    message["From"] = sender
+    message["To"] = recipient
+    if len(alerts) == 1:
+        message["Subject"] = "New Comment Notification"
+    else:
+        message["Subject"] = f"{len(alerts)} New Comment Notifications"
+
+    # One line per alert, base64 encoded: SMTP servers reject lines over 998 characters
+    items = "\n".join(
+        f"<li><p>{html.escape(alert['comment'])}</p>"
+        f"<small>{html.escape(str(alert.get('username') or ''))} {html.escape(str(alert.get('timestamp') or ''))}</small></li>"
+        for alert in alerts
+    )
+    message.attach(MIMEText(f"<html><body><ul>\n{items}\n</ul></body></html>", "html", "utf-8"))
+    return message.as_string()
+
+
+class EmailDispatcher:
+    """
+    Sends comment alerts by email without blocking the event loop.
+
+    notify() drops an alert into a bounded outbox and returns immediately (alerts are
+    dropped when it is full). A single background task turns queued alerts into digest
+    emails and sends them over one persistent SMTP connection, retrying with jittered
+    exponential backoff. Without a sender and a recipient every alert is dropped, with
+    one warning.
+    """
+
+    def __init__(self, connection=None, sender=MAIL_FROM, recipient=MAIL_TO, window=DIGEST_WINDOW,
+                 max_comments=DIGEST_MAX_COMMENTS, outbox_size=OUTBOX_SIZE, max_retries=SMTP_MAX_RETRIES,
+                 backoff_base=1.0, backoff_max=60.0):
+        self.connection = connection or SmtpConnection()
+        self.sender = sender
+        self.recipient = recipient
+        self.window = window
+        self.max_comments = max_comments
+        self.outbox_size = outbox_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.enabled = bool(sender and recipient)
+        self._disabled_logged = False
+        self.outbox = None
+        self._task = None
+        # Alerts taken off the outbox for the digest being collected or sent
+        self._current = []
+
+        self.queued = 0
+        self.dropped = 0
+        self.sent_emails = 0
+        self.sent_alerts = 0
+        self.failed_emails = 0
+        self.failed_alerts = 0
+        self.retries = 0
+        self.last_sent_at = None
+
+    def start(self):
+        if not self.enabled:
+            return
+        if self._task is None or self._task.done():
+            self.outbox = asyncio.Queue(self.outbox_size)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, flush_timeout=10.0):
+        """Send what is still queued (within `flush_timeout`), then close the connection."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        pending, self._current = self._current, []
+        while self.outbox is not None and not self.outbox.empty():
+            pending.append(self.outbox.get_nowait())
+        try:
+            for start in range(0, len(pending), self.max_comments):
+                await asyncio.wait_for(self._send(pending[start:start + self.max_comments]), flush_timeout)
+        except Exception as e:
+            logger.warning("event=email_flush_failed pending=%s error=%r", len(pending), e)
+        await asyncio.to_thread(self.connection.close)
+
+    def notify(self, alert):
+        """Queue an alert ({"comment", "username", "timestamp", ...}); returns False when it was dropped."""
+        if not self.enabled:
+            if not self._disabled_logged:
+                logger.warning("event=email_alerts_disabled reason=\"MAIL_FROM or MAIL_TO is not set\"")
+                self._disabled_logged = True
+            self.dropped += 1
+            return False
+        if self._task is None:
+            self.start()
+        try:
+            self.outbox.put_nowait(alert)
+            self.queued += 1
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    async def _collect(self):
+        """Wait for the first alert, then gather more until the digest is full or the window closes."""
+        alerts = self._current
+        alerts.append(await self.outbox.get())
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.window
+        while len(alerts) < self.max_comments:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                alerts.append(await asyncio.wait_for(self.outbox.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return alerts
+
+    async def _send(self, alerts):
+        message = build_digest(alerts, self.sender, self.recipient)
+        for attempt in range(self.max_retries + 1):
+            try:
+                await asyncio.to_thread(self.connection.send, self.sender, [self.recipient], message)
+                self.sent_emails += 1
+                self.sent_alerts += len(alerts)
+                self.last_sent_at = datetime.now()
+                return True
+            except Exception as e:
+                # 5xx replies are permanent: retrying would be refused the same way
+                permanent = isinstance(e, smtplib.SMTPResponseException) and 500 <= e.smtp_code < 600
+                if permanent or attempt == self.max_retries:
+                    self.failed_emails += 1
+                    self.failed_alerts += len(alerts)
+                    logger.error("event=email_failed alerts=%s error=%r", len(alerts), e)
+                    return False
+                self.retries += 1
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                logger.warning("event=email_retry attempt=%s delay=%.1f error=%r", attempt + 1, delay, e)
+                await asyncio.to_thread(self.connection.close)
+                await asyncio.sleep(delay)
+
+    async def _run(self):
+        while True:
+            alerts = await self._collect()
+            await self._send(alerts)
+            self._current = []
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "queued": self.queued,
+            "pending": self.outbox.qsize() if self.outbox is not None else 0,
+            "dropped": self.dropped,
+            "sent_emails": self.sent_emails,
+            "sent_alerts": self.sent_alerts,
+            "failed_emails": self.failed_emails,
+            "failed_alerts": self.failed_alerts,
+            "retries": self.retries,
+            "connects": self.connection.connects,
+            "last_sent_at": self.last_sent_at,
+        }
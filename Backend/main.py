@@ -1,25 +1,45 @@
-from collections import defaultdict
-from datetime import datetime, timedelta, timezone
-from email.mime.text import MIMEText
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+import csv
+import hashlib
+import io
 import json
-import smtplib
-from typing import List
-from fastapi import FastAPI, Depends, HTTPException, WebSocket, WebSocketDisconnect
-from fastapi.responses import StreamingResponse
+import logging
+import os
+import time
+from typing import List, Optional
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.requests import ClientDisconnect
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-import tensorflow as tf
 import asyncio
-from .database import get_db
-import pandas as pd
-import pickle
-from tensorflow.keras.models import load_model
-from sqlalchemy.future import select
-from .models import Comment, Article
-from .crud import get_articles, get_comments_article
+from .database import async_session, create_indexes, create_tables, engine, get_db
+from .models import Comment, Article, CommentDailyStats
+from .crud import (
+    EXPORT_COLUMNS, get_articles, get_comments_article, get_daily_counts, get_top_comments, has_daily_counts,
+    rebuild_daily_counts, stream_comments, to_dict,
+)
+from .batcher import InferenceBatcher
+from .model_registry import MODEL_WATCH_INTERVAL, registry
+from .events import bus
+from .broadcaster import Broadcaster
+from .rescore import rescorer
+from .mailer import EmailDispatcher
+from .partitions import COMMENTS_MAINTENANCE_INTERVAL, maintain_comments
+from .response_cache import etag_matches, response_cache
+from .auth import require_admin, require_writer
+from . import metrics
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import text  # Import the text function
-from email.mime.multipart import MIMEMultipart
+
+# One line per event, key=value pairs in the message; LOG_LEVEL=DEBUG for more detail
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    format="%(asctime)s level=%(levelname)s logger=%(name)s %(message)s",
+)
+logger = logging.getLogger(__name__)
+
 app = FastAPI()
 
 # CORS settings for Angular frontend
@@ -34,18 +54,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load the pre-trained model
-df = pd.read_csv('../comments_data.csv')
-
-# Load the TF-IDF vectorizer
-with open('../tfidf_vectorizer.pkl', 'rb') as f:
-    loaded_vectorizer = pickle.load(f)
+# Micro-batching settings for the toxicity model
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "64"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
 
-# Load the trained model
-loaded_model = load_model('../toxic_comment_prediction_model.h5')
+# Load the model artifacts in the background at startup instead of at import
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
 
-# In-memory queue for notifications
-notification_queue = asyncio.Queue()
+# Shared batcher: concurrent requests are merged into one transform + predict call
+# With an inference process pool (INFERENCE_WORKERS > 0), keep one batch in flight per worker
+batcher = InferenceBatcher(
+    registry.score_with_version,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS,
+    max_concurrent_batches=registry.pool.workers if registry.pool is not None else 1,
+)
 
 # Define a Pydantic schema for the comment input
 class CommentInput(BaseModel):
@@ -54,210 +77,602 @@ class CommentInput(BaseModel):
 
 
 @app.post("/comments/")
-async def is_it_toxic(comment: CommentInput):
+async def is_it_toxic(comment: CommentInput, response: Response):
     """
     Endpoint to check if a comment is toxic.
     """
-    # Process the comment
-    comments = comment.content
-    processed_comments = loaded_vectorizer.transform([comments])
+    # Repeated texts are answered from the in-memory prediction cache without queueing;
+    # everything that may block (the SQLite cache, hashing artifacts) runs in the batcher's
+    # worker thread. Both paths return the version that produced the score, so a swap
+    # never mislabels a response.
+    cached = registry.active.cached_score(comment.content)
+    if cached is not None:
+        probability, model_version = cached
+    else:
+        probability, model_version = await batcher.predict(comment.content)
+    response.headers["X-Model-Version"] = model_version
+
+    if probability > 0.5:
+        metrics.TOXIC_COMMENTS.inc(source="api")
+    return bool(probability > 0.5)
+
+# Texts scored per internal batch of POST /comments/bulk
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "512"))
+
+def bulk_item(item, index):
+    """(id, text) of one bulk input: {"id", "content"} or a bare string; the id defaults to the position."""
+    if isinstance(item, str):
+        return index, item
+    if isinstance(item, dict) and isinstance(item.get("content"), str):
+        return item.get("id", index), item["content"]
+    raise ValueError('expected a string or an object with a string "content"')
+
+async def ndjson_items(request: Request):
+    """(position, line) of every non-empty line of the request body, as it arrives."""
+    buffer, index = b"", 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield index, line
+                index += 1
+    if buffer.strip():
+        yield index, buffer
+
+class BodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose content is produced while the request body is still being read.
 
-    # Convert sparse matrix to dense array for Keras
-    processed_comments_dense = processed_comments.toarray()
+    StreamingResponse normally listens for a client disconnect by calling receive()
+    alongside the stream, which would swallow body chunks; here the body reader is the
+    only receiver and it raises ClientDisconnect itself.
+    """
 
-    # Make predictions asynchronously
-    predictions = await asyncio.to_thread(loaded_model.predict, processed_comments_dense)
-    predictions = (predictions > 0.5).astype(int)
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+@app.post("/comments/bulk")
+async def score_comments_bulk(request: Request, threshold: float = Query(0.5, ge=0.0, le=1.0),
+                              batch_size: int = Query(BULK_BATCH_SIZE, ge=1, le=10000)):
+    """
+    Endpoint scoring many comments in one request.
+    Accepts a JSON array or an NDJSON body (Content-Type: application/x-ndjson) of {"id", "content"} objects
+    or strings, and streams back one NDJSON line per comment: id, score, label (score > threshold), model_version.
+    A malformed NDJSON line gets {"line", "error"} instead, plus its "id" when it has one.
+    """
+    streaming_body = request.headers.get("content-type", "").startswith(("application/x-ndjson", "application/jsonl"))
+    # While an NDJSON body streams in, its reader is the only receiver and raises
+    # ClientDisconnect itself; receive() may be polled for a disconnect once it is read
+    body_read = not streaming_body
+
+    if streaming_body:
+        async def items():
+            nonlocal body_read
+            async for index, line in ndjson_items(request):
+                item = None
+                try:
+                    item = json.loads(line)
+                    yield (*bulk_item(item, index), None)
+                except ValueError as e:
+                    error = {"line": index, "error": str(e)}
+                    if isinstance(item, dict) and "id" in item:
+                        error["id"] = item["id"]
+                    yield None, None, error
+            body_read = True
+    else:
+        # A JSON array has to be read whole; stream NDJSON to keep memory flat
+        try:
+            payload = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        if not isinstance(payload, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array (or an NDJSON body)")
+        try:
+            parsed = [bulk_item(item, index) for index, item in enumerate(payload)]
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        async def items():
+            for id, text in parsed:
+                yield id, text, None
+
+    async def score(batch):
+        # Read the prediction cache but leave it alone: a bulk job would evict the hot entries
+        scores, model_version = await asyncio.to_thread(
+            registry.score_with_version, [text for _, text in batch], store=False
+        )
+        labels = scores > threshold
+        metrics.TOXIC_COMMENTS.inc(int(labels.sum()), source="bulk")
+        return "".join(
+            json.dumps({"id": id, "score": float(score), "label": bool(label), "model_version": model_version}) + "\n"
+            for (id, _), score, label in zip(batch, scores, labels)
+        )
+
+    async def client_gone():
+        if body_read and await request.is_disconnected():
+            logger.info("event=bulk_client_gone")
+            return True
+        return False
+
+    async def results():
+        batch = []
+        try:
+            async for id, text, error in items():
+                if error is None:
+                    batch.append((id, text))
+                # Flush the lines before an error too, so results follow the input order
+                if batch and (error is not None or len(batch) >= batch_size):
+                    # Stop scoring for a client that has gone
+                    if await client_gone():
+                        return
+                    yield await score(batch)
+                    batch = []
+                if error is not None:
+                    yield json.dumps(error) + "\n"
+            if batch and not await client_gone():
+                yield await score(batch)
+        except ClientDisconnect:
+            logger.info("event=bulk_client_gone")
+
+    response_class = BodyStreamingResponse if streaming_body else StreamingResponse
+    return response_class(results(), media_type="application/x-ndjson")
+
+@app.get("/health")
+async def health():
+    """
+    Liveness endpoint, answers as soon as the app is up.
+    """
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness endpoint, reports whether the model artifacts are loaded.
+    """
+    status = registry.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/inference/stats")
+async def inference_stats():
+    """
+    Endpoint to inspect the inference batcher and the prediction cache.
+    """
+    return {
+        "batcher": batcher.stats(),
+        "cache": registry.cache.stats(),
+        "worker_pool": registry.pool.stats() if registry.pool is not None else None,
+    }
+
+@app.get("/models")
+async def model_versions():
+    """
+    Endpoint listing the model versions, the active one and the shadow comparison.
+    """
+    return registry.versions_status()
+
+@app.post("/models/activate", dependencies=[Depends(require_admin)])
+async def activate_model(version: str, shadow: bool = False):
+    """
+    Endpoint to load a model version, warm it up and switch to it (or run it as the shadow).
+    Needs the admin token.
+    """
+    try:
+        return await registry.activate(version, shadow=shadow)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.delete("/models/shadow", dependencies=[Depends(require_admin)])
+async def stop_shadow_model():
+    """
+    Endpoint to stop comparing against the shadow version; needs the admin token.
+    """
+    registry.stop_shadow()
+    return registry.versions_status()
+
+# WebSocket fan-out: per-client outbound queue size and what to do when it is full
+# (drop_oldest, drop_newest or disconnect)
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "100"))
+WS_SLOW_CLIENT_POLICY = os.getenv("WS_SLOW_CLIENT_POLICY", "drop_oldest")
+broadcaster = Broadcaster(queue_size=WS_QUEUE_SIZE, policy=WS_SLOW_CLIENT_POLICY)
 
-    return bool(predictions)
-active_connections: set[WebSocket] = set()
-timestamp = int(datetime.now(tz=timezone.utc).timestamp() * 1000)
-processed_comments = set() 
 @app.websocket("/ws/notifications/")
 async def websocket_endpoint(websocket: WebSocket):
-    global timestamp
-    await websocket.accept()
-    active_connections.add(websocket)
-    timestamp = int(datetime.now(tz=timezone.utc).timestamp() * 1000)
+    client = await broadcaster.connect(websocket)
 
     try:
         while True:
             data = await websocket.receive_text()  # Keep the connection alive
-            print(f"Received from client: {data}") 
-            await asyncio.sleep(1)
+            if data == "ping":
+                client.send("pong")
+            else:
+                logger.debug("event=ws_message data=%r", data)
     except WebSocketDisconnect:
-        print(f"Client {websocket} disconnected")
-        active_connections.discard(websocket)  # Remove the disconnected client
+        logger.debug("event=ws_disconnect client=%s", websocket.client)
     finally:
-        if not active_connections:
-            processed_comments.clear()  # Clear processed comments if no clients are connected
-            print("All clients disconnected, processed_comments cleared.")
-
+        await broadcaster.disconnect(client)  # Remove the disconnected client
 
+@app.get("/notifications/stats")
+async def notification_stats():
+    """
+    Endpoint to inspect the event bus and the WebSocket fan-out.
+    """
+    return {"bus": bus.stats(), "websockets": broadcaster.stats(), "email": mailer.stats()}
+
+# Metrics: DB statement timings and pool usage, plus gauges read from the components' stats
+metrics.instrument_engine(engine)
+metrics.Gauge("alertini_batcher_queue_depth", "Comments waiting for the inference batcher",
+              fn=lambda: batcher.stats()["queue_depth"])
+metrics.Gauge("alertini_prediction_cache_hit_ratio", "Prediction cache hit ratio",
+              fn=lambda: registry.cache.stats()["hit_ratio"])
+metrics.Gauge("alertini_response_cache_hit_ratio", "Share of cached-route requests answered without a query",
+              fn=lambda: response_cache.stats()["hit_ratio"])
+metrics.Gauge("alertini_notification_queue_depth", "Events waiting on the event bus, by topic", ["topic"],
+              fn=lambda: {(topic,): depth for topic, depth in bus.stats()["queue_depth"].items()})
+metrics.Gauge("alertini_ws_clients", "Connected WebSocket clients", fn=lambda: len(broadcaster.clients))
+metrics.Gauge("alertini_ws_queued_messages", "Messages waiting in WebSocket client queues",
+              fn=lambda: broadcaster.stats()["queued"])
+metrics.Gauge("alertini_ws_dropped_messages", "Messages dropped for slow WebSocket clients",
+              fn=lambda: broadcaster.dropped)
+
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    """ Records the latency of every request, and profiles sampled ones while profiling is on. """
+    start = time.perf_counter()
+    if metrics.profiler.should_profile():
+        with metrics.profiler.profile(f"{request.method} {request.url.path}"):
+            response = await call_next(request)
+    else:
+        response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        route=route.path if route is not None else "unmatched",
+        status=response.status_code,
+    )
+    return response
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """
+    Endpoint exposing every metric in the Prometheus text format.
+    """
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
-# Function to periodically check for new comments
-port = 587
-smtp_server = "smtp.gmail.email"
-login = "maher.khemakhem@etudiant-fst.utm.tn"
-password = "maherfiras"
-sender_email = "maher.khemakhem@etudiant-fst.utm.tn"
-to_email = "khemakhemmaher2003@gmail.com"
+@app.get("/debug/profiling", dependencies=[Depends(require_admin)])
+async def profiling_status():
+    """
+    Endpoint returning the profiling settings and the latest request profiles; needs the admin token.
+    """
+    return metrics.profiler.status()
 
-# Track last processed comment time
-last_processed_comment_time = (datetime.now() - timedelta(days=2)).replace(second=0, microsecond=0)
-print(f"Last processed time (UTC): {last_processed_comment_time}")
- # Store processed comment texts
+@app.post("/debug/profiling", dependencies=[Depends(require_admin)])
+async def configure_profiling(enabled: bool, sample_every: Optional[int] = Query(None, ge=1)):
+    """
+    Endpoint to switch per-request profiling on or off at runtime; needs the admin token.
+    """
+    metrics.profiler.configure(enabled, sample_every)
+    return metrics.profiler.status()
+
+
+
+# Email alerts: toxic comments are sent as digests over a persistent SMTP connection
+# (server, addresses and digest settings are read from the environment, see mailer.py)
+EMAIL_ALERTS = os.getenv("EMAIL_ALERTS", "0") == "1"
+mailer = EmailDispatcher()
+
+# Notifications: writers (the scraper) publish newly inserted toxic comments on the
+# event bus; set NOTIFY_POLL_INTERVAL > 0 to also poll the comments table as a fallback
+TOXIC_COMMENT_TOPIC = "toxic_comment"
+NOTIFY_POLL_INTERVAL = float(os.getenv("NOTIFY_POLL_INTERVAL", "0"))
+# The poll only looks at comments created this recently, so a partitioned table
+# only scans its latest partitions (generous: created_at is the database's clock)
+NOTIFY_POLL_LOOKBACK = timedelta(hours=float(os.getenv("NOTIFY_POLL_LOOKBACK_HOURS", "24")))
+
+# Fingerprints of recently notified comments, so one seen by both the push path and
+# the poll fallback is only sent once; bounded, unlike a set of every comment text
+RECENTLY_NOTIFIED_SIZE = 10000
+recently_notified = OrderedDict()
+
+class CommentEvent(BaseModel):
+    comment: str
+    username: Optional[str] = None
+    user_id: Optional[str] = None
+    article_id: Optional[int] = None
+    timestamp: Optional[str] = None
+    is_toxic: bool = True
+    # dedup.comment_fingerprint of the stored comment
+    fingerprint: Optional[str] = None
 
 @app.get("/send-email")
 async def send_email(contenu: str):
-    """ Sends an email notification. """
-    message = MIMEMultipart("alternative")
-    message["From"] = sender_email
-    message["To"] = to_email
-    message["Subject"] = "New Comment Notification"
-
-    html = f"""
-        <html>
-        <body>
-            <p>{contenu}</p>
-        </body>
-        </html>
-    """
-    part = MIMEText(html, "html")
-    message.attach(part)
+    """ Queues an email notification; it goes out with the next digest. """
+    return {"queued": mailer.notify({"comment": contenu})}
+
+@app.post("/events/comments", dependencies=[Depends(require_writer)])
+async def publish_comments(events: List[CommentEvent]):
+    """
+    Endpoint for writers (the scraper) to publish newly inserted comments; needs the writer token.
+    """
+    published = 0
+    for event in events:
+        if event.is_toxic:
+            bus.publish(TOXIC_COMMENT_TOPIC, event.dict())
+            published += 1
+    return {"published": published}
+
+@app.post("/events/data-changed", dependencies=[Depends(require_writer)])
+async def data_changed():
+    """
+    Endpoint for writers (the scraper) to signal a committed batch; cached read responses are dropped.
+    Needs the writer token.
+    """
+    return {"generation": response_cache.bump()}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """
+    Endpoint to inspect the response cache of /articles/ and /comments/{id}.
+    """
+    return response_cache.stats()
 
+async def notify_toxic_comments():
+    """ Broadcasts every toxic comment published on the event bus to the connected clients. """
+    queue = bus.subscribe(TOXIC_COMMENT_TOPIC)
     try:
-        server = smtplib.SMTP(smtp_server, port)
-        server.starttls()  # Secure connection
-        server.login(login, password)
-        server.sendmail(sender_email, to_email, message.as_string())
-        server.quit()
-    except Exception as e:
-        print(f"Error sending email: {e}")
+        while True:
+            comment = await queue.get()
+            # Both paths carry the fingerprint; events without one (load tests) fall back to their fields
+            key = comment.get("fingerprint") or (comment.get("user_id"), str(comment.get("timestamp")),
+                                                 comment["comment"])
+            if key in recently_notified:
+                continue
+            recently_notified[key] = None
+            if len(recently_notified) > RECENTLY_NOTIFIED_SIZE:
+                recently_notified.popitem(last=False)
+
+            # Include the send timestamp in the JSON message.
+            broadcaster.broadcast({
+                "message": f"New comment: {comment['comment']}",
+                "timestamp": int(datetime.now(tz=timezone.utc).timestamp() * 1000)
+            })
+
+            # Send email notification
+            if EMAIL_ALERTS:
+                mailer.notify(comment)
+    finally:
+        bus.unsubscribe(TOXIC_COMMENT_TOPIC, queue)
 
-async def check_new_comments():
-    """ Periodically checks for new comments and sends notifications. """
-    global last_processed_comment_time
-    global timestamp
-    
+async def poll_new_comments():
+    """ Polling fallback: publishes toxic comments inserted past a high-water mark on comments.id. """
+    last_id = None
     while True:
-        #processed_comments.clear()
-        async for db in get_db():  # Fetch database session
-            new_comments = await get_new_comments(last_processed_comment_time, db)
-            print(new_comments)
-            for comment in new_comments:
-                comment_text = comment["comment"]
-                
-                    # Include the timestamp in the JSON message.
-                message = json.dumps({
-                        "message": f"New comment: {comment_text}",
-                        "timestamp": timestamp
-                    })
-                is_toxic = comment["is_toxic"]
-                #print(active_connections)
-                for websocket in list(active_connections):
-                        
-                        if comment_text not in processed_comments and is_toxic:
-                            print(comment_text)
-                            await websocket.send_text(message)
-                            processed_comments.add(comment_text)
-                    
-                            timestamp = int(datetime.now(tz=timezone.utc).timestamp() * 1000)
-
-                    # Send email notification
-                    #await send_email(comment_text)
-
-                    # Send websocket notification
-                    
-                    
-
-            # Update the timestamp after processing new comments
-            last_processed_comment_time = (datetime.now() - timedelta(days=2)).replace(second=0, microsecond=0)
-
-
-        await asyncio.sleep(10)  # Poll every 50 seconds
-        # Fetch new comments from the database
-
-async def get_new_comments(last_processed_time: datetime, db: AsyncSession) -> List[dict]:
-    # Your datetime value (this can be dynamically assigned based on your needs)
-    #last_processed_time = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-
-    # Wrap your SQL query with the text function
-    query = text("SELECT comments.id, comments.comment, comments.username, comments.user_id, comments.timestamp, comments.article_id, comments.created_at,comments.is_toxic FROM comments WHERE comments.created_at > :last_processed_time")
-
-    # Execute the query, passing the last_processed_time as a parameter
-    result = await db.execute(query, {'last_processed_time': last_processed_time})
+        try:
+            async for db in get_db():  # Fetch database session
+                if last_id is None:
+                    result = await db.execute(text("SELECT COALESCE(MAX(id), 0) FROM comments"))
+                    last_id = result.scalar()
+                for comment in await get_new_comments(last_id, db):
+                    last_id = max(last_id, comment["id"])
+                    if comment["is_toxic"]:
+                        bus.publish(TOXIC_COMMENT_TOPIC, comment)
+        except Exception as e:
+            logger.error("event=poll_failed error=%r", e)
+
+        await asyncio.sleep(NOTIFY_POLL_INTERVAL)
+
+async def get_new_comments(last_id: int, db: AsyncSession, limit: int = 500) -> List[dict]:
+    # Only rows past the high-water mark, in insertion order
+    query = text("SELECT comments.id, comments.comment, comments.username, comments.user_id, comments.timestamp, comments.article_id, comments.created_at,comments.is_toxic, comments.fingerprint FROM comments WHERE comments.id > :last_id AND comments.created_at >= :since ORDER BY comments.id LIMIT :limit")
+
+    result = await db.execute(query, {'last_id': last_id, 'since': datetime.now() - NOTIFY_POLL_LOOKBACK, 'limit': limit})
 
     # Extract the rows from the result
     comments = result.fetchall()
 
-    # Print comments for debugging
-    print(f"Retrieved {len(comments)} new comments")
-
     # Return the comments in the desired format
-    return [{"comment": comment.comment, "username": comment.username,"is_toxic":comment.is_toxic} for comment in comments]
+    return [
+        {
+            "id": comment.id,
+            "comment": comment.comment,
+            "username": comment.username,
+            "user_id": comment.user_id,
+            "article_id": comment.article_id,
+            "timestamp": str(comment.timestamp),
+            "is_toxic": comment.is_toxic,
+            "fingerprint": comment.fingerprint,
+        }
+        for comment in comments
+    ]
+
+async def init_indexes():
+    """ Adds the indexes declared in models.py that existing tables are missing. """
+    try:
+        await create_indexes([Article.__table__, Comment.__table__])
+    except Exception as e:
+        logger.error("event=create_indexes_failed error=%r", e)
+
+async def init_daily_counts():
+    """ Creates the daily rollup table if needed and fills it from the comments table the first time. """
+    try:
+        await create_tables([CommentDailyStats.__table__])
+        async with async_session() as db:
+            if not await has_daily_counts(db):
+                await rebuild_daily_counts(db)
+    except Exception as e:
+        logger.error("event=daily_counts_init_failed error=%r", e)
 
 @app.on_event("startup")
 async def startup_event():
-    asyncio.create_task(check_new_comments())  # Start background task  it enters in WebSocketDisconnect 
+    batcher.start()
+    broadcaster.start()
+    mailer.start()
+    asyncio.create_task(init_indexes())
+    asyncio.create_task(init_daily_counts())
+    asyncio.create_task(rescorer.resume())
+    if MODEL_WARMUP:
+        asyncio.create_task(registry.warm_up())
+    if MODEL_WATCH_INTERVAL > 0:
+        asyncio.create_task(registry.watch())
+    asyncio.create_task(notify_toxic_comments())
+    if NOTIFY_POLL_INTERVAL > 0:
+        asyncio.create_task(poll_new_comments())
+    if COMMENTS_MAINTENANCE_INTERVAL > 0:
+        asyncio.create_task(maintain_comments())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await batcher.stop()
+    await broadcaster.stop()
+    await mailer.stop()
+    await asyncio.to_thread(registry.close)
+# Page size bounds of the paginated endpoints
+MAX_PAGE_SIZE = 100
+MAX_EMBEDDED_COMMENTS = 20
+
+def cached_response(request: Request, route: str, etag: str, body: bytes, hit: bool):
+    """Answer a cached route: 304 when the client's copy is current, the JSON body otherwise."""
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Cache": "hit" if hit else "miss"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        response_cache.record(route, hit, True, 0)
+        return Response(status_code=304, headers=headers)
+    response_cache.record(route, hit, False, len(body))
+    return Response(body, media_type="application/json", headers=headers)
+
 @app.get("/articles/")
-async def read_articles(skip: int = 0, limit: int = 10, db: AsyncSession = Depends(get_db)):
+async def read_articles(request: Request, cursor: Optional[str] = None, limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+                        comments: int = Query(0, ge=0, le=MAX_EMBEDDED_COMMENTS),
+                        db: AsyncSession = Depends(get_db)):
     """
-    Endpoint to retrieve a list of articles.
+    Endpoint to retrieve a page of articles, newest first.
+    Pass `next_cursor` back as `cursor` for the next page; `comments` embeds the newest N comments of each article.
     """
-    articles = await get_articles(db, skip=skip, limit=limit)
-    return {"articles": articles}
+    async def build():
+        try:
+            articles, next_cursor = await get_articles(db, cursor=cursor, limit=limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        items = [to_dict(article) for article in articles]
+        if comments:
+            top_comments = await get_top_comments(db, [article.id for article in articles], comments)
+            for item in items:
+                item["comments"] = [to_dict(comment) for comment in top_comments[item["id"]]]
+
+        return {"articles": items, "next_cursor": next_cursor}
+
+    # Served from the response cache until the scraper saves its next batch
+    etag, body, hit = await response_cache.get_or_build(("articles", cursor, limit, comments), build)
+    return cached_response(request, "/articles/", etag, body, hit)
 
 @app.get("/comments/{id}")
-async def read_comments(id: int, db: AsyncSession = Depends(get_db)):
+async def read_comments(request: Request, id: int, cursor: Optional[str] = None,
+                        limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE), db: AsyncSession = Depends(get_db)):
+    """
+    Endpoint to retrieve a page of comments for a specific article by its ID, newest first.
     """
-    Endpoint to retrieve comments for a specific article by its ID.
+    async def build():
+        if cursor is None:
+            article = await db.get(Article, id)
+            if not article:
+                raise HTTPException(status_code=404, detail="Article not found")
+
+        try:
+            comments, next_cursor = await get_comments_article(db, id, cursor=cursor, limit=limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        return {"article_id": id, "comments": [to_dict(comment) for comment in comments], "next_cursor": next_cursor}
+
+    etag, body, hit = await response_cache.get_or_build(("comments", id, cursor, limit), build)
+    return cached_response(request, "/comments/{id}", etag, body, hit)
+
+@app.get("/export/comments")
+async def export_comments(format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+                          article_id: Optional[int] = None, start: Optional[date] = None, end: Optional[date] = None,
+                          is_toxic: Optional[bool] = None, batch_size: int = Query(1000, ge=100, le=10000)):
     """
-    article = await db.get(Article, id)
-    if not article:
-        raise HTTPException(status_code=404, detail="Article not found")
-    
-    comments = await get_comments_article(db, id)
-    
-    return {"article_id": id, "comments": comments}
+    Endpoint streaming comments as NDJSON or CSV, optionally filtered by article, date range
+    (start inclusive, end inclusive) or toxicity. Memory use stays flat whatever the table size.
+    """
+    end_exclusive = end + timedelta(days=1) if end else None
+    batches = stream_comments(async_session, article_id, start, end_exclusive, is_toxic, batch_size)
+
+    async def ndjson():
+        async for rows in batches:
+            yield "".join(json.dumps(dict(row._mapping), default=str) + "\n" for row in rows)
+
+    async def csv_lines():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        async for rows in batches:
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    if format == "csv":
+        return StreamingResponse(csv_lines(), media_type="text/csv",
+                                 headers={"Content-Disposition": 'attachment; filename="comments.csv"'})
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+# Responses of /positive-comments are reused for this many seconds; clients revalidate with ETags
+POSITIVE_CACHE_TTL = float(os.getenv("POSITIVE_CACHE_TTL", "5"))
+# Date ranges kept, least recently used evicted first
+POSITIVE_CACHE_SIZE = int(os.getenv("POSITIVE_CACHE_SIZE", "256"))
+positive_cache = OrderedDict()
 
 @app.get("/positive-comments")
-async def positive(db: AsyncSession = Depends(get_db)):
-    query = text("SELECT is_toxic, DATE(created_at) FROM comments")  # Extract only date
-    result = await db.execute(query)
-    comments_data = result.fetchall()
-
-    pos_counts = defaultdict(int)
-    neg_counts = defaultdict(int)
-
-    for is_toxic, date in comments_data:
-        if not is_toxic:
-            pos_counts[date] += 1
-        else:
-            neg_counts[date] += 1
-
-    timestamps = sorted(set(pos_counts.keys()) | set(neg_counts.keys()))  # Merge unique dates
-
-    positive_counts = [pos_counts[date] for date in timestamps]
-    negative_counts = [neg_counts[date] for date in timestamps]
-
-    return {"timestamps": timestamps, "pos": positive_counts, "neg": negative_counts}
+async def positive(request: Request, start: Optional[date] = None, end: Optional[date] = None,
+                   db: AsyncSession = Depends(get_db)):
+    """
+    Endpoint returning the daily non-toxic/toxic comment counts, read from the daily rollup.
+    """
+    key = (start, end)
+    cached = positive_cache.get(key)
+    if cached is None or time.monotonic() - cached[0] > POSITIVE_CACHE_TTL:
+        rows = await get_daily_counts(db, start, end)
+        body = json.dumps({
+            "timestamps": [row.day.isoformat() for row in rows],
+            "pos": [row.non_toxic for row in rows],
+            "neg": [row.toxic for row in rows],
+        }).encode()
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        cached = (time.monotonic(), etag, body)
+        positive_cache[key] = cached
+    positive_cache.move_to_end(key)
+    while len(positive_cache) > POSITIVE_CACHE_SIZE:
+        positive_cache.popitem(last=False)
+
+    _, etag, body = cached
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
 
 
 # WebSocket endpoint to send positive comments data
 
 
-@app.post("/set")
-async def sett(db: AsyncSession = Depends(get_db)):
-    query = text("SELECT id, comment FROM comments")  # Extract only necessary fields
-    result = await db.execute(query)
-    comments_data = result.fetchall()
-
-    for id, comment in comments_data:
-        if await is_it_toxic(CommentInput(content=comment)):
-            update_query = text("UPDATE comments SET is_toxic=1 WHERE id=:id")
-            await db.execute(update_query, {"id": id})
-    
-    await db.commit()  # Commit the changes to the database
+@app.post("/set", status_code=202)
+async def sett():
+    """
+    Starts (or returns the running) background job rescoring every comment with the current model.
+    """
+    return await rescorer.start()
 
+@app.get("/set/status")
+async def sett_status():
+    """
+    Endpoint reporting progress and throughput of the latest rescoring job.
+    """
+    return await rescorer.status()
@@ -0,0 +1,264 @@
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms are plain objects updated under a lock (scoring runs in
+worker threads); render() produces the text served at /metrics. The scraper can expose
+the same registry on its own port with serve().
+"""
+import bisect
+import cProfile
+import io
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Buckets in seconds, from sub-millisecond model calls to slow DB queries
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = []
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = list(self.values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(Metric):
+    """A value set directly, or read from `fn` at scrape time (fn returns a number or a {labels: value} dict)."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames=(), fn=None):
+        super().__init__(name, help, labelnames)
+        self.values = {}
+        self.fn = fn
+
+    def set(self, value, **labels):
+        with self._lock:
+            self.values[self._key(labels)] = value
+
+    def render(self):
+        if self.fn is not None:
+            try:
+                value = self.fn()
+            except Exception:
+                return []
+            items = value.items() if isinstance(value, dict) else [((), value)]
+        else:
+            with self._lock:
+                items = list(self.values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [bucket counts..., sum, count]
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        with self._lock:
+            items = [(k, list(v)) for k, v in self.values.items()]
+        lines = self.header()
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, [("le", "+Inf")])
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Inference
+VECTORIZE_SECONDS = Histogram("alertini_vectorize_seconds", "TF-IDF transform time per batch")
+PREDICT_SECONDS = Histogram(
+    "alertini_predict_seconds", "Model prediction time per batch (the whole round trip with a worker pool)"
+)
+PREDICT_BATCH_SIZE = Histogram(
+    "alertini_predict_batch_size", "Texts per prediction batch", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+)
+
+# Database and notifications
+DB_QUERY_SECONDS = Histogram("alertini_db_query_seconds", "SQL statement execution time", ["statement"])
+WS_SEND_SECONDS = Histogram("alertini_ws_send_seconds", "Time to send one WebSocket message")
+HTTP_REQUEST_SECONDS = Histogram("alertini_http_request_seconds", "HTTP request latency", ["method", "route", "status"])
+
+# Scraper
+SCRAPED_PAGES = Counter("alertini_scraped_pages_total", "Listing pages fetched", ["result"])
+SCRAPED_ARTICLES = Counter("alertini_scraped_articles_total", "Article pages fetched")
+SCRAPED_COMMENTS = Counter("alertini_scraped_comments_total", "New comments saved by the scraper")
+TOXIC_COMMENTS = Counter("alertini_toxic_comments_total", "Comments scored as toxic", ["source"])
+
+
+def instrument_engine(engine):
+    """Time every statement run through a SQLAlchemy (async) engine and expose its pool usage."""
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start"].pop()
+        DB_QUERY_SECONDS.observe(time.perf_counter() - started, statement=statement.lstrip().split(None, 1)[0].upper())
+
+    pool = sync_engine.pool
+    Gauge("alertini_db_pool_size", "Connections kept open by the pool", fn=lambda: pool.size())
+    Gauge("alertini_db_pool_checked_out", "Connections currently in use", fn=lambda: pool.checkedout())
+    Gauge("alertini_db_pool_overflow", "Connections open beyond the pool size", fn=lambda: pool.overflow())
+
+
+class RequestProfiler:
+    """
+    Optional cProfile hook for HTTP requests, switched on at runtime.
+
+    While enabled, one in `sample_every` requests is profiled (one at a time: cProfile
+    cannot nest) and its top functions are kept in a short history.
+    """
+
+    def __init__(self, sample_every=1, history=20, top=25):
+        self.enabled = False
+        self.sample_every = sample_every
+        self.top = top
+        self.profiles = deque(maxlen=history)
+        self._seen = 0
+        self._active = threading.Lock()
+
+    def configure(self, enabled, sample_every=None):
+        self.enabled = enabled
+        if sample_every:
+            self.sample_every = sample_every
+
+    def should_profile(self):
+        if not self.enabled:
+            return False
+        self._seen += 1
+        return self._seen % self.sample_every == 0 and not self._active.locked()
+
+    @contextmanager
+    def profile(self, label):
+        if not self._active.acquire(blocking=False):
+            yield
+            return
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self._active.release()
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(self.top)
+            self.profiles.append({
+                "request": label,
+                "at": time.time(),
+                "seconds": time.perf_counter() - start,
+                "stats": out.getvalue(),
+            })
+
+    def status(self):
+        return {"enabled": self.enabled, "sample_every": self.sample_every, "profiles": list(self.profiles)}
+
+
+profiler = RequestProfiler()
+
+
+async def serve(port, host="0.0.0.0"):
+    """Expose /metrics from a process without FastAPI (the scraper)."""
+    from aiohttp import web
+
+    async def metrics(request):
+        return web.Response(body=render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
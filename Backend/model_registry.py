@@ -0,0 +1,556 @@
+import asyncio
+import hashlib
+import logging
+import os
+import pickle
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from .metrics import PREDICT_BATCH_SIZE, PREDICT_SECONDS, VECTORIZE_SECONDS
+from .prediction_cache import PredictionCache, normalize_text
+from .worker_pool import INFERENCE_WORKERS, InferencePool
+
+# Artifacts live at the repository root next to model.ipynb
+ARTIFACTS_DIR = Path(os.getenv("MODEL_ARTIFACTS_DIR", Path(__file__).resolve().parent.parent))
+VECTORIZER_PATH = ARTIFACTS_DIR / "tfidf_vectorizer.pkl"
+MODEL_PATH = ARTIFACTS_DIR / "toxic_comment_prediction_model.h5"
+
+# Directory written by `python -m Backend.tfidf export-vectorizer`; when it exists it is
+# memory-mapped instead of unpickling tfidf_vectorizer.pkl
+VECTORIZER_ARTIFACT_DIR = Path(os.getenv("VECTORIZER_ARTIFACT_DIR", ARTIFACTS_DIR / "artifacts" / "tfidf"))
+
+# Vectorizer backend: "auto" uses the fast transformer when the artifact exists and the
+# pickled sklearn vectorizer otherwise, "sklearn" always unpickles, "fast" always uses the
+# fast transformer (built from the pickle when no artifact was exported)
+VECTORIZER_BACKEND = os.getenv("VECTORIZER_BACKEND", "auto")
+
+# Scoring backend: "keras" runs the saved model in TensorFlow, "numpy" scores the
+# sparse TF-IDF matrix directly with the extracted weights (no TensorFlow import)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "keras")
+
+# Prediction cache: entries kept in memory, and an optional SQLite file to persist them
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "100000"))
+PREDICTION_CACHE_PATH = os.getenv("PREDICTION_CACHE_PATH")
+
+# Versioned models: one subdirectory per version holding toxic_comment_prediction_model.h5
+# and tfidf_vectorizer.pkl (and/or an exported tfidf/ artifact). The file CURRENT names
+# the version to serve; without it the artifacts at ARTIFACTS_DIR are served.
+MODEL_VERSIONS_DIR = Path(os.getenv("MODEL_VERSIONS_DIR", ARTIFACTS_DIR / "models"))
+# Seconds between checks of CURRENT for a new version (0 disables the watcher)
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "0"))
+# A new version is only switched to if its warm-up batch runs within this many milliseconds
+MODEL_SWAP_MAX_LATENCY_MS = float(os.getenv("MODEL_SWAP_MAX_LATENCY_MS", "1000"))
+MODEL_WARMUP_BATCH = int(os.getenv("MODEL_WARMUP_BATCH", "64"))
+# Seconds the replaced version stays loaded for the requests still using it
+MODEL_RETIRE_DELAY = float(os.getenv("MODEL_RETIRE_DELAY", "30"))
+# Fraction of scored batches also scored by the shadow version, when one is set
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "0.1"))
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Loads the TF-IDF vectorizer and the toxicity model once, on first use or from
+    a background warm-up task, and shares them between the API, the scraper and scripts.
+    """
+
+    def __init__(self, vectorizer_path=VECTORIZER_PATH, model_path=MODEL_PATH, backend=INFERENCE_BACKEND,
+                 cache_size=PREDICTION_CACHE_SIZE, cache_path=PREDICTION_CACHE_PATH,
+                 vectorizer_artifact_dir=VECTORIZER_ARTIFACT_DIR, vectorizer_backend=VECTORIZER_BACKEND,
+                 workers=INFERENCE_WORKERS):
+        self.vectorizer_path = Path(vectorizer_path)
+        self.vectorizer_artifact_dir = Path(vectorizer_artifact_dir)
+        self.vectorizer_backend = vectorizer_backend
+        self.model_path = Path(model_path)
+        self.backend = backend
+        self.cache_size = cache_size
+        self.cache_path = cache_path
+        self._vectorizer = None
+        self._model = None
+        self._model_version = None
+        self._cache = None
+        # With workers > 0, predict_proba runs in a process pool and this process never loads the artifacts
+        self.pool = None
+        if workers > 0:
+            self.pool = InferencePool(workers, {
+                "vectorizer_path": self.vectorizer_path,
+                "model_path": self.model_path,
+                "backend": backend,
+                "vectorizer_artifact_dir": self.vectorizer_artifact_dir,
+                "vectorizer_backend": vectorizer_backend,
+            })
+        self._lock = threading.Lock()
+        # Seconds spent importing/loading each artifact, for startup profiling
+        self.load_times = {}
+        self.error = None
+
+    def _timed(self, name, fn):
+        start = time.perf_counter()
+        result = fn()
+        self.load_times[name] = time.perf_counter() - start
+        return result
+
+    def uses_vectorizer_artifact(self):
+        if self.vectorizer_backend == "sklearn":
+            return False
+        return (self.vectorizer_artifact_dir / "config.json").exists()
+
+    def _load_vectorizer(self):
+        if self.uses_vectorizer_artifact():
+            from .tfidf import TfidfArtifact
+            return TfidfArtifact.load(self.vectorizer_artifact_dir)
+
+        with open(self.vectorizer_path, "rb") as f:
+            vectorizer = pickle.load(f)
+        if self.vectorizer_backend == "fast":
+            from .tfidf import TfidfArtifact
+            return TfidfArtifact.from_vectorizer(vectorizer)
+        return vectorizer
+
+    def _load_model(self):
+        if self.backend == "numpy":
+            from .numpy_scorer import NumpyScorer
+            return NumpyScorer.from_h5(self.model_path)
+
+        load_model = self._timed("tensorflow_import", _import_keras_loader)
+        return load_model(self.model_path)
+
+    @property
+    def vectorizer(self):
+        if self._vectorizer is None:
+            with self._lock:
+                if self._vectorizer is None:
+                    self._vectorizer = self._timed("vectorizer", self._load_vectorizer)
+        return self._vectorizer
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._timed("model", self._load_model)
+        return self._model
+
+    @property
+    def model_version(self):
+        """Short hash of the artifact files; changes whenever the vectorizer or model is replaced."""
+        if self._model_version is None:
+            digest = hashlib.sha256()
+            if self.uses_vectorizer_artifact():
+                vectorizer_files = sorted(self.vectorizer_artifact_dir.iterdir())
+            else:
+                vectorizer_files = [self.vectorizer_path]
+            for path in [*vectorizer_files, self.model_path]:
+                with open(path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b""):
+                        digest.update(chunk)
+            self._model_version = digest.hexdigest()[:16]
+        return self._model_version
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            with self._lock:
+                if self._cache is None:
+                    self._cache = PredictionCache(self.model_version, self.cache_size, self.cache_path)
+        return self._cache
+
+    def cached_score(self, text):
+        """
+        (score, model_version) of `text` from the in-memory cache, or None. Safe on the
+        event loop: it never hashes artifacts or reads the SQLite cache, and returns None
+        until load() has prepared them.
+        """
+        cache = self._cache
+        if cache is None:
+            return None
+        score = cache.get_cached(text)
+        return None if score is None else (score, cache.model_version)
+
+    def is_ready(self):
+        if self.pool is not None:
+            return self.pool.is_ready()
+        return self._vectorizer is not None and self._model is not None
+
+    def load(self):
+        """Load every artifact now and return the time each one took."""
+        # Hash the artifacts and open the prediction cache here, off the event loop
+        self.cache
+        if self.pool is not None:
+            self._timed("worker_pool", self.pool.warm_up)
+            return self.load_times
+        self.vectorizer
+        self.model
+        return self.load_times
+
+    def predict_proba(self, texts):
+        """Vectorize a batch of comments and return the toxicity probability of each one."""
+        PREDICT_BATCH_SIZE.observe(len(texts))
+        if self.pool is not None:
+            with PREDICT_SECONDS.time():
+                return self.pool.predict_proba(texts)
+
+        with VECTORIZE_SECONDS.time():
+            processed_comments = self.vectorizer.transform(texts)
+
+        with PREDICT_SECONDS.time():
+            if self.backend == "numpy":
+                return self.model.predict_proba(processed_comments)
+
+            # Convert sparse matrix to dense array for Keras
+            processed_comments_dense = processed_comments.toarray()
+
+            return self.model.predict(processed_comments_dense, verbose=0)[:, 0]
+
+    def score(self, texts, store=True):
+        """
+        Like predict_proba, but only texts missing from the prediction cache reach the model.
+        With store=False the cache is only read and the new scores are not written back.
+        """
+        scores = self.cache.get_many(texts) if store else self.cache.peek_many(texts)
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            # Score each distinct normalized text once, even if it repeats within the batch
+            normalized = {i: normalize_text(texts[i]) for i in missing}
+            unique = list(dict.fromkeys(normalized.values()))
+            predicted = dict(zip(unique, self.predict_proba(unique)))
+            if store:
+                self.cache.put_many(unique, [predicted[text] for text in unique])
+            for i in missing:
+                scores[i] = predicted[normalized[i]]
+        return np.asarray(scores, dtype=np.float32)
+
+    async def warm_up(self):
+        """Load the artifacts in a worker thread and run one prediction so the first request is not cold."""
+        try:
+            await asyncio.to_thread(self.load)
+            await asyncio.to_thread(self._timed, "warm_up_predict", lambda: self.predict_proba(["warm up"]))
+        except Exception as e:
+            self.error = str(e)
+            logger.error("event=model_load_failed error=%r", e)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.stop()
+
+    def status(self):
+        return {
+            "ready": self.is_ready(),
+            "backend": self.backend,
+            "vectorizer": "artifact" if self.uses_vectorizer_artifact() else "pickle",
+            "vectorizer_backend": self.vectorizer_backend,
+            "vectorizer_loaded": self._vectorizer is not None,
+            "model_loaded": self._model is not None,
+            "model_version": self._model_version,
+            "load_times": self.load_times,
+            "error": self.error,
+            "worker_pool": self.pool.stats() if self.pool is not None else None,
+        }
+
+
+def _import_keras_loader():
+    from tensorflow.keras.models import load_model
+    return load_model
+
+
+def version_registry(name, versions_dir=MODEL_VERSIONS_DIR, **kwargs):
+    """A ModelRegistry over the artifacts of version `name`."""
+    path = Path(versions_dir) / name
+    if not name or path.parent != Path(versions_dir) or not (path / MODEL_PATH.name).exists():
+        raise ValueError(f"Unknown model version: {name}")
+    return ModelRegistry(
+        vectorizer_path=path / VECTORIZER_PATH.name,
+        model_path=path / MODEL_PATH.name,
+        vectorizer_artifact_dir=path / "tfidf",
+        **kwargs,
+    )
+
+
+def current_version(versions_dir=MODEL_VERSIONS_DIR):
+    """The version named in CURRENT, or None to serve the root artifacts."""
+    try:
+        return (Path(versions_dir) / "CURRENT").read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+
+class ModelRouter:
+    """
+    The registry used by the app: scores with the active model version and swaps
+    versions without a restart.
+
+    activate() loads a version and runs a warm-up batch in a worker thread, rejects it
+    if the batch is too slow, then replaces `active` in one assignment: each call reads
+    `active` once, so a batch in flight finishes on the version it started with. The
+    replaced version is closed after MODEL_RETIRE_DELAY seconds.
+
+    A version can instead be loaded as the shadow: a sample of scored batches is scored
+    again by both versions in a background thread, to compare latency and labels.
+    """
+
+    def __init__(self, active, name=None, versions_dir=MODEL_VERSIONS_DIR, max_latency_ms=MODEL_SWAP_MAX_LATENCY_MS,
+                 warmup_batch=MODEL_WARMUP_BATCH, shadow_sample_rate=SHADOW_SAMPLE_RATE):
+        self.active = active
+        self.name = name
+        self.versions_dir = Path(versions_dir)
+        self.max_latency_ms = max_latency_ms
+        self.warmup_batch = warmup_batch
+        self.shadow = None
+        self.shadow_name = None
+        self.shadow_sample_rate = shadow_sample_rate
+        self.loading = None
+        self.swaps = 0
+        self.history = deque(maxlen=20)
+        self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        self._shadow_busy = False
+        self._reset_shadow_stats()
+
+    # The active version's attributes, read by the batcher, cache lookups and status pages
+    @property
+    def cache(self):
+        return self.active.cache
+
+    @property
+    def pool(self):
+        return self.active.pool
+
+    @property
+    def model_version(self):
+        return self.active.model_version
+
+    def is_ready(self):
+        return self.active.is_ready()
+
+    def load(self):
+        return self.active.load()
+
+    async def warm_up(self):
+        await self.active.warm_up()
+
+    def predict_proba(self, texts):
+        return self.active.predict_proba(texts)
+
+    def score(self, texts):
+        return self.score_with_version(texts)[0]
+
+    def score_with_version(self, texts, store=True):
+        """Scores and the model_version of the version that produced them."""
+        model = self.active
+        scores = model.score(texts, store=store)
+        if self.shadow is not None and texts and random.random() < self.shadow_sample_rate:
+            self._submit_shadow(model, self.shadow, list(texts))
+        return scores, model.model_version
+
+    def versions(self):
+        if not self.versions_dir.is_dir():
+            return []
+        return sorted(path.name for path in self.versions_dir.iterdir() if (path / MODEL_PATH.name).exists())
+
+    def _prepare(self, candidate):
+        """Load a candidate and time a warm-up batch; returns its latency in milliseconds."""
+        candidate.load()
+        texts = [f"warm up comment {i} for the new model" for i in range(self.warmup_batch)]
+        candidate.predict_proba(texts[:1])
+        start = time.perf_counter()
+        scores = np.asarray(candidate.predict_proba(texts))
+        latency_ms = (time.perf_counter() - start) * 1000
+        if scores.shape != (len(texts),) or not np.all((scores >= 0) & (scores <= 1)):
+            raise ValueError("Warm-up batch returned invalid scores")
+        if latency_ms > self.max_latency_ms:
+            raise ValueError(
+                f"Warm-up batch of {len(texts)} took {latency_ms:.0f} ms (limit {self.max_latency_ms:.0f} ms)"
+            )
+        candidate.model_version  # hash the files now rather than on the first request
+        return latency_ms
+
+    async def activate(self, name, shadow=False):
+        """Load version `name` in the background, check it, then serve it (or shadow it)."""
+        if self.loading is not None:
+            raise RuntimeError(f"Version {self.loading} is still loading")
+        self.loading = name
+        candidate = None
+        try:
+            candidate = version_registry(name, self.versions_dir, workers=self.active.pool.workers if self.active.pool else 0)
+            latency_ms = await asyncio.to_thread(self._prepare, candidate)
+        except Exception as e:
+            logger.error("event=model_activation_failed version=%s error=%r", name, e)
+            if candidate is not None:
+                await asyncio.to_thread(candidate.close)
+            raise
+        finally:
+            self.loading = None
+
+        if shadow:
+            previous, self.shadow, self.shadow_name = self.shadow, candidate, name
+            self._reset_shadow_stats()
+        else:
+            previous, self.active, self.name = self.active, candidate, name
+            self.swaps += 1
+            if self.shadow_name == name:
+                previous_shadow, self.shadow, self.shadow_name = self.shadow, None, None
+                self._retire(previous_shadow)
+        self.history.append({
+            "version": name,
+            "model_version": candidate.model_version,
+            "role": "shadow" if shadow else "active",
+            "warm_up_ms": latency_ms,
+            "at": datetime.now(),
+        })
+        logger.info("event=model_activated version=%s model_version=%s role=%s warm_up_ms=%.1f",
+                    name, candidate.model_version, "shadow" if shadow else "active", latency_ms)
+        self._retire(previous)
+        return self.status()
+
+    def stop_shadow(self):
+        previous, self.shadow, self.shadow_name = self.shadow, None, None
+        self._retire(previous)
+
+    def _retire(self, model):
+        """Close a replaced version once the requests that picked it up are done."""
+        if model is None:
+            return
+
+        async def close_later():
+            await asyncio.sleep(MODEL_RETIRE_DELAY)
+            await asyncio.to_thread(model.close)
+
+        try:
+            asyncio.get_running_loop().create_task(close_later())
+        except RuntimeError:
+            model.close()
+
+    async def watch(self, interval=MODEL_WATCH_INTERVAL):
+        """Activate the version named in CURRENT whenever it changes."""
+        failed = None
+        while True:
+            name = current_version(self.versions_dir)
+            if name and name != self.name and name != failed and self.loading is None:
+                try:
+                    await self.activate(name)
+                    failed = None
+                except Exception:
+                    # Retried once CURRENT names another version
+                    failed = name
+            await asyncio.sleep(interval)
+
+    def _reset_shadow_stats(self):
+        self.shadow_batches = 0
+        self.shadow_items = 0
+        self.shadow_skipped = 0
+        self.shadow_agreements = 0
+        self.shadow_abs_diff = 0.0
+        self.shadow_errors = 0
+        self.shadow_latencies = {"active": deque(maxlen=1024), "shadow": deque(maxlen=1024)}
+
+    def _submit_shadow(self, active, shadow, texts):
+        # One comparison at a time: sampled batches are skipped while the thread is busy
+        if self._shadow_busy:
+            self.shadow_skipped += 1
+            return
+        self._shadow_busy = True
+        self._shadow_executor.submit(self._compare, active, shadow, texts)
+
+    def _compare(self, active, shadow, texts):
+        try:
+            start = time.perf_counter()
+            active_scores = np.asarray(active.predict_proba(texts))
+            middle = time.perf_counter()
+            shadow_scores = np.asarray(shadow.predict_proba(texts))
+            end = time.perf_counter()
+            if shadow is not self.shadow:
+                return
+            self.shadow_latencies["active"].append((middle - start) * 1000)
+            self.shadow_latencies["shadow"].append((end - middle) * 1000)
+            self.shadow_batches += 1
+            self.shadow_items += len(texts)
+            self.shadow_agreements += int(np.sum((active_scores > 0.5) == (shadow_scores > 0.5)))
+            self.shadow_abs_diff += float(np.sum(np.abs(active_scores - shadow_scores)))
+        except Exception as e:
+            self.shadow_errors += 1
+            logger.warning("event=shadow_score_failed version=%s error=%r", self.shadow_name, e)
+        finally:
+            self._shadow_busy = False
+
+    def shadow_stats(self):
+        if self.shadow is None:
+            return None
+        latencies = {role: list(values) for role, values in self.shadow_latencies.items()}
+        summary = {
+            role: {"p50_ms": _percentile(values, 0.5), "p95_ms": _percentile(values, 0.95)}
+            for role, values in latencies.items()
+        }
+        mean = {role: sum(values) / len(values) if values else None for role, values in latencies.items()}
+        return {
+            "version": self.shadow_name,
+            "model_version": self.shadow.model_version,
+            "sample_rate": self.shadow_sample_rate,
+            "batches": self.shadow_batches,
+            "items": self.shadow_items,
+            "skipped": self.shadow_skipped,
+            "errors": self.shadow_errors,
+            "latency": summary,
+            "mean_latency_diff_ms": mean["shadow"] - mean["active"] if latencies["active"] else None,
+            "label_agreement": self.shadow_agreements / self.shadow_items if self.shadow_items else None,
+            "mean_abs_score_diff": self.shadow_abs_diff / self.shadow_items if self.shadow_items else None,
+        }
+
+    def close(self):
+        self.active.close()
+        if self.shadow is not None:
+            self.shadow.close()
+        self._shadow_executor.shutdown(wait=False, cancel_futures=True)
+
+    def status(self):
+        return {
+            **self.active.status(),
+            "version": self.name,
+            "loading": self.loading,
+            "swaps": self.swaps,
+            "shadow": self.shadow_stats(),
+        }
+
+    def versions_status(self):
+        return {
+            "versions_dir": str(self.versions_dir),
+            "versions": self.versions(),
+            "current_file": current_version(self.versions_dir),
+            "active": self.name,
+            "model_version": self.active._model_version,
+            "loading": self.loading,
+            "history": list(self.history),
+            "shadow": self.shadow_stats(),
+        }
+
+
+def _initial_registry():
+    name = current_version()
+    if name is not None:
+        try:
+            return ModelRouter(version_registry(name), name=name)
+        except ValueError as e:
+            logger.error("event=model_version_unavailable version=%s error=%r", name, e)
+    return ModelRouter(ModelRegistry())
+
+
+registry = _initial_registry()
+
+
+if __name__ == "__main__":
+    # Report how long each artifact takes to import/load: python -m Backend.model_registry
+    registry.load()
+    registry.predict_proba(["warm up"])
+    for name, seconds in registry.status()["load_times"].items():
+        print(f"{name:<20} {seconds * 1000:8.1f} ms")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, Text, DateTime, Date, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -12,6 +12,11 @@ class Article(Base):
 
     comments = relationship("Comment", back_populates="article")
 
+    __table_args__ = (
+        # Keyset pagination of /articles/
+        Index("ix_articles_scraped_at_id", "scraped_at", "id"),
+    )
+
 
 class Comment(Base):
     __tablename__ = "comments"
@@ -22,4 +27,70 @@ class Comment(Base):
     timestamp = Column(DateTime)
     article_id = Column(Integer, ForeignKey("articles.id"))
     created_at = Column(DateTime)
+    is_toxic = Column(Boolean)
+    # Version of the model that produced is_toxic (see model_registry)
+    model_version = Column(String(32))
+    # sha256 of article, user, createAt and normalized text (see dedup.comment_fingerprint)
+    fingerprint = Column(String(64))
     article = relationship("Article", back_populates="comments")
+
+    __table_args__ = (
+        # Keyset pagination of /comments/{id} and the top-N comments per article
+        Index("ix_comments_article_created_id", "article_id", "created_at", "id"),
+        # Time-range scans (poller, rollup rebuild, exports) filtered by toxicity
+        Index("ix_comments_created_toxic", "created_at", "is_toxic"),
+        # A comment scraped again is never stored twice (non-unique once partitioned,
+        # comment_fingerprints then enforces it)
+        Index("ux_comments_fingerprint", "fingerprint", unique=True),
+    )
+
+
+class CommentFingerprint(Base):
+    """
+    Fingerprint of every comment stored, written with it in the same transaction.
+
+    Kept apart from comments so uniqueness survives partitioning, which only allows
+    unique keys that include created_at (see partitions).
+    """
+    __tablename__ = "comment_fingerprints"
+    fingerprint = Column(String(64), primary_key=True)
+
+
+class CommentArchive(Base):
+    """Comments moved out of the comments table by the retention job (see partitions)."""
+    __tablename__ = "comments_archive"
+    id = Column(Integer, primary_key=True)
+    comment = Column(Text)
+    username = Column(String(100))
+    user_id = Column(String(100))
+    timestamp = Column(DateTime)
+    article_id = Column(Integer)
+    created_at = Column(DateTime, index=True)
+    is_toxic = Column(Boolean)
+    model_version = Column(String(32))
+    fingerprint = Column(String(64))
+    archived_at = Column(DateTime)
+
+
+class CommentDailyStats(Base):
+    """Daily rollup of comments by toxicity, maintained as comments are inserted."""
+    __tablename__ = "comment_daily_stats"
+    day = Column(Date, primary_key=True)
+    non_toxic = Column(Integer, nullable=False, default=0)
+    toxic = Column(Integer, nullable=False, default=0)
+
+
+class RescoreJob(Base):
+    """Progress of a background rescoring run, so it can resume after a restart."""
+    __tablename__ = "rescore_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String(20), nullable=False)
+    model_version = Column(String(32), nullable=False)
+    last_id = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    toxic = Column(Integer, nullable=False, default=0)
+    total = Column(Integer)
+    started_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    error = Column(Text)
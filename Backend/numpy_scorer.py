@@ -0,0 +1,125 @@
+import json
+
+import h5py
+import numpy as np
+
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _linear(x):
+    return x
+
+
+ACTIVATIONS = {
+    "relu": _relu,
+    "sigmoid": _sigmoid,
+    "tanh": np.tanh,
+    "linear": _linear,
+}
+
+
+class NumpyScorer:
+    """
+    Scores TF-IDF rows with the weights of the Keras Dense model, without TensorFlow.
+
+    The first Dense layer is applied as a sparse @ dense product straight on the
+    CSR matrix, so the 5000-wide dense input is never built. Dropout layers are
+    skipped, as they are at Keras inference time.
+    """
+
+    def __init__(self, layers):
+        # layers is a list of (kernel, bias, activation name) tuples, in model order
+        self.layers = [
+            (np.ascontiguousarray(kernel, dtype=np.float32), np.asarray(bias, dtype=np.float32), ACTIVATIONS[activation])
+            for kernel, bias, activation in layers
+        ]
+        self.n_features = self.layers[0][0].shape[0]
+
+    @classmethod
+    def from_h5(cls, path):
+        """Read the Dense layer weights out of a Keras .h5 file."""
+        with h5py.File(path, "r") as f:
+            config = f.attrs["model_config"]
+            if isinstance(config, bytes):
+                config = config.decode("utf-8")
+            config = json.loads(config)
+            weights = f["model_weights"]
+
+            layers = []
+            for layer in config["config"]["layers"]:
+                class_name = layer["class_name"]
+                if class_name in ("InputLayer", "Dropout"):
+                    continue
+                if class_name != "Dense":
+                    raise ValueError(f"Unsupported layer for the NumPy scorer: {class_name}")
+
+                name = layer["config"]["name"]
+                weight_names = [
+                    n.decode("utf-8") if isinstance(n, bytes) else n
+                    for n in weights[name].attrs["weight_names"]
+                ]
+                kernel = next(weights[name][n][()] for n in weight_names if n.endswith(("kernel", "kernel:0")))
+                if layer["config"].get("use_bias", True):
+                    bias = next(weights[name][n][()] for n in weight_names if n.endswith(("bias", "bias:0")))
+                else:
+                    bias = np.zeros(kernel.shape[1], dtype=np.float32)
+                layers.append((kernel, bias, layer["config"].get("activation", "linear")))
+
+        return cls(layers)
+
+    def predict_proba(self, X):
+        """
+        Return the output of the last layer for each row of X as a 1-D array.
+
+        X may be a SciPy sparse matrix (the TfidfVectorizer output) or a dense array.
+        """
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+
+        kernel, bias, activation = self.layers[0]
+        hidden = X.astype(np.float32) @ kernel
+        hidden = activation(np.asarray(hidden) + bias)
+        for kernel, bias, activation in self.layers[1:]:
+            hidden = activation(hidden @ kernel + bias)
+        return hidden[:, 0]
+
+    def predict(self, X):
+        """Keras-compatible predict: one column of probabilities per row."""
+        return self.predict_proba(X)[:, None]
+
+
+if __name__ == "__main__":
+    # Compare the NumPy scorer against Keras on a few comments
+    import pickle
+    import time
+
+    with open("tfidf_vectorizer.pkl", "rb") as f:
+        vectorizer = pickle.load(f)
+    scorer = NumpyScorer.from_h5("toxic_comment_prediction_model.h5")
+
+    comments = [
+        "muslims are extrimists",
+        "You are great",
+        "You are very stupid and mad.",
+        "This is a very bad service.",
+    ]
+    X = vectorizer.transform(comments)
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        scorer.predict_proba(vectorizer.transform(comments[:1]))
+    print(f"NumPy scorer: {(time.perf_counter() - start):.3f} ms per comment (incl. vectorize)")
+
+    from tensorflow.keras.models import load_model
+
+    keras_predictions = load_model("toxic_comment_prediction_model.h5").predict(X.toarray(), verbose=0)[:, 0]
+    numpy_predictions = scorer.predict_proba(X)
+    for comment, k, n in zip(comments, keras_predictions, numpy_predictions):
+        print(f"{comment!r}: keras={k:.6f} numpy={n:.6f}")
+    print("Max abs difference:", float(np.max(np.abs(keras_predictions - numpy_predictions))))
@@ -0,0 +1,255 @@
+"""
+Monthly partitioning and retention of the comments table.
+
+Partitioning is optional and MySQL only. It ranges comments on created_at, one
+partition per month plus a catch-all p_future, so time-bounded queries (the poller,
+exports by date, rollup rebuilds) only touch recent partitions. MySQL requires the
+partitioning column in every unique key and forbids foreign keys on partitioned
+tables, so converting the table:
+
+- drops the article_id foreign key,
+- makes the primary key (id, created_at),
+- makes ux_comments_fingerprint a plain (non-unique) index on fingerprint. Uniqueness
+  is kept by comment_fingerprints, a separate unpartitioned table keyed by fingerprint
+  that the scraper writes in the same transaction as the comments; the conversion
+  fills it first and checks afterwards that a duplicate fingerprint is still rejected.
+
+Retention works with or without partitions: comments older than the kept months are
+copied to comments_archive (unless archiving is off) and deleted in batches, and the
+emptied partitions are dropped. The daily rollup keeps its counts.
+
+    python -m Backend.partitions ddl                 # print the conversion statements
+    python -m Backend.partitions partition           # apply them
+    python -m Backend.partitions check               # is a duplicate fingerprint still rejected?
+    python -m Backend.partitions extend              # add the coming months' partitions
+    python -m Backend.partitions retention --keep-months 12 [--no-archive]
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import date, datetime
+
+from sqlalchemy import bindparam, inspect, text
+
+from .database import async_session, create_tables, engine
+from .dedup import duplicates_rejected, register_fingerprints
+from .models import CommentArchive, CommentFingerprint
+from .response_cache import response_cache
+
+# Months of comments kept by the retention job (0 keeps everything)
+COMMENTS_RETENTION_MONTHS = int(os.getenv("COMMENTS_RETENTION_MONTHS", "0"))
+# Archive rows before deleting them, instead of dropping them outright
+COMMENTS_ARCHIVE = os.getenv("COMMENTS_ARCHIVE", "1") == "1"
+# Partitions created ahead of the current month
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "5000"))
+# Seconds between runs of the API's maintenance task (0 disables it)
+COMMENTS_MAINTENANCE_INTERVAL = float(os.getenv("COMMENTS_MAINTENANCE_INTERVAL", "0"))
+
+ARCHIVE_COLUMNS = [
+    "id", "comment", "username", "user_id", "timestamp", "article_id", "created_at",
+    "is_toxic", "model_version", "fingerprint",
+]
+
+logger = logging.getLogger(__name__)
+
+_select_expired = text("SELECT id FROM comments WHERE created_at < :cutoff LIMIT :limit")
+_archive_rows = text(
+    f"INSERT INTO comments_archive ({', '.join(ARCHIVE_COLUMNS)}, archived_at) "
+    f"SELECT {', '.join(ARCHIVE_COLUMNS)}, :now FROM comments WHERE id IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+_delete_rows = text("DELETE FROM comments WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+_select_partitions = text(
+    "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'comments' AND PARTITION_NAME IS NOT NULL "
+    "ORDER BY PARTITION_ORDINAL_POSITION"
+)
+
+
+def add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+
+def partition_definitions(first_month, last_month):
+    """One partition per month from first_month to last_month, then p_future."""
+    definitions, month = [], first_month
+    while month <= last_month:
+        definitions.append(f"PARTITION {partition_name(month)} VALUES LESS THAN ('{add_months(month, 1)}')")
+        month = add_months(month, 1)
+    definitions.append("PARTITION p_future VALUES LESS THAN (MAXVALUE)")
+    return definitions
+
+
+def _require_mysql():
+    if engine.dialect.name != "mysql":
+        raise RuntimeError(f"Partitioning needs MySQL, not {engine.dialect.name}")
+
+
+async def partitions():
+    """(name, upper bound) of the partitions of comments, empty when it is not partitioned."""
+    if engine.dialect.name != "mysql":
+        return []
+    async with engine.connect() as conn:
+        return [tuple(row) for row in (await conn.execute(_select_partitions)).fetchall()]
+
+
+async def partitioning_statements(months_ahead=PARTITION_MONTHS_AHEAD):
+    """The statements converting comments to monthly partitions, from its oldest month on."""
+    async with engine.connect() as conn:
+        foreign_keys = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_foreign_keys("comments"))
+        indexes = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_indexes("comments"))
+        oldest = (await conn.execute(text("SELECT MIN(created_at) FROM comments"))).scalar()
+
+    this_month = month_start(date.today())
+    first_month = month_start(oldest) if oldest else this_month
+    statements = [f"ALTER TABLE comments DROP FOREIGN KEY {fk['name']}" for fk in foreign_keys if fk.get("name")]
+    statements += [
+        # The partitioning column has to be in every unique key, so it cannot be NULL
+        "UPDATE comments SET created_at = COALESCE(timestamp, NOW()) WHERE created_at IS NULL",
+        "ALTER TABLE comments MODIFY created_at DATETIME NOT NULL, DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)",
+    ]
+    if "ux_comments_fingerprint" in {index["name"] for index in indexes}:
+        # Same name, so create_indexes() does not add the unique one back; comment_fingerprints enforces it
+        statements.append("ALTER TABLE comments DROP INDEX ux_comments_fingerprint, "
+                          "ADD INDEX ux_comments_fingerprint (fingerprint)")
+    definitions = partition_definitions(first_month, add_months(this_month, months_ahead))
+    statements.append("ALTER TABLE comments PARTITION BY RANGE COLUMNS(created_at) (\n    "
+                      + ",\n    ".join(definitions) + "\n)")
+    return statements
+
+
+async def partition_comments(months_ahead=PARTITION_MONTHS_AHEAD):
+    """Convert comments to monthly partitions (rebuilds the table: run it off-peak)."""
+    _require_mysql()
+    if await partitions():
+        return {"partitioned": False, "reason": "already partitioned"}
+    # Uniqueness moves to comment_fingerprints, so it must hold every stored fingerprint first
+    await create_tables([CommentFingerprint.__table__])
+    await register_fingerprints(async_session)
+    statements = await partitioning_statements(months_ahead)
+    async with engine.begin() as conn:
+        for statement in statements:
+            logger.info("event=partition_ddl statement=%r", statement.splitlines()[0])
+            await conn.execute(text(statement))
+    rejected = await duplicates_rejected(engine)
+    if not rejected:
+        logger.error("event=partition_duplicates_accepted table=comment_fingerprints")
+    return {"partitioned": True, "partitions": len(await partitions()), "duplicates_rejected": rejected}
+
+
+async def extend_partitions(months_ahead=PARTITION_MONTHS_AHEAD):
+    """Split the months up to `months_ahead` out of p_future; cheap while p_future is empty."""
+    existing = await partitions()
+    if not existing:
+        return []
+    months = [datetime.strptime(name[1:], "%Y%m").date() for name, _ in existing if name != "p_future"]
+    last_month = max(months) if months else add_months(month_start(date.today()), -1)
+    target = add_months(month_start(date.today()), months_ahead)
+    if last_month >= target:
+        return []
+    definitions = partition_definitions(add_months(last_month, 1), target)
+    async with engine.begin() as conn:
+        await conn.execute(text(f"ALTER TABLE comments REORGANIZE PARTITION p_future INTO ({', '.join(definitions)})"))
+    added = [definition.split()[1] for definition in definitions[:-1]]
+    logger.info("event=partitions_added partitions=%s", ",".join(added))
+    return added
+
+
+async def drop_partitions_before(cutoff):
+    """Drop the monthly partitions that only hold rows older than `cutoff` (a month start)."""
+    expired = [
+        name for name, _ in await partitions()
+        if name != "p_future" and add_months(datetime.strptime(name[1:], "%Y%m").date(), 1) <= cutoff
+    ]
+    if expired:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"ALTER TABLE comments DROP PARTITION {', '.join(expired)}"))
+        logger.info("event=partitions_dropped partitions=%s", ",".join(expired))
+    return expired
+
+
+async def apply_retention(keep_months=COMMENTS_RETENTION_MONTHS, archive=COMMENTS_ARCHIVE,
+                          batch_size=RETENTION_BATCH_SIZE):
+    """Archive (optionally) and remove the comments created before the last `keep_months` months."""
+    if keep_months <= 0:
+        return {"removed": 0, "dropped_partitions": []}
+    cutoff = add_months(month_start(date.today()), -keep_months)
+    partitioned = bool(await partitions())
+    if archive:
+        await create_tables([CommentArchive.__table__])
+
+    removed = 0
+    # Without an archive, whole partitions are dropped instead of deleting row by row
+    while archive or not partitioned:
+        async with async_session() as db:
+            ids = [row[0] for row in (await db.execute(
+                _select_expired, {"cutoff": datetime.combine(cutoff, datetime.min.time()), "limit": batch_size}
+            )).fetchall()]
+            if not ids:
+                break
+            if archive:
+                await db.execute(_archive_rows, {"ids": ids, "now": datetime.now()})
+            await db.execute(_delete_rows, {"ids": ids})
+            await db.commit()
+        removed += len(ids)
+        logger.info("event=retention_batch removed=%s cutoff=%s", removed, cutoff)
+
+    dropped = await drop_partitions_before(cutoff) if partitioned else []
+    if removed or dropped:
+        response_cache.bump()
+    return {"cutoff": cutoff, "removed": removed, "archived": archive, "dropped_partitions": dropped}
+
+
+async def maintain_comments(interval=COMMENTS_MAINTENANCE_INTERVAL):
+    """API background task: keep future partitions ahead and apply retention, every `interval` seconds."""
+    while True:
+        try:
+            await extend_partitions()
+            if COMMENTS_RETENTION_MONTHS > 0:
+                logger.info("event=retention_done result=%s", await apply_retention())
+        except Exception as e:
+            logger.error("event=comments_maintenance_failed error=%r", e)
+        await asyncio.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("ddl", "partition", "extend"):
+        command = commands.add_parser(name)
+        command.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+    commands.add_parser("check")
+    command = commands.add_parser("retention")
+    command.add_argument("--keep-months", type=int, default=COMMENTS_RETENTION_MONTHS or 12)
+    command.add_argument("--no-archive", dest="archive", action="store_false")
+    command.add_argument("--batch-size", type=int, default=RETENTION_BATCH_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s level=%(levelname)s logger=%(name)s %(message)s")
+    if args.command == "ddl":
+        print(";\n".join(asyncio.run(partitioning_statements(args.months_ahead))) + ";")
+    elif args.command == "partition":
+        print(asyncio.run(partition_comments(args.months_ahead)))
+    elif args.command == "extend":
+        print(asyncio.run(extend_partitions(args.months_ahead)))
+    elif args.command == "check":
+        rejected = asyncio.run(duplicates_rejected(engine))
+        print({"duplicates_rejected": rejected})
+        if not rejected:
+            raise SystemExit(1)
+    else:
+        print(asyncio.run(apply_retention(args.keep_months, args.archive, args.batch_size)))
+
+
+if __name__ == "__main__":
+    main()
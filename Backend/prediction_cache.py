@@ -0,0 +1,159 @@
+import hashlib
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """
+    Normalize a comment the way the TF-IDF vectorizer would see it.
+
+    The vectorizer lowercases and ignores runs of whitespace, so texts differing
+    only in case or spacing always get the same score.
+    """
+    return _whitespace.sub(" ", text or "").strip().lower()
+
+
+class PredictionCache:
+    """
+    Content-addressed cache of toxicity scores.
+
+    Keys are a hash of the model version and the normalized comment text, so a new
+    model never reads scores written by an old one. Entries are kept in an in-memory
+    LRU bounded to `max_entries`; when `path` is given they are also written to a
+    SQLite file so a restarted process does not start cold.
+    """
+
+    def __init__(self, model_version, max_entries=100_000, path=None):
+        self.model_version = model_version
+        self.max_entries = max_entries
+        self.path = path
+        self._entries = OrderedDict()
+        # Guards the in-memory LRU only, so it is never held across SQLite I/O
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if path:
+            self._open(path)
+
+    def _open(self, path):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS predictions (key TEXT PRIMARY KEY, score REAL)")
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'model_version'").fetchone()
+        if row is None or row[0] != self.model_version:
+            # Model artifacts changed: everything on disk is stale
+            self._db.execute("DELETE FROM predictions")
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('model_version', ?)", (self.model_version,)
+            )
+        self._db.commit()
+
+    def key(self, text):
+        payload = f"{self.model_version}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def get_many(self, texts):
+        """Return one score per text, or None where the text is not cached."""
+        scores = self._lookup(texts)
+        with self._lock:
+            hits = sum(score is not None for score in scores)
+            self.hits += hits
+            self.misses += len(scores) - hits
+        return scores
+
+    def get(self, text):
+        return self.get_many([text])[0]
+
+    def get_cached(self, text):
+        """
+        Score of `text` if it is in the in-memory LRU, else None. Never touches SQLite,
+        so it is cheap enough for the event loop. Only a hit is counted: on a miss the
+        caller goes on to score the text, and that lookup counts the miss.
+        """
+        score = self._lookup([text], persistent=False)[0]
+        if score is not None:
+            with self._lock:
+                self.hits += 1
+        return score
+
+    def peek_many(self, texts):
+        """
+        Like get_many, but leaves the LRU order, its entries and the hit counts alone, so
+        one-off traffic (bulk jobs) can read the cache without evicting the hot entries.
+        """
+        return self._lookup(texts, touch=False)
+
+    def _lookup(self, texts, persistent=True, touch=True):
+        keys = [self.key(text) for text in texts]
+        scores = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                score = self._entries.get(key)
+                if score is not None:
+                    if touch:
+                        self._entries.move_to_end(key)
+                    scores[i] = score
+                else:
+                    missing.append(i)
+
+        if missing and persistent and self._db is not None:
+            with self._db_lock:
+                rows = [
+                    (i, self._db.execute("SELECT score FROM predictions WHERE key = ?", (keys[i],)).fetchone())
+                    for i in missing
+                ]
+            with self._lock:
+                for i, row in rows:
+                    if row is not None:
+                        scores[i] = row[0]
+                        if touch:
+                            self._remember(keys[i], row[0])
+        return scores
+
+    def put_many(self, texts, scores):
+        rows = [(self.key(text), float(score)) for text, score in zip(texts, scores)]
+        with self._lock:
+            for key, score in rows:
+                self._remember(key, score)
+        if self._db is not None:
+            with self._db_lock:
+                self._db.executemany("INSERT OR REPLACE INTO predictions (key, score) VALUES (?, ?)", rows)
+                self._db.commit()
+
+    def _remember(self, key, score):
+        self._entries[key] = score
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM predictions")
+                self._db.commit()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "model_version": self.model_version,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "persistent": self._db is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
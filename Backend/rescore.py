@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+from sqlalchemy import bindparam, inspect, select, text
+
+from .crud import rebuild_daily_counts
+from .database import async_session, create_tables, engine
+from .model_registry import registry
+from .models import RescoreJob
+from .response_cache import response_cache
+
+# Rows read, scored and written per chunk
+RESCORE_CHUNK_SIZE = int(os.getenv("RESCORE_CHUNK_SIZE", "1000"))
+
+logger = logging.getLogger(__name__)
+
+_select_chunk = text(
+    "SELECT id, comment FROM comments "
+    "WHERE id > :last_id AND (model_version IS NULL OR model_version != :model_version) "
+    "ORDER BY id LIMIT :limit"
+)
+_count_pending = text(
+    "SELECT COUNT(*) FROM comments WHERE model_version IS NULL OR model_version != :model_version"
+)
+_update_scores = text(
+    "UPDATE comments SET is_toxic = :is_toxic, model_version = :model_version WHERE id IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+
+
+async def ensure_schema():
+    """Create the rescore_jobs table and add comments.model_version on databases that predate it."""
+    await create_tables([RescoreJob.__table__])
+    async with engine.begin() as conn:
+        columns = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_columns("comments"))
+        if "model_version" not in {column["name"] for column in columns}:
+            await conn.execute(text("ALTER TABLE comments ADD COLUMN model_version VARCHAR(32)"))
+
+
+class Rescorer:
+    """
+    Rescores the comments table in the background with the current model.
+
+    Rows are read in keyset-paginated chunks (by id), each chunk is scored in one
+    batch and written with two bulk UPDATEs (toxic / not toxic). Progress is stored
+    in rescore_jobs in the same transaction, so a restarted process resumes from
+    the last processed id. Rows already tagged with the current model version are
+    skipped.
+    """
+
+    def __init__(self, chunk_size=RESCORE_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.task = None
+        self.job_id = None
+        # Held from the running() check until the task exists, so concurrent calls start one job
+        self._starting = asyncio.Lock()
+
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    async def start(self):
+        """Start a new job, or return the one already running."""
+        async with self._starting:
+            if not self.running():
+                await ensure_schema()
+                model_version = await asyncio.to_thread(lambda: registry.model_version)
+                async with async_session() as db:
+                    # total is counted by the job itself, off the request path
+                    job = RescoreJob(
+                        status="running",
+                        model_version=model_version,
+                        last_id=0,
+                        processed=0,
+                        toxic=0,
+                        started_at=datetime.now(),
+                        updated_at=datetime.now(),
+                    )
+                    db.add(job)
+                    await db.commit()
+                    self.job_id = job.id
+                self.task = asyncio.create_task(self._run(self.job_id))
+        return await self.status()
+
+    async def resume(self):
+        """Continue the last job left running by a previous process, if any."""
+        try:
+            async with self._starting:
+                await ensure_schema()
+                async with async_session() as db:
+                    result = await db.execute(
+                        select(RescoreJob)
+                        .where(RescoreJob.status == "running")
+                        .order_by(RescoreJob.id.desc())
+                        .limit(1)
+                    )
+                    job = result.scalars().first()
+                if job is not None and not self.running():
+                    logger.info("event=rescore_resumed job=%s last_id=%s", job.id, job.last_id)
+                    self.job_id = job.id
+                    self.task = asyncio.create_task(self._run(job.id))
+        except Exception as e:
+            logger.error("event=rescore_resume_failed error=%r", e)
+
+    async def _run(self, job_id):
+        try:
+            async with async_session() as db:
+                job = await db.get(RescoreJob, job_id)
+                if job.total is None:
+                    job.total = (await db.execute(_count_pending, {"model_version": job.model_version})).scalar()
+                    await db.commit()
+            while True:
+                async with async_session() as db:
+                    job = await db.get(RescoreJob, job_id)
+                    rows = (await db.execute(
+                        _select_chunk,
+                        {"last_id": job.last_id, "model_version": job.model_version, "limit": self.chunk_size},
+                    )).fetchall()
+                    if not rows:
+                        job.status = "completed"
+                        job.finished_at = job.updated_at = datetime.now()
+                        await db.commit()
+                        await rebuild_daily_counts(db)
+                        return
+
+                    # Rows are tagged with the version that scored them, even if it was swapped mid-job
+                    scores, model_version = await asyncio.to_thread(
+                        registry.score_with_version, [comment or "" for _, comment in rows]
+                    )
+                    toxic_ids = [id for (id, _), score in zip(rows, scores) if score > 0.5]
+                    clean_ids = [id for (id, _), score in zip(rows, scores) if score <= 0.5]
+                    for is_toxic, ids in ((1, toxic_ids), (0, clean_ids)):
+                        if ids:
+                            await db.execute(
+                                _update_scores,
+                                {"is_toxic": is_toxic, "model_version": model_version, "ids": ids},
+                            )
+
+                    job.last_id = rows[-1][0]
+                    job.processed += len(rows)
+                    job.toxic += len(toxic_ids)
+                    job.updated_at = datetime.now()
+                    await db.commit()
+                response_cache.bump()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("event=rescore_failed job=%s error=%r", job_id, e)
+            async with async_session() as db:
+                job = await db.get(RescoreJob, job_id)
+                job.status = "failed"
+                job.error = str(e)[:1000]
+                job.updated_at = datetime.now()
+                await db.commit()
+
+    async def status(self):
+        """Progress and throughput of the latest job."""
+        async with async_session() as db:
+            result = await db.execute(select(RescoreJob).order_by(RescoreJob.id.desc()).limit(1))
+            job = result.scalars().first()
+        if job is None:
+            return {"status": "idle"}
+
+        elapsed = ((job.finished_at or datetime.now()) - job.started_at).total_seconds()
+        return {
+            "id": job.id,
+            "status": job.status,
+            "model_version": job.model_version,
+            "last_id": job.last_id,
+            "processed": job.processed,
+            "toxic": job.toxic,
+            "total": job.total,
+            # None until the job has counted its rows
+            "progress": None if job.total is None else job.processed / job.total if job.total else 1.0,
+            "rows_per_second": job.processed / elapsed if elapsed > 0 else 0.0,
+            "started_at": job.started_at,
+            "updated_at": job.updated_at,
+            "finished_at": job.finished_at,
+            "error": job.error,
+        }
+
+
+rescorer = Rescorer()
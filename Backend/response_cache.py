@@ -0,0 +1,133 @@
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+from fastapi.encoders import jsonable_encoder
+
+from .metrics import Counter
+
+# Serialized responses kept per process
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2000"))
+
+CACHE_REQUESTS = Counter(
+    "alertini_response_cache_requests_total", "Cached routes served, by result (hit, miss, not_modified)",
+    ["route", "result"],
+)
+CACHE_BYTES = Counter("alertini_response_cache_bytes_total", "Response bytes served from the cache", ["route"])
+
+
+def render_json(payload):
+    """JSON bytes exactly as FastAPI's JSONResponse would send them."""
+    return json.dumps(
+        jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = {value.strip().removeprefix("W/") for value in if_none_match.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+class ResponseCache:
+    """
+    Serialized JSON responses of read endpoints, valid until the data changes.
+
+    Every entry belongs to a generation; writers call bump() once they have committed
+    (the scraper after each saved batch, through /events/data-changed), which makes
+    every entry stale at once. Concurrent misses on the same key wait for a single
+    build, so a burst of dashboard refreshes costs one query per generation. ETags
+    hash the body, so a client holding an unchanged page still gets a 304 after a bump.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.generation = 0
+        # key -> (generation, etag, body)
+        self._entries = OrderedDict()
+        # key -> future of the build in progress
+        self._building = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.bytes_from_cache = 0
+        self.bytes_served = 0
+        self.bumps = 0
+
+    def bump(self):
+        self.generation += 1
+        self.bumps += 1
+        self._entries.clear()
+        return self.generation
+
+    async def get_or_build(self, key, build):
+        """(etag, body, hit) for `key`; `build` is awaited on a miss and returns the payload to serialize."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == self.generation:
+            self._entries.move_to_end(key)
+            return entry[1], entry[2], True
+
+        building = self._building.get(key)
+        if building is not None and building[0] == self.generation:
+            etag, body = await asyncio.shield(building[1])
+            return etag, body, True
+
+        generation = self.generation
+        future = asyncio.get_running_loop().create_future()
+        self._building[key] = (generation, future)
+        try:
+            body = render_json(await build())
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            future.set_result((etag, body))
+        except BaseException as e:
+            future.set_exception(e)
+            # Waiters get the error; nobody else retrieves it
+            future.exception()
+            raise
+        finally:
+            if self._building.get(key, (None, None))[1] is future:
+                del self._building[key]
+
+        # Not stored if the data changed while it was being read
+        if generation == self.generation:
+            self._entries[key] = (generation, etag, body)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag, body, False
+
+    def record(self, route, hit, not_modified, size):
+        """Count one response of `route` (`size` bytes sent)."""
+        if not_modified:
+            self.not_modified += 1
+            CACHE_REQUESTS.inc(route=route, result="not_modified")
+        elif hit:
+            self.hits += 1
+            self.bytes_from_cache += size
+            CACHE_REQUESTS.inc(route=route, result="hit")
+            CACHE_BYTES.inc(size, route=route)
+        else:
+            self.misses += 1
+            CACHE_REQUESTS.inc(route=route, result="miss")
+        self.bytes_served += size
+
+    def stats(self):
+        served = self.hits + self.misses + self.not_modified
+        return {
+            "generation": self.generation,
+            "bumps": self.bumps,
+            "entries": len(self._entries),
+            "bytes_cached": sum(len(entry[2]) for entry in self._entries.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "hit_ratio": (self.hits + self.not_modified) / served if served else 0.0,
+            "bytes_served": self.bytes_served,
+            "bytes_from_cache": self.bytes_from_cache,
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,208 @@
+"""
+Compact, memory-mappable replacement for the pickled TfidfVectorizer, and a converter
+for the training corpus.
+
+    python -m Backend.tfidf export-vectorizer --pickle tfidf_vectorizer.pkl --out artifacts/tfidf
+    python -m Backend.tfidf export-corpus --csv comments_data.csv --out artifacts/corpus
+
+A vectorizer artifact is a directory holding:
+    terms.npy / term_offsets.npy   the vocabulary, as UTF-8 bytes + offsets, in feature order
+    idf.npy                        idf weight of each feature (float64)
+    config.json                    the transform settings (token pattern, norm, ...)
+
+The arrays are opened with mmap_mode="r" and no pickle is involved. Only idf.npy stays
+mapped, so every process loading the same artifact shares one copy of the weights
+through the page cache; the terms are decoded once at load into a per-process
+vocabulary dict, which is what makes the token lookups fast.
+"""
+import argparse
+import json
+import re
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import scipy.sparse as sp
+
+
+def pack_strings(strings):
+    """Arrow-style string column: one UTF-8 byte buffer plus int64 offsets."""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return data, offsets
+
+
+def unpack_strings(data, offsets):
+    raw = data.tobytes()
+    return [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+def export_vectorizer(vectorizer, out_dir):
+    """Write the fitted vocabulary and idf weights of a TfidfVectorizer as an artifact directory."""
+    params = vectorizer.get_params()
+    if params["analyzer"] != "word" or tuple(params["ngram_range"]) != (1, 1):
+        raise ValueError("Only word unigram vectorizers can be exported")
+    if params["tokenizer"] is not None or params["preprocessor"] is not None or params["strip_accents"] is not None:
+        raise ValueError("Custom tokenizers, preprocessors and accent stripping are not supported")
+    if params["norm"] not in ("l2", None):
+        raise ValueError(f"Unsupported norm: {params['norm']}")
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    terms = [None] * len(vectorizer.vocabulary_)
+    for term, index in vectorizer.vocabulary_.items():
+        terms[index] = term
+    data, offsets = pack_strings(terms)
+    np.save(out_dir / "terms.npy", data)
+    np.save(out_dir / "term_offsets.npy", offsets)
+    np.save(out_dir / "idf.npy", np.asarray(vectorizer.idf_, dtype=np.float64))
+
+    config = {
+        "token_pattern": params["token_pattern"],
+        "lowercase": params["lowercase"],
+        "binary": params["binary"],
+        "norm": params["norm"],
+        "use_idf": params["use_idf"],
+        "sublinear_tf": params["sublinear_tf"],
+        "n_features": len(terms),
+    }
+    (out_dir / "config.json").write_text(json.dumps(config, indent=2))
+    return out_dir
+
+
+class TfidfArtifact:
+    """
+    Fast TF-IDF transformer loaded from an exported artifact directory.
+
+    transform() gives the same CSR matrix as the fitted sklearn vectorizer's transform().
+    Stop words never need filtering: they are not in the fitted vocabulary, so the
+    vocabulary lookup drops them along with every other unknown token.
+
+    `idf` may be a memory-mapped array shared between processes; `vocabulary` is a
+    plain dict built from `terms` in each process.
+    """
+
+    def __init__(self, terms, idf, config):
+        self.config = config
+        self.vocabulary = {term: index for index, term in enumerate(terms)}
+        self.idf = idf
+        self.n_features = len(terms)
+        self.token_pattern = re.compile(config["token_pattern"])
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        path = Path(path)
+        mode = "r" if mmap else None
+        config = json.loads((path / "config.json").read_text())
+        terms = unpack_strings(np.load(path / "terms.npy", mmap_mode=mode), np.load(path / "term_offsets.npy"))
+        idf = np.load(path / "idf.npy", mmap_mode=mode)
+        return cls(terms, idf, config)
+
+    @classmethod
+    def from_vectorizer(cls, vectorizer):
+        """Build the fast transformer straight from a fitted TfidfVectorizer, without writing files."""
+        with tempfile.TemporaryDirectory() as tmp:
+            return cls.load(export_vectorizer(vectorizer, tmp), mmap=False)
+
+    def transform(self, texts):
+        # Tokenize and look up every document, collecting a flat array of feature ids
+        lookup = self.vocabulary.get
+        findall = self.token_pattern.findall
+        lowercase = self.config["lowercase"]
+        features = []
+        lengths = np.empty(len(texts), dtype=np.int64)
+        for row, text in enumerate(texts):
+            ids = [i for i in map(lookup, findall(text.lower() if lowercase else text)) if i is not None]
+            features.extend(ids)
+            lengths[row] = len(ids)
+
+        # Count (row, feature) pairs in one pass; np.unique returns them sorted, i.e. in CSR order
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+        keys, counts = np.unique(rows * self.n_features + np.asarray(features, dtype=np.int64), return_counts=True)
+        row_of_key = keys // self.n_features
+        indices = (keys - row_of_key * self.n_features).astype(np.int32)
+        indptr = np.zeros(len(texts) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(row_of_key, minlength=len(texts)), out=indptr[1:])
+
+        data = counts.astype(np.float64)
+        if self.config["binary"]:
+            data[:] = 1.0
+        if self.config["sublinear_tf"]:
+            np.log(data, data)
+            data += 1.0
+        if self.config["use_idf"]:
+            data *= self.idf[indices]
+        if self.config["norm"] == "l2":
+            norms = np.sqrt(np.bincount(row_of_key, weights=data * data, minlength=len(texts)))
+            norms[norms == 0.0] = 1.0
+            data /= norms[row_of_key]
+        return sp.csr_matrix((data, indices, indptr), shape=(len(texts), self.n_features))
+
+
+def export_corpus(csv_path, out_path, format="npy"):
+    """
+    Convert the training corpus CSV to a columnar format.
+
+    "parquet" writes one Parquet file (needs pyarrow). "npy" writes a directory with one
+    memory-mappable .npy per column; text columns use the bytes + offsets layout above.
+    """
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    out_path = Path(out_path)
+    if format == "parquet":
+        df.to_parquet(out_path, index=False)
+        return out_path
+
+    out_path.mkdir(parents=True, exist_ok=True)
+    schema = {}
+    for column in df.columns:
+        values = df[column]
+        if not (pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values)):
+            data, offsets = pack_strings(values.fillna("").astype(str))
+            np.save(out_path / f"{column}.data.npy", data)
+            np.save(out_path / f"{column}.offsets.npy", offsets)
+            schema[column] = "string"
+        else:
+            np.save(out_path / f"{column}.npy", values.to_numpy())
+            schema[column] = str(values.dtype)
+    (out_path / "schema.json").write_text(json.dumps({"rows": len(df), "columns": schema}, indent=2))
+    return out_path
+
+
+def load_corpus_column(path, column):
+    """Read one column of an "npy" corpus directory (text columns come back as a list of str)."""
+    path = Path(path)
+    schema = json.loads((path / "schema.json").read_text())
+    if schema["columns"][column] == "string":
+        return unpack_strings(
+            np.load(path / f"{column}.data.npy", mmap_mode="r"), np.load(path / f"{column}.offsets.npy")
+        )
+    return np.load(path / f"{column}.npy", mmap_mode="r")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    vectorizer_parser = commands.add_parser("export-vectorizer")
+    vectorizer_parser.add_argument("--pickle", default="tfidf_vectorizer.pkl")
+    vectorizer_parser.add_argument("--out", default="artifacts/tfidf")
+
+    corpus_parser = commands.add_parser("export-corpus")
+    corpus_parser.add_argument("--csv", default="comments_data.csv")
+    corpus_parser.add_argument("--out", default="artifacts/corpus")
+    corpus_parser.add_argument("--format", choices=["npy", "parquet"], default="npy")
+
+    args = parser.parse_args()
+    if args.command == "export-vectorizer":
+        import pickle
+
+        with open(args.pickle, "rb") as f:
+            vectorizer = pickle.load(f)
+        print(f"Vectorizer artifact written to {export_vectorizer(vectorizer, args.out)}")
+    else:
+        print(f"Corpus written to {export_corpus(args.csv, args.out, args.format)}")
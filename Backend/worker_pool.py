@@ -0,0 +1,137 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+# Number of inference worker processes; 0 keeps inference in the calling process
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))
+# Batches smaller than this are not split across workers
+INFERENCE_MIN_CHUNK = int(os.getenv("INFERENCE_MIN_CHUNK", "16"))
+# Recycle a worker after this many tasks (0 = never)
+INFERENCE_WORKER_MAX_TASKS = int(os.getenv("INFERENCE_WORKER_MAX_TASKS", "0"))
+
+logger = logging.getLogger(__name__)
+
+# The registry owned by each worker process
+_worker_registry = None
+
+
+def _init_worker(registry_kwargs):
+    global _worker_registry
+    from .model_registry import ModelRegistry
+
+    _worker_registry = ModelRegistry(workers=0, **registry_kwargs)
+    _worker_registry.load()
+
+
+def _predict(texts):
+    return np.asarray(_worker_registry.predict_proba(texts), dtype=np.float32)
+
+
+def _worker_status(_):
+    return os.getpid(), _worker_registry.load_times
+
+
+class InferencePool:
+    """
+    Runs vectorization and prediction in a pool of worker processes.
+
+    Every worker loads the artifacts once in its initializer. The TF-IDF artifact is
+    memory-mapped, so its arrays are shared between workers through the page cache.
+    Each batch is split into one chunk per worker and the executor hands chunks to
+    whichever worker is free. If a worker dies, the pool is rebuilt and the batch
+    retried once.
+    """
+
+    def __init__(self, workers, registry_kwargs, min_chunk=INFERENCE_MIN_CHUNK,
+                 max_tasks_per_child=INFERENCE_WORKER_MAX_TASKS):
+        self.workers = workers
+        self.registry_kwargs = registry_kwargs
+        self.min_chunk = min_chunk
+        self.max_tasks_per_child = max_tasks_per_child or None
+        self._executor = None
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.chunks = 0
+        self.items = 0
+        self.restarts = 0
+        self.warmed_up = False
+        self.worker_load_times = {}
+
+    def start(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn: never fork a parent that may already hold TensorFlow threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.registry_kwargs,),
+                    max_tasks_per_child=self.max_tasks_per_child,
+                )
+            return self._executor
+
+    def stop(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+    def restart(self, broken):
+        """Replace a broken executor; concurrent callers only rebuild it once."""
+        with self._lock:
+            if self._executor is broken:
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                self.restarts += 1
+        return self.start()
+
+    def warm_up(self):
+        """Start the worker processes and wait until they have loaded the artifacts."""
+        # One task per worker: submitting them together makes the executor spawn every process
+        executor = self.start()
+        for pid, load_times in executor.map(_worker_status, range(self.workers)):
+            self.worker_load_times[pid] = load_times
+        self.warmed_up = True
+
+    def split(self, texts):
+        chunks = max(1, min(self.workers, len(texts) // self.min_chunk))
+        size = -(-len(texts) // chunks)
+        return [texts[i:i + size] for i in range(0, len(texts), size)]
+
+    def predict_proba(self, texts):
+        """Score a batch across the workers; blocks the calling thread until every chunk is back."""
+        if not texts:
+            return np.zeros(0, dtype=np.float32)
+        chunks = self.split(list(texts))
+        executor = self.start()
+        try:
+            results = [future.result() for future in [executor.submit(_predict, chunk) for chunk in chunks]]
+        except BrokenProcessPool as e:
+            logger.warning("event=inference_worker_died error=%r", e)
+            executor = self.restart(executor)
+            results = [future.result() for future in [executor.submit(_predict, chunk) for chunk in chunks]]
+
+        self.batches += 1
+        self.chunks += len(chunks)
+        self.items += len(texts)
+        return np.concatenate(results)
+
+    def is_ready(self):
+        return self.warmed_up and self._executor is not None
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "running": self._executor is not None,
+            "batches": self.batches,
+            "chunks": self.chunks,
+            "items": self.items,
+            "restarts": self.restarts,
+            "worker_load_times": self.worker_load_times,
+        }
@@ -0,0 +1,88 @@
+"""
+Email alerts against a local SMTP sink (needs `pip install aiosmtpd`).
+
+Sends a burst of toxic-comment alerts the old way (one SMTP session per alert) and
+through Backend.mailer's EmailDispatcher (digests over one persistent session), and
+reports emails, SMTP sessions and time for both:
+
+    python -m benchmarks.email_digest --alerts 500 --max-comments 50 --window 0.5
+"""
+import argparse
+import asyncio
+import smtplib
+import time
+from email.mime.text import MIMEText
+
+from aiosmtpd.controller import Controller
+
+from Backend.mailer import EmailDispatcher, SmtpConnection
+
+
+class Sink:
+    """aiosmtpd handler that counts sessions and keeps every message."""
+
+    def __init__(self):
+        self.sessions = 0
+        self.messages = []
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope.content)
+        return "250 OK"
+
+
+def send_one_per_alert(host, port, alerts):
+    """What send_email used to do for every comment."""
+    for alert in alerts:
+        message = MIMEText(f"<html><body><p>{alert['comment']}</p></body></html>", "html")
+        server = smtplib.SMTP(host, port)
+        server.sendmail("alerts@localhost", ["admin@localhost"], message.as_string())
+        server.quit()
+
+
+async def send_digests(host, port, alerts, window, max_comments):
+    dispatcher = EmailDispatcher(
+        SmtpConnection(host, port, user=None, password=None, starttls=False),
+        sender="alerts@localhost", recipient="admin@localhost", window=window, max_comments=max_comments,
+    )
+    dispatcher.start()
+    for alert in alerts:
+        dispatcher.notify(alert)
+    while dispatcher.sent_alerts + dispatcher.dropped + dispatcher.failed_alerts < len(alerts):
+        await asyncio.sleep(0.01)
+    await dispatcher.stop()
+    return dispatcher.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alerts", type=int, default=500)
+    parser.add_argument("--window", type=float, default=0.5, help="digest window in seconds")
+    parser.add_argument("--max-comments", type=int, default=50, help="alerts per digest")
+    parser.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args()
+
+    alerts = [{"comment": f"toxic comment <{i}>", "username": f"user {i}", "timestamp": str(i)}
+              for i in range(args.alerts)]
+    for name in ("one per alert", "digest"):
+        sink = Sink()
+        controller = Controller(sink, hostname="127.0.0.1", port=args.port)
+        controller.start()
+        start = time.perf_counter()
+        if name == "digest":
+            stats = asyncio.run(send_digests("127.0.0.1", args.port, alerts, args.window, args.max_comments))
+        else:
+            send_one_per_alert("127.0.0.1", args.port, alerts)
+        elapsed = time.perf_counter() - start
+        controller.stop()
+        print(f"{name:>14}: {len(sink.messages)} emails, {sink.sessions} SMTP sessions, {elapsed:.2f}s")
+        if name == "digest":
+            print(f"{'':>14}  {stats}")
+
+
+if __name__ == "__main__":
+    main()
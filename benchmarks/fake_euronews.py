@@ -0,0 +1,132 @@
+"""
+Local stand-in for the Euronews site and the Vuukle comment API, built from the
+recorded page fixtures in benchmarks/fixtures/.
+
+Serves listing pages, article pages and comment JSON with ETags (and 304s), so the
+scraper can be benchmarked offline:
+
+    python -m benchmarks.fake_euronews --port 8081
+    EURONEWS_URL=http://127.0.0.1:8081 VUUKLE_URL=http://127.0.0.1:8081 python extraction2.py
+"""
+import argparse
+import hashlib
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+from string import Template
+
+from aiohttp import web
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+class FakeEuronews:
+    """
+    `pages` listing pages of `articles_per_page` articles, each with `comments_per_article`
+    comments. add_comments() appends comments to every article, as happens between two
+    real scraping cycles.
+    """
+
+    def __init__(self, pages=6, articles_per_page=20, comments_per_article=30):
+        self.listing = Template((FIXTURES / "listing.html").read_text())
+        self.listing_item = Template((FIXTURES / "listing_item.html").read_text())
+        self.article = Template((FIXTURES / "article.html").read_text())
+        self.sample_comments = json.loads((FIXTURES / "comments.json").read_text())
+
+        self.pages = pages
+        self.articles_per_page = articles_per_page
+        self.start_time = datetime(2024, 1, 1, 8, 0, 0)
+        self.comment_counts = {
+            self.article_id(page, i): comments_per_article
+            for page in range(1, pages + 1) for i in range(articles_per_page)
+        }
+        self.requests = 0
+        self.not_modified = 0
+        self.runner = None
+
+    def article_id(self, page, i):
+        return str(1000000 + page * 1000 + i)
+
+    def add_comments(self, n):
+        for article_id in self.comment_counts:
+            self.comment_counts[article_id] += n
+
+    def metadata(self, article_id):
+        return {
+            "id": article_id,
+            "url": f"/2024/01/01/article-{article_id}",
+            "title": f"Parliament debates proposal {article_id}",
+            "summary": f"Lawmakers are split over proposal {article_id} ahead of next week's vote.",
+        }
+
+    def respond(self, request, body, content_type):
+        """Answer with an ETag, or 304 when the client already has this body."""
+        self.requests += 1
+        etag = '"' + hashlib.md5(body.encode()).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(text=body, content_type=content_type, headers={"ETag": etag})
+
+    async def listing_page(self, request):
+        page = int(request.query.get("p", "1"))
+        if page > self.pages:
+            return web.Response(status=404)
+        items = [
+            self.listing_item.safe_substitute(self.metadata(self.article_id(page, i)))
+            for i in range(self.articles_per_page)
+        ]
+        body = self.listing.safe_substitute(articles="\n".join(items), next=page + 1)
+        return self.respond(request, body, "text/html")
+
+    async def article_page(self, request):
+        article_id = request.match_info["article_id"]
+        if article_id not in self.comment_counts:
+            return web.Response(status=404)
+        return self.respond(request, self.article.safe_substitute(self.metadata(article_id)), "text/html")
+
+    async def comments(self, request):
+        article_id = request.query.get("articleId")
+        items = []
+        for n in range(self.comment_counts.get(article_id, 0)):
+            sample = self.sample_comments[n % len(self.sample_comments)]
+            items.append({
+                "commentText": sample["commentText"].replace("</p>", f" ({article_id}-{n})</p>"),
+                "name": sample["name"],
+                "userId": f"user-{n % 97}",
+                "createAt": (self.start_time + timedelta(minutes=n)).strftime("%Y-%m-%d %H:%M:%S"),
+            })
+        # Newest first, like the real API
+        body = json.dumps({"data": {"comments": {"items": items[::-1]}}})
+        return self.respond(request, body, "application/json")
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/news/europe/france", self.listing_page)
+        app.router.add_get("/2024/01/01/article-{article_id}", self.article_page)
+        app.router.add_get("/api/v1/Comments/loadVuukle", self.comments)
+        return app
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Serve in the running event loop and return the base URL."""
+        self.runner = web.AppRunner(self.app(), access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--pages", type=int, default=6)
+    parser.add_argument("--articles-per-page", type=int, default=20)
+    parser.add_argument("--comments", type=int, default=30, help="comments per article")
+    args = parser.parse_args()
+    web.run_app(FakeEuronews(args.pages, args.articles_per_page, args.comments).app(), port=args.port)
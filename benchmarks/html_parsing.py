@@ -0,0 +1,139 @@
+"""
+Parity and pages/sec of the scraper's HTML extraction.
+
+Compares the original full-document html.parser extraction with html_extraction's
+strained parsers (html.parser, and lxml when installed), and with the process pool:
+
+    python -m benchmarks.html_parsing --pages 300 --workers 4
+
+Pages are built from benchmarks/fixtures, padded with --filler-kb of markup outside
+the nodes the scraper reads (real article pages are a few hundred KB). Exits with
+status 1 if any parser's output differs from the original; tests/test_html_parsing.py
+runs the same parity checks under pytest.
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+import html_extraction
+from benchmarks.fake_euronews import FakeEuronews
+from html_extraction import HtmlExtractor, clean_text, parse_article_details, parse_article_urls
+
+FILLER = (
+    '<div class="c-related"><ul>'
+    + "".join(f'<li class="c-related__item"><a href="/related/{i}">Related story {i}</a>'
+              f'<span class="c-date">2 hours ago</span></li>' for i in range(20))
+    + '</ul></div><script>window.dataLayer = window.dataLayer || []; dataLayer.push({"page": "article"});</script>\n'
+)
+
+
+def original_article_urls(html):
+    """The scraper's extraction before html_extraction, kept as the reference."""
+    soup = BeautifulSoup(html, "html.parser")
+    urls = []
+    big_div = soup.find("div", class_="o-block-listing__content")
+    if big_div:
+        for article in big_div.find_all("article", class_="m-object"):
+            a = article.find("a", class_="m-object__title__link")
+            if a and "href" in a.attrs:
+                urls.append({"url": a["href"], "id": article.get("data-nid", "")})
+    return urls
+
+
+def original_article_details(html):
+    soup = BeautifulSoup(html, "html.parser")
+    article = soup.find("article", class_="o-article-newsy")
+    if not article:
+        return None
+    title_tag = article.find("h1", class_="c-article-redesign-title")
+    summary_tag = article.find("p", class_="c-article-summary")
+    image_tag = article.find("img", class_="js-poster-img")
+    return {
+        "title": clean_text(title_tag.text) if title_tag else "No Title",
+        "summary": clean_text(summary_tag.text) if summary_tag else None,
+        "image": image_tag["src"] if image_tag and "src" in image_tag.attrs else None,
+    }
+
+
+def build_pages(n, filler_kb):
+    """Alternate listing and article pages, padded outside the extracted nodes."""
+    fake = FakeEuronews(pages=1, articles_per_page=20)
+    padding = FILLER * max(1, filler_kb * 1024 // len(FILLER))
+    pages = []
+    for i in range(n):
+        if i % 2 == 0:
+            items = [fake.listing_item.safe_substitute(fake.metadata(fake.article_id(1, j))) for j in range(20)]
+            html = fake.listing.safe_substitute(articles="\n".join(items), next=2)
+            pages.append(("listing", html.replace("<footer", padding + "<footer", 1)))
+        else:
+            html = fake.article.safe_substitute(fake.metadata(fake.article_id(1, i % 20)))
+            pages.append(("article", html.replace("<main", padding + "<main", 1)))
+    # Pages the scraper must reject or handle partially
+    pages.append(("article", "<html><body><p>No article here</p></body></html>"))
+    pages.append(("listing", "<html><body></body></html>"))
+    pages.append(("article", '<article class="o-article-newsy"><p class="c-article-summary">  Only   a summary </p></article>'))
+    return pages
+
+
+def reference(kind, html):
+    return original_article_urls(html) if kind == "listing" else original_article_details(html)
+
+
+def extract(kind, html, parser):
+    return parse_article_urls(html, parser) if kind == "listing" else parse_article_details(html, parser)
+
+
+async def run_extractor(extractor, pages):
+    return await asyncio.gather(*[
+        extractor.article_urls(html) if kind == "listing" else extractor.article_details(html)
+        for kind, html in pages
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--filler-kb", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=html_extraction.HTML_PARSE_WORKERS)
+    args = parser.parse_args()
+
+    pages = build_pages(args.pages, args.filler_kb)
+    expected = [reference(kind, html) for kind, html in pages]
+    parsers = ["html.parser"] + (["lxml"] if html_extraction.DEFAULT_PARSER == "lxml" else [])
+
+    failures = 0
+    for name in parsers:
+        mismatches = sum(extract(kind, html, name) != want for (kind, html), want in zip(pages, expected))
+        failures += mismatches
+        print(f"parity {name:<12}: {len(pages) - mismatches}/{len(pages)} pages identical")
+    extractor = HtmlExtractor(mode="process", workers=args.workers)
+    mismatches = sum(got != want for got, want in zip(asyncio.run(run_extractor(extractor, pages)), expected))
+    extractor.close()
+    failures += mismatches
+    print(f"parity {'process pool':<12}: {len(pages) - mismatches}/{len(pages)} pages identical")
+
+    def rate(fn):
+        start = time.perf_counter()
+        fn()
+        return len(pages) / (time.perf_counter() - start)
+
+    print(f"\n{'extraction':<32} {'pages/s':>8}")
+    print(f"{'original (full html.parser)':<32} {rate(lambda: [reference(k, h) for k, h in pages]):>8.1f}")
+    for name in parsers:
+        print(f"{'strained ' + name:<32} {rate(lambda: [extract(k, h, name) for k, h in pages]):>8.1f}")
+    for name in parsers:
+        extractor = HtmlExtractor(mode="process", workers=args.workers, parser=name)
+        asyncio.run(run_extractor(extractor, pages[:args.workers]))  # start the workers
+        label = f"process pool x{args.workers} {name}"
+        print(f"{label:<32} {rate(lambda: asyncio.run(run_extractor(extractor, pages))):>8.1f}")
+        extractor.close()
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
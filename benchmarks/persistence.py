@@ -0,0 +1,134 @@
+"""
+Rows/sec of the scraper's original per-row write path, kept here as the baseline,
+against its bulk write path.
+
+Needs a local MySQL database with the projdata schema:
+
+    MYSQL_HOST=localhost MYSQL_USER=root MYSQL_PASSWORD= MYSQL_DB=projdata \
+        python -m benchmarks.persistence --articles 50 --comments 40
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime
+
+import aiomysql
+
+from Backend.model_registry import registry
+from extraction2 import EuronewsScraper
+from html_extraction import clean_text
+
+
+def make_articles(n_articles, n_comments, tag):
+    articles = []
+    for i in range(n_articles):
+        comments = [
+            {
+                "comment": f"benchmark comment {tag} {i} {j}",
+                "user_id": f"bench-{j}",
+                "username": f"Bench user {j}",
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            for j in range(n_comments)
+        ]
+        article_id = f"bench-{tag}-{i}"
+        articles.append({
+            "id": article_id,
+            "title": f"Benchmark article {i}",
+            "summary": "Benchmark summary",
+            "image": None,
+            "url": f"/bench/{article_id}",
+            "scraped_at": datetime.now().isoformat(),
+            "details_changed": True,
+            "comments": comments,
+            "all_comments": comments,
+            "comments_count": len(comments),
+            "state": {"url": f"/bench/{article_id}"},
+        })
+    return articles
+
+
+async def insert_article(conn, article):
+    """The scraper's original article write: one upsert and one commit per article."""
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            INSERT INTO articles (article_id, title, summary, image, scraped_at)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+            title = VALUES(title),
+            summary = VALUES(summary),
+            image = VALUES(image),
+            scraped_at = VALUES(scraped_at)
+            """,
+            (article["id"], article["title"], article["summary"], article["image"], article["scraped_at"]),
+        )
+        await conn.commit()
+        return cur.lastrowid
+
+
+async def insert_comments(conn, article_id, comments):
+    """The scraper's original comment write: one predict and one INSERT per comment, one commit."""
+    async with conn.cursor() as cur:
+        for comment in comments:
+            predictions = await asyncio.to_thread(registry.score, [comment["comment"]])
+            await cur.execute(
+                """
+                INSERT INTO comments (comment, username, user_id, timestamp, article_id, created_at, is_toxic)
+                VALUES (%s, %s, %s, %s, %s, NOW(), %s)
+                ON DUPLICATE KEY UPDATE
+                timestamp = VALUES(timestamp),
+                is_toxic = VALUES(is_toxic)
+                """,
+                (
+                    clean_text(comment["comment"]),
+                    clean_text(comment["username"]),
+                    comment["user_id"],
+                    comment["timestamp"],
+                    article_id,
+                    int(predictions[0] > 0.5),
+                ),
+            )
+        await conn.commit()
+
+
+async def per_row_path(scraper, articles):
+    """The original write path: one commit per article, one INSERT and one predict per comment."""
+    config = scraper.db_config
+    conn = await aiomysql.connect(host=config["host"], user=config["user"], password=config["password"],
+                                  db=config["db"])
+    try:
+        for article in articles:
+            id = await insert_article(conn, article)
+            await insert_comments(conn, id, article["comments"])
+    finally:
+        conn.close()
+
+
+async def bulk_path(scraper, articles):
+    await scraper.save_to_database(articles)
+    await scraper.close_pool()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=50)
+    parser.add_argument("--comments", type=int, default=40, help="comments per article")
+    args = parser.parse_args()
+
+    # Connection settings come from MYSQL_HOST / MYSQL_USER / MYSQL_PASSWORD / MYSQL_DB
+    scraper = EuronewsScraper()
+    rows = args.articles * (args.comments + 1)
+
+    for name, path in (("per-row", per_row_path), ("bulk", bulk_path)):
+        # Fresh texts for each path so neither is helped by the prediction cache
+        articles = make_articles(args.articles, args.comments, uuid.uuid4().hex[:8])
+        start = time.perf_counter()
+        await path(scraper, articles)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>8}: {rows} rows in {elapsed:.2f}s -> {rows / elapsed:,.0f} rows/sec")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,422 @@
+"""
+Offline benchmark suite for the Alertini backend.
+
+Starts the API (uvicorn, in a subprocess) against a throwaway SQLite database, or
+against DATABASE_URL when given. Euronews and Vuukle are replaced by the local fake
+server in benchmarks/fake_euronews.py. Measures:
+
+    comments_endpoint     POST /comments/ latency percentiles and throughput
+    bulk_scoring          POST /comments/bulk throughput with a streamed NDJSON body
+    positive_comments     GET /positive-comments latency as the comments table grows
+    websocket             notification delivery latency to connected clients
+    scraper               cold and incremental scraper cycle time against the fake site
+    db_inserts            comment insert rate through SQLAlchemy (plus the scraper's bulk
+                          path when MYSQL_HOST is set)
+
+Results are written to a JSON file; --compare prints the change against an earlier run:
+
+    python -m benchmarks.suite --output bench-new.json --compare bench-old.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import aiohttp
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def percentiles(values):
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None, "mean": None}
+    ordered = sorted(values)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": ordered[-1] * 1000,
+        "mean": sum(ordered) / len(ordered) * 1000,
+    }
+
+
+async def prepare_database():
+    """Create every table, plus the is_toxic column on databases created before models.py mapped it."""
+    from sqlalchemy import inspect, text
+
+    from Backend import models  # noqa: F401  (registers the tables)
+    from Backend.database import Base, engine
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        columns = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_columns("comments"))
+        if "is_toxic" not in {column["name"] for column in columns}:
+            await conn.execute(text("ALTER TABLE comments ADD COLUMN is_toxic BOOLEAN"))
+
+
+async def insert_comments(n, days=90, chunk_size=1000):
+    """Insert `n` synthetic comments spread over the last `days` days; returns rows/sec."""
+    from sqlalchemy import text
+
+    from Backend.database import async_session
+    from Backend.models import Article
+
+    async with async_session() as db:
+        article = Article(title=f"bench {uuid.uuid4().hex[:8]}", summary="", scraped_at=datetime.now())
+        db.add(article)
+        await db.commit()
+        article_id = article.id
+
+        now = datetime.now()
+        start = time.perf_counter()
+        for offset in range(0, n, chunk_size):
+            rows = [
+                {
+                    "comment": f"benchmark comment {offset + i}",
+                    "username": "bench",
+                    "user_id": f"bench-{i % 50}",
+                    "timestamp": now,
+                    "article_id": article_id,
+                    "created_at": now - timedelta(days=random.randrange(days), seconds=random.randrange(86400)),
+                    "is_toxic": random.random() < 0.2,
+                }
+                for i in range(min(chunk_size, n - offset))
+            ]
+            await db.execute(text(
+                "INSERT INTO comments (comment, username, user_id, timestamp, article_id, created_at, is_toxic) "
+                "VALUES (:comment, :username, :user_id, :timestamp, :article_id, :created_at, :is_toxic)"
+            ), rows)
+            await db.commit()
+        return n / (time.perf_counter() - start)
+
+
+async def rebuild_rollup():
+    from Backend.crud import rebuild_daily_counts
+    from Backend.database import async_session
+
+    async with async_session() as db:
+        await rebuild_daily_counts(db)
+
+
+def start_api(port, env):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "Backend.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    return process
+
+
+async def wait_ready(session, url, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{url}/ready") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError("API did not become ready")
+
+
+async def bench_comments_endpoint(session, url, requests, concurrency):
+    """Unique texts, so every request reaches the model rather than the prediction cache."""
+    run = uuid.uuid4().hex[:8]
+    latencies = []
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            async with session.post(f"{url}/comments/", json={"content": f"you are so stupid {run} {i}"}) as response:
+                await response.read()
+                response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "requests_per_second": requests / elapsed,
+        "latency_ms": percentiles(latencies),
+    }
+
+
+async def bench_bulk_scoring(session, url, comments, batch_size=512):
+    """One streamed NDJSON request of unique texts; counts the result lines as they come back."""
+    run = uuid.uuid4().hex[:8]
+
+    async def body():
+        for start in range(0, comments, 1000):
+            yield "".join(
+                json.dumps({"id": i, "content": f"you are so stupid {run} bulk {i}"}) + "\n"
+                for i in range(start, min(start + 1000, comments))
+            ).encode()
+
+    start = time.perf_counter()
+    first_result = None
+    results = 0
+    async with session.post(f"{url}/comments/bulk?batch_size={batch_size}", data=body(),
+                            headers={"Content-Type": "application/x-ndjson"}) as response:
+        response.raise_for_status()
+        async for line in response.content:
+            if line.strip():
+                results += 1
+                if first_result is None:
+                    first_result = time.perf_counter() - start
+    elapsed = time.perf_counter() - start
+    if results != comments:
+        raise RuntimeError(f"Bulk scoring returned {results} results for {comments} comments")
+    return {
+        "comments": comments,
+        "batch_size": batch_size,
+        "comments_per_second": comments / elapsed,
+        "first_result_ms": first_result * 1000,
+    }
+
+
+async def bench_positive_comments(session, url, sizes, requests, inserted):
+    """`sizes` are total comment counts; `inserted` is how many the table already holds."""
+    results = []
+    for size in sizes:
+        await insert_comments(size - inserted)
+        inserted = size
+        await rebuild_rollup()
+        latencies = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            async with session.get(f"{url}/positive-comments") as response:
+                await response.read()
+            latencies.append(time.perf_counter() - start)
+        results.append({"comments": size, "latency_ms": percentiles(latencies)})
+    return results
+
+
+async def bench_websocket(url, clients, messages):
+    from benchmarks.websocket_fanout import client, writer_headers
+
+    uri = url.replace("http", "ws", 1) + "/ws/notifications/"
+    latencies = []
+    connected = asyncio.Semaphore(0)
+    tasks = [asyncio.create_task(client(uri, messages, latencies, connected)) for _ in range(clients)]
+    for _ in range(clients):
+        await connected.acquire()
+
+    run = time.time()
+    async with aiohttp.ClientSession() as session:
+        for i in range(messages):
+            event = {"comment": f"suite {run} {i}", "user_id": "suite", "timestamp": str(i)}
+            async with session.post(f"{url}/events/comments", json=[event], headers=writer_headers()) as response:
+                response.raise_for_status()
+            await asyncio.sleep(0.05)
+    try:
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=60)
+    except asyncio.TimeoutError:
+        for task in tasks:
+            task.cancel()
+    return {
+        "clients": clients,
+        "messages": messages,
+        "delivered": len(latencies),
+        "expected": clients * messages,
+        # The client measures in milliseconds already
+        "latency_ms": percentiles([latency / 1000 for latency in latencies]),
+    }
+
+
+async def bench_scraper(pages, articles_per_page, comments_per_article, new_comments):
+    """
+    Cycle 1 sees every article for the first time; cycle 2 runs after `new_comments`
+    comments were added to each article. Without MYSQL_HOST the cycle stops after
+    scoring, since the scraper writes straight to MySQL.
+    """
+    from benchmarks.fake_euronews import FakeEuronews
+    from Backend.model_registry import registry
+    from extraction2 import EuronewsScraper
+
+    fake = FakeEuronews(pages, articles_per_page, comments_per_article)
+    site = await fake.start()
+    scraper = EuronewsScraper(
+        base_url=f"{site}/news/europe/france", site_url=site, comments_api_url=site,
+        notify_url=None, data_changed_url=None, requests_per_second=10000, per_host_concurrency=16,
+    )
+    with_database = bool(os.getenv("MYSQL_HOST"))
+    cycles = []
+    try:
+        async with scraper.make_session() as session:
+            for cycle in (1, 2):
+                scraper.cycle = cycle
+                scraper.cycle_stats = scraper.new_cycle_stats()
+                requests_before = fake.requests
+                start = time.perf_counter()
+                if with_database:
+                    await scraper.run_cycle(session, pages)
+                else:
+                    articles = []
+
+                    async def on_article(article):
+                        articles.append(article)
+
+                    await scraper.crawl(session, pages, on_article)
+                    texts = [c["comment"] or "" for a in articles for c in a["comments"]]
+                    if texts:
+                        await asyncio.to_thread(registry.score, texts)
+                    for article in articles:
+                        scraper.remember(article, None)
+                cycles.append({
+                    "cycle": cycle,
+                    "seconds": time.perf_counter() - start,
+                    "http_requests": fake.requests - requests_before,
+                    **scraper.cycle_stats,
+                })
+                fake.add_comments(new_comments)
+    finally:
+        await scraper.close_pool()
+        await fake.stop()
+    return {"database": with_database, "not_modified_responses": fake.not_modified, "cycles": cycles}
+
+
+async def bench_scraper_bulk_insert(articles, comments):
+    """The scraper's MySQL bulk write path (see benchmarks/persistence.py)."""
+    from benchmarks.persistence import bulk_path, make_articles
+    from extraction2 import EuronewsScraper
+
+    scraper = EuronewsScraper(notify_url=None, data_changed_url=None)
+    rows = articles * (comments + 1)
+    start = time.perf_counter()
+    await bulk_path(scraper, make_articles(articles, comments, uuid.uuid4().hex[:8]))
+    return rows / (time.perf_counter() - start)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def flatten(results, prefix=""):
+    """Numeric leaves keyed by their dotted path; list entries are keyed by index."""
+    flat = {}
+    items = results.items() if isinstance(results, dict) else enumerate(results)
+    for key, value in items:
+        path = f"{prefix}{key}"
+        if isinstance(value, (dict, list)):
+            flat.update(flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(old, new):
+    old_flat, new_flat = flatten(old["results"]), flatten(new["results"])
+    print(f"\n{'metric':<60} {'old':>12} {'new':>12} {'change':>8}")
+    for key, value in new_flat.items():
+        before = old_flat.get(key)
+        if before is None:
+            continue
+        change = f"{(value - before) / before * 100:+.1f}%" if before else ""
+        print(f"{key:<60} {before:>12.2f} {value:>12.2f} {change:>8}")
+
+
+async def run(args, database_url):
+    results = {}
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "DATABASE_ECHO": "0",
+        "POSITIVE_CACHE_TTL": "0",
+        "NOTIFY_POLL_INTERVAL": "0",
+        "INFERENCE_BACKEND": args.inference_backend,
+    }
+    os.environ.update({"DATABASE_URL": database_url, "DATABASE_ECHO": "0", "INFERENCE_BACKEND": args.inference_backend})
+
+    await prepare_database()
+    results["db_inserts"] = {"sqlalchemy_rows_per_second": await insert_comments(args.insert_rows)}
+    if os.getenv("MYSQL_HOST"):
+        results["db_inserts"]["scraper_bulk_rows_per_second"] = await bench_scraper_bulk_insert(50, 40)
+
+    print("scraper cycles...")
+    results["scraper"] = await bench_scraper(args.pages, args.articles_per_page, args.comments_per_article, 5)
+
+    api = start_api(args.port, env)
+    url = f"http://127.0.0.1:{args.port}"
+    try:
+        async with aiohttp.ClientSession() as session:
+            await wait_ready(session, url)
+            print("/comments/...")
+            results["comments_endpoint"] = await bench_comments_endpoint(session, url, args.requests, args.concurrency)
+            print("/comments/bulk...")
+            results["bulk_scoring"] = await bench_bulk_scoring(session, url, args.bulk_comments)
+            print("/positive-comments...")
+            sizes = [args.insert_rows + size for size in args.table_sizes]
+            results["positive_comments"] = await bench_positive_comments(
+                session, url, sizes, 50, args.insert_rows
+            )
+        print("websocket...")
+        results["websocket"] = await bench_websocket(url, args.ws_clients, args.ws_messages)
+    finally:
+        api.terminate()
+        api.wait(timeout=30)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="bench-results.json")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"),
+                        help="Defaults to a temporary SQLite database")
+    parser.add_argument("--inference-backend", default=os.getenv("INFERENCE_BACKEND", "numpy"))
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--bulk-comments", type=int, default=20000)
+    parser.add_argument("--insert-rows", type=int, default=10000)
+    parser.add_argument("--table-sizes", default="10000,100000", help="Extra comments for /positive-comments runs")
+    parser.add_argument("--pages", type=int, default=6)
+    parser.add_argument("--articles-per-page", type=int, default=20)
+    parser.add_argument("--comments-per-article", type=int, default=30)
+    parser.add_argument("--ws-clients", type=int, default=200)
+    parser.add_argument("--ws-messages", type=int, default=20)
+    args = parser.parse_args()
+    args.table_sizes = [int(size) for size in args.table_sizes.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite+aiosqlite:///{tmp}/bench.db"
+        started = datetime.now()
+        results = asyncio.run(run(args, database_url))
+
+    report = {
+        "commit": git_commit(),
+        "started_at": started.isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database": database_url.split("://")[0],
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        compare(json.loads(Path(args.compare).read_text()), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Parity and docs/sec of the fast TF-IDF transformer (Backend.tfidf) against the pickled
+sklearn TfidfVectorizer.
+
+    python -m benchmarks.tfidf_transform --csv comments_data.csv --column comment_text
+    python -m benchmarks.tfidf_transform --corpus artifacts/corpus --column comment_text
+    python -m benchmarks.tfidf_transform --synthetic 20000
+
+Every document is checked: same non-zero positions and values within --tolerance.
+Exits with status 1 on any mismatch.
+"""
+import argparse
+import pickle
+import random
+import sys
+import time
+
+import numpy as np
+
+from Backend.tfidf import TfidfArtifact, load_corpus_column
+
+EDGE_CASES = [
+    "",
+    "   ",
+    "a",
+    "!!!???",
+    "the and of to is",
+    "YOU ARE AN IDIOT!!!",
+    "idiot idiot idiot idiot",
+    "Ça c'est très bien, naïve café über straße",
+    "user_name_123 said: don't_do_that 42 4242",
+    "emoji 😀 mixed with words like stupid and great",
+    "tab\tseparated\nnew\r\nlines",
+    "x" * 5000,
+    " ".join(["hello world"] * 500),
+]
+
+
+def synthetic_corpus(terms, n, seed=0):
+    """Short comments mixing vocabulary terms, unknown words, casing and punctuation."""
+    rng = random.Random(seed)
+    noise = ["lol", "qwzx", "the", "and", "2024", "...", "!!", "a", "I", "u"]
+    docs = []
+    for _ in range(n):
+        words = []
+        for _ in range(rng.randint(1, 40)):
+            word = rng.choice(terms) if rng.random() < 0.6 else rng.choice(noise)
+            if rng.random() < 0.2:
+                word = word.upper()
+            words.append(word + rng.choice(["", "", ",", ".", "!", "?"]))
+        docs.append(" ".join(words))
+    return docs
+
+
+def load_texts(args, terms):
+    if args.csv:
+        import pandas as pd
+        return pd.read_csv(args.csv)[args.column].fillna("").astype(str).tolist()
+    if args.corpus:
+        return list(load_corpus_column(args.corpus, args.column))
+    return synthetic_corpus(terms, args.synthetic)
+
+
+def check_parity(expected, actual, tolerance):
+    """Return the number of rows whose sparsity pattern or values differ."""
+    expected.sort_indices()
+    mismatches = 0
+    for row in range(expected.shape[0]):
+        a, b = slice(expected.indptr[row], expected.indptr[row + 1]), slice(actual.indptr[row], actual.indptr[row + 1])
+        if not np.array_equal(expected.indices[a], actual.indices[b]) or not np.allclose(
+            expected.data[a], actual.data[b], rtol=0, atol=tolerance
+        ):
+            mismatches += 1
+    return mismatches
+
+
+def docs_per_second(transform, texts, batch_size, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for i in range(0, len(texts), batch_size):
+            transform(texts[i:i + batch_size])
+        best = min(best, time.perf_counter() - start)
+    return len(texts) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectorizer", default="tfidf_vectorizer.pkl")
+    parser.add_argument("--csv")
+    parser.add_argument("--corpus", help="Directory written by `python -m Backend.tfidf export-corpus`")
+    parser.add_argument("--column", default="comment_text")
+    parser.add_argument("--synthetic", type=int, default=20000, help="Documents to generate without --csv/--corpus")
+    parser.add_argument("--batch-sizes", default="1,64,1024")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=1e-12)
+    args = parser.parse_args()
+
+    with open(args.vectorizer, "rb") as f:
+        vectorizer = pickle.load(f)
+    fast = TfidfArtifact.from_vectorizer(vectorizer)
+    terms = sorted(fast.vocabulary, key=fast.vocabulary.get)
+    texts = EDGE_CASES + load_texts(args, terms)
+
+    mismatches = check_parity(vectorizer.transform(texts), fast.transform(texts), args.tolerance)
+    print(f"parity: {len(texts) - mismatches}/{len(texts)} documents identical (atol {args.tolerance})")
+
+    print(f"{'batch':>6} {'sklearn docs/s':>15} {'fast docs/s':>12} {'speedup':>8}")
+    for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+        sample = texts[:min(len(texts), max(2000, batch_size * 20))]
+        slow = docs_per_second(vectorizer.transform, sample, batch_size, args.repeat)
+        quick = docs_per_second(fast.transform, sample, batch_size, args.repeat)
+        print(f"{batch_size:>6} {slow:>15.0f} {quick:>12.0f} {quick / slow:>7.1f}x")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+WebSocket fan-out load test: connects many local clients to /ws/notifications/,
+publishes toxic comments through /events/comments and reports delivery latency.
+
+Start the API first (uvicorn Backend.main:app), raise the open file limit for
+thousands of clients (ulimit -n 65536), then:
+
+    python -m benchmarks.websocket_fanout --clients 2000 --messages 20
+
+Set NOTIFY_TOKEN to the API's writer token when it has one.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import aiohttp
+import websockets
+
+
+def writer_headers():
+    token = os.getenv("NOTIFY_TOKEN", "")
+    return {"X-Notify-Token": token} if token else {}
+
+
+async def client(uri, expected, latencies, connected):
+    async with websockets.connect(uri, max_queue=None) as websocket:
+        connected.release()
+        received = 0
+        while received < expected:
+            data = json.loads(await websocket.recv())
+            latencies.append(time.time() * 1000 - data["timestamp"])
+            received += 1
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between published messages")
+    args = parser.parse_args()
+
+    uri = args.url.replace("http", "ws", 1) + "/ws/notifications/"
+    latencies = []
+    connected = asyncio.Semaphore(0)
+    tasks = [
+        asyncio.create_task(client(uri, args.messages, latencies, connected))
+        for _ in range(args.clients)
+    ]
+    for _ in range(args.clients):
+        await connected.acquire()
+    print(f"{args.clients} clients connected")
+
+    run = time.time()
+    async with aiohttp.ClientSession() as session:
+        for i in range(args.messages):
+            event = {"comment": f"load test {run} {i}", "user_id": "load-test", "timestamp": str(i)}
+            async with session.post(f"{args.url}/events/comments", json=[event], headers=writer_headers()) as response:
+                response.raise_for_status()
+            await asyncio.sleep(args.interval)
+
+    try:
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=60)
+    except asyncio.TimeoutError:
+        print("Timed out waiting for every message")
+
+    expected = args.clients * args.messages
+    latencies.sort()
+
+    def pick(q):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else float("nan")
+
+    print(f"delivered {len(latencies)}/{expected} messages")
+    print(f"latency ms: p50={pick(0.5):.1f} p95={pick(0.95):.1f} p99={pick(0.99):.1f} max={pick(1.0):.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,284 +1,803 @@
 import asyncio
 import aiohttp
 import aiomysql
-from bs4 import BeautifulSoup
 from datetime import datetime
 import logging
-import re
-import pickle
-from tensorflow.keras.models import load_model
-from sklearn.feature_extraction.text import TfidfVectorizer
-import pandas as pd
+import os
+import random
+import time
+from urllib.parse import urlsplit
+from Backend import metrics
+from Backend.dedup import SeenComments, comment_fingerprint
+from html_extraction import HtmlExtractor, clean_text
+from Backend.model_registry import MODEL_WATCH_INTERVAL, registry
 
-df = pd.read_csv('comments_data.csv')
+# Returned by conditional requests when the server answers HTTP 304
+NOT_MODIFIED = object()
 
-# Load the TF-IDF vectorizer
-with open('tfidf_vectorizer.pkl', 'rb') as f:
-    loaded_vectorizer = pickle.load(f)
+# Site and comment API roots; the benchmark suite points them at a local fake server
+EURONEWS_URL = os.getenv("EURONEWS_URL", "https://www.euronews.com")
+VUUKLE_URL = os.getenv("VUUKLE_URL", "https://api.vuukle.com")
 
+# Serve the scraper's counters at http://<host>:<port>/metrics when set
+SCRAPER_METRICS_PORT = int(os.getenv("SCRAPER_METRICS_PORT", "0"))
+
+# Cycles an article's incremental state is kept after it left the listing pages
+SCRAPER_STATE_RETENTION_CYCLES = int(os.getenv("SCRAPER_STATE_RETENTION_CYCLES", "24"))
+
+# Responses worth retrying: rate limited or a transient server error
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """Token-bucket rate limiter: `rate` requests per second, bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
 
-loaded_model = load_model('toxic_comment_prediction_model.h5')
 class EuronewsScraper:
-    def __init__(self, base_url="https://www.euronews.com/news/europe/france"):
+    def __init__(self, base_url=f"{EURONEWS_URL}/news/europe/france", site_url=EURONEWS_URL, comments_api_url=VUUKLE_URL,
+                 article_workers=8, comment_workers=8, queue_size=64,
+                 per_host_concurrency=4, requests_per_second=10.0,
+                 max_retries=3, backoff_base=0.5, backoff_max=10.0,
+                 db_pool_size=4, batch_size=500, article_chunk_size=100, comment_chunk_size=500,
+                 notify_url=os.getenv("NOTIFY_URL", "http://127.0.0.1:8000/events/comments"),
+                 data_changed_url=os.getenv("DATA_CHANGED_URL", "http://127.0.0.1:8000/events/data-changed"),
+                 notify_token=os.getenv("NOTIFY_TOKEN", "")):
         self.base_url = base_url
+        self.site_url = site_url
+        self.comments_api_url = comments_api_url
+        # Newly saved toxic comments are pushed to the API's event endpoint
+        self.notify_url = notify_url
+        # ...and every committed batch is signalled so the API drops its cached responses
+        self.data_changed_url = data_changed_url
+        # Sent as X-Notify-Token when the API requires it (see Backend.auth)
+        self.notify_token = notify_token
+        self.session = None
+        # Crawl pipeline settings
+        self.article_workers = article_workers
+        self.comment_workers = comment_workers
+        self.queue_size = queue_size
+        self.per_host_concurrency = per_host_concurrency
+        self.requests_per_second = requests_per_second
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # host -> (semaphore, token bucket)
+        self.host_limits = {}
         self.logger = logging.getLogger(__name__)
+        # Listing and article pages are parsed off the event loop (see html_extraction)
+        self.html = HtmlExtractor()
         logging.basicConfig(
             level=logging.INFO,
             format="%(asctime)s - %(levelname)s - %(message)s"
         )
         self.db_config = {
-            "host": "localhost",
-            "user": "root",
-            "password": "",  # Ensure password security
-            "db": "projdata",
+            "host": os.getenv("MYSQL_HOST", "localhost"),
+            "user": os.getenv("MYSQL_USER", "root"),
+            "password": os.getenv("MYSQL_PASSWORD", ""),  # Ensure password security
+            "db": os.getenv("MYSQL_DB", "projdata"),
         }
+        # Bulk persistence settings: comments are scored and written once `batch_size`
+        # of them are buffered (or at the end of the cycle), in chunks committed one by one
+        self.db_pool = None
+        self.db_pool_size = db_pool_size
+        self.batch_size = batch_size
+        self.article_chunk_size = article_chunk_size
+        self.comment_chunk_size = comment_chunk_size
+        # Fingerprints of comments already stored, checked before scoring
+        self.seen_comments = SeenComments()
+        # Incremental scraping state, kept across cycles:
+        # listing page url -> {"etag", "last_modified", "urls"}
+        self.listing_state = {}
+        # article id -> {"url", "db_id", "etag", "last_modified", "comments_count",
+        #                "newest_created_at", "newest_keys", "idle_cycles", "next_check", "listed_cycle"}
+        self.article_state = {}
+        # Articles missing from the listing pages for this many cycles are forgotten
+        self.state_retention_cycles = SCRAPER_STATE_RETENTION_CYCLES
+        # Articles whose comments stay unchanged are re-checked less and less often,
+        # up to once every `max_comment_check_interval` cycles
+        self.max_comment_check_interval = 8
+        self.cycle = 0
+        self.cycle_stats = self.new_cycle_stats()
+        self.last_cycle_stats = None
 
-    async def create_connection(self):
-        """Create a connection to the MySQL database."""
-        try:
-            return await aiomysql.connect(
-                host=self.db_config["host"],
-                user=self.db_config["user"],
-                password=self.db_config["password"],
-                db=self.db_config["db"],
+    async def create_pool(self):
+        """Create (once) the connection pool used by the bulk write path."""
+        if self.db_pool is None:
+            try:
+                self.db_pool = await aiomysql.create_pool(
+                    host=self.db_config["host"],
+                    user=self.db_config["user"],
+                    password=self.db_config["password"],
+                    db=self.db_config["db"],
+                    minsize=1,
+                    maxsize=self.db_pool_size,
+                )
+            except Exception as e:
+                self.logger.error(f"Database connection error: {e}")
+                return None
+        return self.db_pool
+
+    async def close_pool(self):
+        if self.db_pool is not None:
+            self.db_pool.close()
+            await self.db_pool.wait_closed()
+            self.db_pool = None
+
+    def new_cycle_stats(self):
+        return {
+            "pages_fetched": 0,
+            "pages_not_modified": 0,
+            "articles_fetched": 0,
+            "articles_skipped": 0,
+            "comment_requests": 0,
+            "comments_not_modified": 0,
+            "comments_skipped": 0,
+            "new_comments": 0,
+            "duplicate_comments": 0,
+        }
+
+    def make_session(self):
+        """HTTP session with pooled keep-alive connections, shared by every cycle."""
+        connector = aiohttp.TCPConnector(
+            limit=self.per_host_concurrency * 4,
+            limit_per_host=self.per_host_concurrency,
+            keepalive_timeout=60,
+            ttl_dns_cache=300,
+        )
+        return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30, connect=10))
+
+    def host_limit(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.host_limits:
+            self.host_limits[host] = (
+                asyncio.Semaphore(self.per_host_concurrency),
+                TokenBucket(self.requests_per_second),
             )
-        except Exception as e:
-            self.logger.error(f"Database connection error: {e}")
-            return None
+        return self.host_limits[host]
+
+    def backoff(self, attempt):
+        """Exponential backoff with full jitter."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def request(self, session, url, headers=None, as_json=False):
+        """
+        GET a URL within the per-host concurrency and rate limits.
+
+        Connection errors, timeouts, 429 and 5xx responses are retried with jittered
+        backoff. Returns (status, headers, body); body is only read on HTTP 200.
+        """
+        semaphore, bucket = self.host_limit(url)
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            try:
+                async with semaphore:
+                    async with session.get(url, headers=headers) as response:
+                        if response.status == 200:
+                            body = await (response.json(content_type=None) if as_json else response.text())
+                            return response.status, response.headers, body
+                        if response.status not in RETRY_STATUSES or attempt == self.max_retries:
+                            return response.status, response.headers, None
+                        self.logger.warning(f"HTTP {response.status} for {url}, retrying")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.max_retries:
+                    raise
+                self.logger.warning(f"Error fetching {url}: {e!r}, retrying")
+            await asyncio.sleep(self.backoff(attempt))
+
+    def conditional_headers(self, state):
+        """Build If-None-Match / If-Modified-Since headers from a stored response."""
+        headers = {}
+        if state and state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state and state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+        return headers
+
+    async def fetch_page(self, session, url, state=None):
+        """
+        Fetch the content of a web page.
 
-    async def fetch_page(self, session, url):
-        """Fetch the content of a web page."""
+        When `state` holds validators from a previous response the request is
+        conditional, and NOT_MODIFIED is returned on HTTP 304.
+        """
+        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+        headers.update(self.conditional_headers(state))
         try:
-            async with session.get(url, headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }) as response:
-                if response.status == 200:
-                    return await response.text()
-                else:
-                    self.logger.warning(f"Failed to fetch {url}: HTTP {response.status}")
-                    return None
+            status, response_headers, html = await self.request(session, url, headers)
+            if status == 304:
+                return NOT_MODIFIED
+            if status == 200:
+                if state is not None:
+                    state["etag"] = response_headers.get("ETag")
+                    state["last_modified"] = response_headers.get("Last-Modified")
+                return html
+            else:
+                self.logger.warning(f"Failed to fetch {url}: HTTP {status}")
+                return None
         except Exception as e:
             self.logger.error(f"Error fetching {url}: {e}")
             return None
 
     def clean_text(self, text):
         """Clean and sanitize text."""
-        if not text:
-            return None
-    
-    # Remove <p> and </p> tags
-        text = re.sub(r'</?p>', '', text)
-    
-    # Normalize spaces
-        cleaned = re.sub(r'\s+', ' ', text).strip()
-    
-        return cleaned if cleaned else None
+        return clean_text(text)
 
     async def extract_article_urls(self, html):
         """Extract article URLs from a page."""
         try:
-            soup = BeautifulSoup(html, "html.parser")
-            urls = []
-            big_div = soup.find("div", class_="o-block-listing__content")
-            if big_div:
-                articles = big_div.find_all("article", class_="m-object")
-                for article in articles:
-                    article_id = article.get("data-nid", "")
-                    a = article.find("a", class_="m-object__title__link")
-                    if a and "href" in a.attrs:
-                        urls.append({
-                            "url": a["href"],
-                            "id": article_id
-                        })
-            return urls
+            return await self.html.article_urls(html)
         except Exception as e:
             self.logger.error(f"Error extracting article URLs: {e}")
             return []
 
-    async def fetch_comments(self, session, article_id, article_url):
-        """Fetch comments for an article."""
+    async def fetch_comments(self, session, article_id, article_url, state=None):
+        """
+        Fetch comments for an article.
+
+        With a `state` the request is conditional and NOT_MODIFIED is returned on
+        HTTP 304; the new validators are written to `state["pending"]` and only
+        become current once the comments are saved. Returns None when the comments
+        could not be fetched.
+        """
         comments_url = (
-            f"https://api.vuukle.com/api/v1/Comments/loadVuukle?apiKey=1feb6d34-f2ca-4219-bff0-28be03a6d8da"
+            f"{self.comments_api_url}/api/v1/Comments/loadVuukle?apiKey=1feb6d34-f2ca-4219-bff0-28be03a6d8da"
             f"&articleId={article_id}&globalRecommendation=false&host=euronews.com&start=0&uri={article_url}"
             f"&quizEnabled=false"
         )
+        self.cycle_stats["comment_requests"] += 1
         try:
-            async with session.get(comments_url) as response:
-                if response.status == 200:
-                    comments_data = await response.json()
-                    comments = [
-                        {
-                            "comment": self.clean_text(item.get("commentText", "")),
-                            "user_id": item.get("userId", ""),
-                            "username": self.clean_text(item.get("name", "")),
-                            "timestamp": item.get("createAt", "1970-01-01 00:00:00")
-                        }
-                        for item in comments_data.get("data", {}).get("comments", {}).get("items", [])
-                    ]
-                    return comments
-                else:
-                    self.logger.warning(f"Failed to fetch comments: HTTP {response.status}")
-                    return []
+            status, headers, comments_data = await self.request(
+                session, comments_url, self.conditional_headers(state), as_json=True
+            )
+            if status == 304:
+                self.cycle_stats["comments_not_modified"] += 1
+                return NOT_MODIFIED
+            if status == 200:
+                if state is not None:
+                    state["pending"] = {
+                        "etag": headers.get("ETag"),
+                        "last_modified": headers.get("Last-Modified"),
+                    }
+                comments = [
+                    {
+                        "comment": self.clean_text(item.get("commentText", "")),
+                        "user_id": item.get("userId", ""),
+                        "username": self.clean_text(item.get("name", "")),
+                        "timestamp": item.get("createAt", "1970-01-01 00:00:00")
+                    }
+                    for item in comments_data.get("data", {}).get("comments", {}).get("items", [])
+                ]
+                return comments
+            else:
+                self.logger.warning(f"Failed to fetch comments: HTTP {status}")
+                return None
         except Exception as e:
             self.logger.error(f"Error fetching comments for {article_url}: {e}")
-            return []
+            return None
 
     async def extract_article_details(self, session, article_url, article_id):
-        """Extract article details including title, summary, and comments."""
+        """Extract article details including title, summary and image."""
         try:
-            async with session.get(f"https://www.euronews.com{article_url}",
-                                   headers={'User-Agent': 'Mozilla/5.0'}) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    soup = BeautifulSoup(html, "html.parser")
-
-                    article = soup.find("article", class_="o-article-newsy")
-                    if not article:
-                        return None
-
-                    title_tag = article.find("h1", class_="c-article-redesign-title")
-                    title = self.clean_text(title_tag.text) if title_tag else "No Title"
-
-                    summary_tag = article.find("p", class_="c-article-summary")
-                    summary = self.clean_text(summary_tag.text) if summary_tag else None
-
-                    image_tag = article.find("img", class_="js-poster-img")
-                    image = image_tag['src'] if image_tag and 'src' in image_tag.attrs else None
-
-                    comments = await self.fetch_comments(session, article_id, article_url)
-
-                    return {
-                        "id": article_id,
-                        "title": title,
-                        "summary": summary,
-                        "image": image,
-                        "url": f"https://www.euronews.com{article_url}",
-                        "comments": comments,
-                        "comments_count": len(comments),
-                        "scraped_at": datetime.now().isoformat()
-                    }
-                else:
-                    self.logger.warning(f"Failed to fetch article: HTTP {response.status}")
+            status, _, html = await self.request(session, f"{self.site_url}{article_url}",
+                                                 headers={'User-Agent': 'Mozilla/5.0'})
+            if status == 200:
+                details = await self.html.article_details(html)
+                if details is None:
                     return None
+
+                self.cycle_stats["articles_fetched"] += 1
+                metrics.SCRAPED_ARTICLES.inc()
+                return {
+                    "id": article_id,
+                    **details,
+                    "url": f"{self.site_url}{article_url}",
+                    "scraped_at": datetime.now().isoformat()
+                }
+            else:
+                self.logger.warning(f"Failed to fetch article: HTTP {status}")
+                return None
         except Exception as e:
             self.logger.error(f"Error scraping {article_url}: {e}")
             return None
 
-    async def scrape_articles(self, num_pages=1):
-        """Scrape articles from the Euronews website."""
-        async with aiohttp.ClientSession() as session:
-            articles = []
-            for page in range(1, num_pages + 1):
-                page_url = f"{self.base_url}?p={page}"
-
-                html = await self.fetch_page(session, page_url)
-                if not html:
-                    continue
+    def comment_key(self, comment):
+        return (comment["timestamp"], comment["user_id"], comment["comment"])
+
+    def select_new_comments(self, state, comments):
+        """Keep only the comments newer than the newest one already saved for this article."""
+        if not state or not state.get("newest_created_at"):
+            return comments
+        newest = state["newest_created_at"]
+        newest_keys = state.get("newest_keys", set())
+        return [
+            c for c in comments
+            if str(c["timestamp"]) > newest
+            or (str(c["timestamp"]) == newest and self.comment_key(c) not in newest_keys)
+        ]
+
+    async def prepare_article(self, session, entry):
+        """
+        Article stage: fetch the article page of new or changed listing entries.
+
+        Returns the (article, state) pair for the comment stage, or None when the
+        article can be skipped this cycle.
+        """
+        article_id, article_url = entry["id"], entry["url"]
+        state = self.article_state.get(article_id)
+        if state is not None:
+            state["listed_cycle"] = self.cycle
+
+        if state is None or state["url"] != article_url:
+            article = await self.extract_article_details(session, article_url, article_id)
+            if article is None:
+                return None
+            article["details_changed"] = True
+            state = {"url": article_url, "listed_cycle": self.cycle}
+        else:
+            self.cycle_stats["articles_skipped"] += 1
+            if self.cycle < state.get("next_check", 0):
+                # Comments have been quiet for a while: check them less often
+                self.cycle_stats["comments_skipped"] += 1
+                return None
+            article = {"id": article_id, "details_changed": False}
+        return article, state
+
+    async def collect_comments(self, session, article, state):
+        """
+        Comment stage: fetch the article's comments conditionally and keep the unseen ones.
+
+        Returns the article ready to be saved, or None when nothing changed.
+        """
+        comments = await self.fetch_comments(session, article["id"], state["url"], state)
+        if comments is None:
+            # Failed: keep the state as it was, so the next cycle fetches them again
+            return None
+        if comments is NOT_MODIFIED or (
+            not article["details_changed"] and len(comments) == state.get("comments_count")
+        ):
+            self.mark_idle(state)
+            return None
+
+        new_comments = self.select_new_comments(state, comments)
+        self.cycle_stats["new_comments"] += len(new_comments)
+        article["comments"] = new_comments
+        article["comments_count"] = len(comments)
+        article["state"] = state
+        article["all_comments"] = comments
+        if not new_comments and not article["details_changed"]:
+            self.remember(article, state.get("db_id"))
+            return None
+        return article
+
+    def mark_idle(self, state):
+        """Back off the comment check interval of an article whose comments did not change."""
+        state.update(state.pop("pending", {}))
+        state["idle_cycles"] = state.get("idle_cycles", 0) + 1
+        interval = min(2 ** (state["idle_cycles"] - 1), self.max_comment_check_interval)
+        state["next_check"] = self.cycle + interval
 
+    def remember(self, article, db_id):
+        """Record what has been saved for an article so the next cycle can skip it."""
+        state = article["state"]
+        state.update(state.pop("pending", {}))
+        state["db_id"] = db_id
+        state["comments_count"] = article["comments_count"]
+        state["idle_cycles"] = 0
+        state["next_check"] = self.cycle + 1
+        timestamps = [str(c["timestamp"]) for c in article["all_comments"]]
+        if timestamps:
+            newest = max(timestamps)
+            if newest != state.get("newest_created_at"):
+                state["newest_keys"] = set()
+            state["newest_created_at"] = newest
+            state["newest_keys"] |= {
+                self.comment_key(c) for c in article["all_comments"] if str(c["timestamp"]) == newest
+            }
+        self.article_state[article["id"]] = state
+
+    def forget_unlisted(self):
+        """Drop the state of articles that have not been on the listing pages for a while."""
+        cutoff = self.cycle - self.state_retention_cycles
+        expired = [id for id, state in self.article_state.items() if state.get("listed_cycle", 0) < cutoff]
+        for id in expired:
+            del self.article_state[id]
+        return len(expired)
+
+    async def produce_listings(self, session, num_pages, article_queue):
+        """Listing stage: read the listing pages and queue every article entry."""
+        page_urls = [f"{self.base_url}?p={page}" for page in range(1, num_pages + 1)]
+        # Pages no longer crawled (fewer pages, another section) are not kept
+        for page_url in set(self.listing_state) - set(page_urls):
+            del self.listing_state[page_url]
+
+        for page_url in page_urls:
+            listing = self.listing_state.setdefault(page_url, {})
+
+            html = await self.fetch_page(session, page_url, listing)
+            if html is NOT_MODIFIED:
+                self.cycle_stats["pages_not_modified"] += 1
+                metrics.SCRAPED_PAGES.inc(result="not_modified")
+                article_urls = listing.get("urls", [])
+            elif html:
+                self.cycle_stats["pages_fetched"] += 1
+                metrics.SCRAPED_PAGES.inc(result="fetched")
                 article_urls = await self.extract_article_urls(html)
+                listing["urls"] = article_urls
+            else:
+                continue
 
-                article_tasks = [
-                    self.extract_article_details(session, article['url'], article['id'])
-                    for article in article_urls
-                ]
-                page_articles = await asyncio.gather(*article_tasks, return_exceptions=True)
+            for entry in article_urls:
+                await article_queue.put(entry)
+
+    async def crawl(self, session, num_pages, on_article):
+        """
+        Run one crawl cycle as a pipeline.
 
-                for result in page_articles:
-                    if isinstance(result, dict):
-                        articles.append(result)
-                    elif isinstance(result, Exception):
-                        self.logger.error(f"Error in scraping task: {result}")
+        A listing producer feeds a pool of article workers, which feed a pool of
+        comment workers, through bounded queues. Every finished article is handed
+        to `on_article` as soon as it is ready, instead of at the end of the cycle.
+        """
+        article_queue = asyncio.Queue(self.queue_size)
+        comment_queue = asyncio.Queue(self.queue_size)
+        done_queue = asyncio.Queue(self.queue_size)
 
-            return articles
+        async def article_worker():
+            while (entry := await article_queue.get()) is not None:
+                try:
+                    job = await self.prepare_article(session, entry)
+                    if job:
+                        await comment_queue.put(job)
+                except Exception as e:
+                    self.logger.error(f"Error in article task {entry.get('url')}: {e}")
 
-    async def insert_article(self, conn, article):
+        async def comment_worker():
+            while (job := await comment_queue.get()) is not None:
+                try:
+                    article = await self.collect_comments(session, *job)
+                    if article:
+                        await done_queue.put(article)
+                except Exception as e:
+                    self.logger.error(f"Error in comment task {job[0]['id']}: {e}")
+
+        async def consumer():
+            while (article := await done_queue.get()) is not None:
+                try:
+                    await on_article(article)
+                except Exception as e:
+                    self.logger.error(f"Error handling article {article['id']}: {e}")
+
+        consumer_task = asyncio.create_task(consumer())
+        comment_tasks = [asyncio.create_task(comment_worker()) for _ in range(self.comment_workers)]
+        article_tasks = [asyncio.create_task(article_worker()) for _ in range(self.article_workers)]
+        try:
+            await self.produce_listings(session, num_pages, article_queue)
+            for _ in article_tasks:
+                await article_queue.put(None)
+            await asyncio.gather(*article_tasks)
+            for _ in comment_tasks:
+                await comment_queue.put(None)
+            await asyncio.gather(*comment_tasks)
+            await done_queue.put(None)
+            await consumer_task
+            self.forget_unlisted()
+        finally:
+            for task in [consumer_task, *comment_tasks, *article_tasks]:
+                task.cancel()
+
+    async def scrape_articles(self, num_pages=1):
+        """Scrape new and changed articles from the Euronews website."""
+        articles = []
+
+        async def collect(article):
+            articles.append(article)
+
+        async with self.make_session() as session:
+            await self.crawl(session, num_pages, collect)
+        return articles
+
+    async def bulk_upsert_articles(self, conn, articles):
+        """Upsert articles with multi-row INSERTs and return their database ids by article id."""
+        db_ids = {}
         async with conn.cursor() as cur:
-            try:
-                await cur.execute(
-                """
-                INSERT INTO articles (article_id, title, summary, image, scraped_at)
-                VALUES (%s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                title = VALUES(title),
-                summary = VALUES(summary),
-                image = VALUES(image),
-                scraped_at = VALUES(scraped_at);
-                """,
-                (article["id"], article["title"], article["summary"], article["image"], article["scraped_at"]),
-                )   
+            for chunk in chunked(articles, self.article_chunk_size):
+                await cur.executemany(
+                    """
+                    INSERT INTO articles (article_id, title, summary, image, scraped_at)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                    title = VALUES(title),
+                    summary = VALUES(summary),
+                    image = VALUES(image),
+                    scraped_at = VALUES(scraped_at)
+                    """,
+                    [(a["id"], a["title"], a["summary"], a["image"], a["scraped_at"]) for a in chunk],
+                )
                 await conn.commit()
-                return cur.lastrowid
-            except Exception as e:
-                self.logger.error(f"Error inserting article {article['id']}: {e}")
-            return None
 
-    async def insert_comments(self, conn, article_id, comments):
+                ids = [a["id"] for a in chunk]
+                await cur.execute(
+                    f"SELECT article_id, id FROM articles WHERE article_id IN ({', '.join(['%s'] * len(ids))})",
+                    ids,
+                )
+                for article_id, id in await cur.fetchall():
+                    db_ids[str(article_id)] = id
+        return db_ids
+
+    async def bulk_insert_comments(self, conn, rows):
+        """
+        Insert comment rows (fingerprint last) with multi-row INSERTs, committing once per chunk.
+
+        Rows whose fingerprint is already stored are left out, so the daily rollup only
+        counts new comments. Returns the fingerprints actually inserted.
+        """
+        inserted = set()
         async with conn.cursor() as cur:
-            for comment in comments:
-                
-                commentt = comment["comment"]
-                processed_comments = loaded_vectorizer.transform([commentt])
-
-    # Convert sparse matrix to dense array for Keras
-                processed_comments_dense = processed_comments.toarray()
-
-    # Make predictions asynchronously
-                predictions = await asyncio.to_thread(loaded_model.predict, processed_comments_dense)
-                predictions = (predictions > 0.5).astype(int)
-                print("aaaaaaaa ",bool(predictions))
-                ans = int(predictions[0][0])
-                
+            for chunk in chunked(rows, self.comment_chunk_size):
                 try:
-                    await cur.execute(
-                    """
-                    INSERT INTO comments (comment, username, user_id, timestamp, article_id, created_at, is_toxic)
-                    VALUES (%s, %s, %s, %s, %s, NOW(), %s)
-                    ON DUPLICATE KEY UPDATE 
-                    timestamp = VALUES(timestamp), 
-                    is_toxic = VALUES(is_toxic);
-                    """,
-                    (
-                        self.clean_text(comment["comment"]),
-                        self.clean_text(comment["username"]),
-                        comment["user_id"],
-                        comment["timestamp"],
-                        article_id,
-                        ans
-                    ),
+                    chunk = await self.insert_comment_chunk(cur, chunk)
+                except aiomysql.IntegrityError:
+                    # Another writer stored some of these fingerprints meanwhile: look them up again
+                    await conn.rollback()
+                    chunk = await self.insert_comment_chunk(cur, chunk)
+                await conn.commit()
+                inserted.update(row[-1] for row in chunk)
+        return inserted
+
+    async def insert_comment_chunk(self, cur, chunk):
+        """
+        Write the rows of `chunk` whose fingerprint is new, without committing; returns them.
+
+        Each fingerprint is added to comment_fingerprints in the same transaction as its
+        comment: its primary key keeps comments unique even when the comments table is
+        partitioned and its own fingerprint index is not unique.
+        """
+        fingerprints = [row[-1] for row in chunk]
+        await cur.execute(
+            f"SELECT fingerprint FROM comment_fingerprints WHERE fingerprint IN ({', '.join(['%s'] * len(fingerprints))})",
+            fingerprints,
+        )
+        stored = {fingerprint for (fingerprint,) in await cur.fetchall()}
+        chunk = [row for row in chunk if row[-1] not in stored]
+        if not chunk:
+            return chunk
+        await cur.executemany(
+            "INSERT INTO comment_fingerprints (fingerprint) VALUES (%s)", [(row[-1],) for row in chunk]
+        )
+        await cur.executemany(
+            """
+            INSERT INTO comments (comment, username, user_id, timestamp, article_id, created_at, is_toxic, model_version, fingerprint)
+            VALUES (%s, %s, %s, %s, %s, NOW(), %s, %s, %s)
+            ON DUPLICATE KEY UPDATE id = id
+            """,
+            chunk,
+        )
+        # Keep the daily rollup read by /positive-comments in step, in the same transaction
+        toxic = sum(row[5] for row in chunk)
+        await cur.execute(
+            """
+            INSERT INTO comment_daily_stats (day, non_toxic, toxic)
+            VALUES (CURDATE(), %s, %s)
+            ON DUPLICATE KEY UPDATE
+            non_toxic = non_toxic + VALUES(non_toxic),
+            toxic = toxic + VALUES(toxic)
+            """,
+            (len(chunk) - toxic, toxic),
+        )
+        return chunk
+
+    def unseen_comments(self, articles):
+        """(article, comment, fingerprint) of every comment not known to be stored already."""
+        comments, fingerprints = [], set()
+        for article in articles:
+            for comment in article["comments"]:
+                fingerprint = comment_fingerprint(
+                    article["db_id"], comment["user_id"], comment["timestamp"], comment["comment"]
                 )
-                except Exception as e:
-                    self.logger.error(f"Error inserting comment for article {article_id}: {e}")
-            await conn.commit()
+                if fingerprint in fingerprints or fingerprint in self.seen_comments:
+                    self.cycle_stats["duplicate_comments"] += 1
+                    continue
+                fingerprints.add(fingerprint)
+                comments.append((article, comment, fingerprint))
+        return comments
 
-    async def save_to_database(self, articles):
-        """Save all articles and their comments to the database."""
-        conn = await self.create_connection()
-        if conn is None:
+    async def save_batch(self, articles):
+        """
+        Bulk write path: upsert the articles, drop the comments already stored, score
+        the rest in one call, then write them with chunked multi-row INSERTs through the pool.
+        """
+        pool = await self.create_pool()
+        if pool is None:
             return
+
         try:
+            async with pool.acquire() as conn:
+                db_ids = await self.bulk_upsert_articles(conn, [a for a in articles if a["details_changed"]])
             for article in articles:
-                id = await self.insert_article(conn, article)
-                await self.insert_comments(conn, id, article["comments"])
-        finally:
-            conn.close()
+                article["db_id"] = db_ids.get(str(article["id"]), article["state"].get("db_id"))
+
+            comments = self.unseen_comments(articles)
+            scores, model_version = [], None
+            if comments:
+                scores, model_version = await asyncio.to_thread(
+                    registry.score_with_version, [comment["comment"] or "" for _, comment, _ in comments]
+                )
+
+            rows = [
+                (
+                    comment["comment"],
+                    comment["username"],
+                    comment["user_id"],
+                    comment["timestamp"],
+                    article["db_id"],
+                    int(score > 0.5),
+                    model_version,
+                    fingerprint,
+                )
+                for (article, comment, fingerprint), score in zip(comments, scores)
+            ]
+            async with pool.acquire() as conn:
+                inserted = await self.bulk_insert_comments(conn, rows)
+        except Exception as e:
+            # Nothing is remembered, so the next cycle picks these articles up again
+            self.logger.error(f"Error saving batch of {len(articles)} articles: {e}")
+            return
+
+        self.seen_comments.add_many(fingerprint for _, _, fingerprint in comments)
+        for article in articles:
+            self.remember(article, article["db_id"])
+        new = [
+            (article, comment, fingerprint, score)
+            for (article, comment, fingerprint), score in zip(comments, scores)
+            if fingerprint in inserted
+        ]
+        metrics.SCRAPED_COMMENTS.inc(len(new))
+        if new or any(article["details_changed"] for article in articles):
+            await self.signal_data_changed()
+        metrics.TOXIC_COMMENTS.inc(sum(1 for _, _, _, score in new if score > 0.5), source="scraper")
+
+        await self.publish_comments([
+            {
+                "comment": comment["comment"],
+                "username": comment["username"],
+                "user_id": comment["user_id"],
+                "article_id": article["db_id"],
+                "timestamp": str(comment["timestamp"]),
+                "is_toxic": True,
+                "fingerprint": fingerprint,
+            }
+            for article, comment, fingerprint, score in new
+            if score > 0.5 and comment["comment"]
+        ])
+
+    async def publish_comments(self, comments):
+        """Publish newly saved toxic comments to the API so notifications go out without polling."""
+        if not comments or not self.notify_url:
+            return
+        try:
+            if self.session is not None and not self.session.closed:
+                await self.post_comments(self.session, comments)
+            else:
+                async with aiohttp.ClientSession() as session:
+                    await self.post_comments(session, comments)
+        except Exception as e:
+            self.logger.warning(f"Could not publish {len(comments)} comments to {self.notify_url}: {e}")
+
+    async def signal_data_changed(self):
+        """Tell the API that articles or comments were committed, so cached pages are rebuilt."""
+        if not self.data_changed_url:
+            return
+        try:
+            if self.session is not None and not self.session.closed:
+                await self.post_data_changed(self.session)
+            else:
+                async with aiohttp.ClientSession() as session:
+                    await self.post_data_changed(session)
+        except Exception as e:
+            self.logger.warning(f"Could not signal saved batch to {self.data_changed_url}: {e}")
+
+    async def post_data_changed(self, session):
+        async with session.post(self.data_changed_url, headers=self.writer_headers(),
+                                timeout=aiohttp.ClientTimeout(total=5)) as response:
+            if response.status != 200:
+                self.logger.warning(f"Signalling saved batch failed: HTTP {response.status}")
+
+    def writer_headers(self):
+        return {"X-Notify-Token": self.notify_token} if self.notify_token else {}
+
+    async def post_comments(self, session, comments):
+        async with session.post(self.notify_url, json=comments, headers=self.writer_headers(),
+                                timeout=aiohttp.ClientTimeout(total=5)) as response:
+            if response.status != 200:
+                self.logger.warning(f"Publishing comments failed: HTTP {response.status}")
+
+    async def save_to_database(self, articles):
+        """Save all articles and their comments to the database."""
+        for chunk in chunked_by_comments(articles, self.batch_size):
+            await self.save_batch(chunk)
+
+    async def run_cycle(self, session, num_pages):
+        """Crawl once, saving articles in bulk batches as the pipeline finishes them."""
+        buffer = []
+
+        async def on_article(article):
+            buffer.append(article)
+            if sum(len(a["comments"]) for a in buffer) >= self.batch_size:
+                batch = buffer[:]
+                buffer.clear()
+                await self.save_batch(batch)
+
+        await self.crawl(session, num_pages, on_article)
+        if buffer:
+            await self.save_batch(buffer)
 
     async def continuous_scrape(self, interval=30, num_pages=6):
         """Continuously scrape the website at regular intervals."""
+        metrics_server = None
+        if SCRAPER_METRICS_PORT:
+            metrics_server = await metrics.serve(SCRAPER_METRICS_PORT)
+        # Pick up new model versions (models/CURRENT) without restarting the scraper
+        watcher = asyncio.create_task(registry.watch()) if MODEL_WATCH_INTERVAL > 0 else None
         try:
-            while True:
-                self.logger.info("Starting scraping cycle...")
-                articles = await self.scrape_articles(num_pages)
-                print(articles)
-                await self.save_to_database(articles)
-                self.logger.info("Scraping cycle completed. Waiting for next cycle...")
-                await asyncio.sleep(interval)
+            async with self.make_session() as session:
+                self.session = session
+                while True:
+                    self.logger.info("Starting scraping cycle...")
+                    self.cycle += 1
+                    self.cycle_stats = self.new_cycle_stats()
+                    await self.run_cycle(session, num_pages)
+                    self.last_cycle_stats = self.cycle_stats
+                    self.logger.info(f"Scraping cycle completed: {self.cycle_stats}. Waiting for next cycle...")
+                    await asyncio.sleep(interval)
         except asyncio.CancelledError:
             self.logger.info("Scraping stopped.")
+        finally:
+            await self.close_pool()
+            self.html.close()
+            if watcher is not None:
+                watcher.cancel()
+            if metrics_server is not None:
+                await metrics_server.cleanup()
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def chunked_by_comments(articles, size):
+    """Group articles so that each group holds about `size` comments."""
+    group, count = [], 0
+    for article in articles:
+        group.append(article)
+        count += len(article["comments"])
+        if count >= size:
+            yield group
+            group, count = [], 0
+    if group:
+        yield group
 
 async def main():
     """Main function to start scraping."""
     scraper = EuronewsScraper()
-    await scraper.continuous_scrape()
+    try:
+        await scraper.continuous_scrape()
+    finally:
+        # Stops the inference worker processes when INFERENCE_WORKERS is set
+        registry.close()
 
 
 if __name__ == "__main__":
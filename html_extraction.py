@@ -0,0 +1,110 @@
+"""
+HTML extraction for the Euronews scraper, kept out of the event loop.
+
+The parse functions are pure (html string in, plain dicts out) so they can run in a
+thread or in worker processes. Only the nodes the scraper reads are built: a
+SoupStrainer limits parsing to the listing block or the article element, and lxml
+is used when it is installed.
+"""
+import asyncio
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+    DEFAULT_PARSER = "lxml"
+except ImportError:
+    DEFAULT_PARSER = "html.parser"
+
+# BeautifulSoup tree builder ("lxml" or "html.parser")
+HTML_PARSER = os.getenv("HTML_PARSER", DEFAULT_PARSER)
+# Where parsing runs: "process" (HTML_PARSE_WORKERS processes), "thread" or "inline"
+HTML_PARSE_MODE = os.getenv("HTML_PARSE_MODE", "thread")
+HTML_PARSE_WORKERS = int(os.getenv("HTML_PARSE_WORKERS", str(os.cpu_count() or 1)))
+
+LISTING_ONLY = SoupStrainer("div", class_="o-block-listing__content")
+ARTICLE_ONLY = SoupStrainer("article", class_="o-article-newsy")
+
+
+def clean_text(text):
+    """Clean and sanitize text."""
+    if not text:
+        return None
+
+    # Remove <p> and </p> tags
+    text = re.sub(r'</?p>', '', text)
+
+    # Normalize spaces
+    cleaned = re.sub(r'\s+', ' ', text).strip()
+
+    return cleaned if cleaned else None
+
+
+def parse_article_urls(html, parser=HTML_PARSER):
+    """Article entries ({"url", "id"}) of a listing page."""
+    soup = BeautifulSoup(html, parser, parse_only=LISTING_ONLY)
+    urls = []
+    big_div = soup.find("div", class_="o-block-listing__content")
+    if big_div:
+        for article in big_div.find_all("article", class_="m-object"):
+            article_id = article.get("data-nid", "")
+            a = article.find("a", class_="m-object__title__link")
+            if a and "href" in a.attrs:
+                urls.append({"url": a["href"], "id": article_id})
+    return urls
+
+
+def parse_article_details(html, parser=HTML_PARSER):
+    """Title, summary and image of an article page, or None when it has no article element."""
+    soup = BeautifulSoup(html, parser, parse_only=ARTICLE_ONLY)
+    article = soup.find("article", class_="o-article-newsy")
+    if not article:
+        return None
+
+    title_tag = article.find("h1", class_="c-article-redesign-title")
+    summary_tag = article.find("p", class_="c-article-summary")
+    image_tag = article.find("img", class_="js-poster-img")
+    return {
+        "title": clean_text(title_tag.text) if title_tag else "No Title",
+        "summary": clean_text(summary_tag.text) if summary_tag else None,
+        "image": image_tag["src"] if image_tag and "src" in image_tag.attrs else None,
+    }
+
+
+class HtmlExtractor:
+    """Runs the parse functions inline, in a worker thread, or in a process pool."""
+
+    def __init__(self, mode=HTML_PARSE_MODE, workers=HTML_PARSE_WORKERS, parser=HTML_PARSER):
+        if mode not in ("process", "thread", "inline"):
+            raise ValueError(f"Unknown HTML parse mode: {mode}")
+        self.mode = mode
+        self.workers = workers
+        self.parser = parser
+        self._executor = None
+
+    async def run(self, fn, html):
+        if self.mode == "inline":
+            return fn(html, self.parser)
+        if self.mode == "thread":
+            return await asyncio.to_thread(fn, html, self.parser)
+        if self._executor is None:
+            # spawn, like the inference pool: never fork a process that may hold TensorFlow threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, html, self.parser)
+
+    async def article_urls(self, html):
+        return await self.run(parse_article_urls, html)
+
+    async def article_details(self, html):
+        return await self.run(parse_article_details, html)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,150 @@
+"""Comment fingerprints and the dedup migration, on SQLite."""
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from Backend.database import Base
+from Backend.dedup import (
+    FINGERPRINT_INDEX, FINGERPRINT_SCAN_INDEX, backfill_fingerprints, collapse_duplicates, comment_fingerprint,
+    create_fingerprint_index, create_scan_index, duplicates_rejected, register_fingerprints,
+)
+from Backend.models import Article, Comment, CommentFingerprint
+
+_insert_comment = text(
+    "INSERT INTO comments (comment, username, user_id, timestamp, article_id, created_at) "
+    "VALUES (:comment, 'someone', :user_id, :timestamp, 1, :timestamp)"
+)
+
+# Scraped createAt and the value a DATETIME column stores for it (MySQL rounds to the second)
+CREATED_AT = [
+    ("2024-01-02 03:04:05", datetime(2024, 1, 2, 3, 4, 5)),
+    ("2024-01-02T03:04:05", datetime(2024, 1, 2, 3, 4, 5)),
+    ("2024-01-02 03:04:05.499", datetime(2024, 1, 2, 3, 4, 5)),
+    ("2024-01-02 03:04:05.5", datetime(2024, 1, 2, 3, 4, 6)),
+    ("2024-01-02 03:04:05.999999", datetime(2024, 1, 2, 3, 4, 6)),
+    ("2024-12-31 23:59:59.7", datetime(2025, 1, 1, 0, 0, 0)),
+]
+
+
+@pytest.fixture
+def database(tmp_path):
+    """A comments table as it was before the migration: no unique fingerprint index."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'dedup.db'}")
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[Article.__table__, Comment.__table__])
+            await conn.execute(text(f"DROP INDEX {FINGERPRINT_INDEX}"))
+            await conn.execute(text("INSERT INTO articles (id, title) VALUES (1, 'Title')"))
+
+    asyncio.run(setup())
+    yield engine, sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+
+@pytest.mark.parametrize("raw, stored", CREATED_AT)
+def test_scraped_and_stored_created_at_give_the_same_fingerprint(raw, stored):
+    assert comment_fingerprint(1, "u1", raw, "Hello") == comment_fingerprint(1, "u1", stored, "Hello")
+
+
+def test_fingerprint_ignores_whitespace_and_case_only():
+    assert comment_fingerprint(1, "u1", "2024-01-02 03:04:05", "  Hello   World ") == \
+        comment_fingerprint(1, "u1", "2024-01-02 03:04:05", "hello world")
+    assert comment_fingerprint(1, "u1", "2024-01-02 03:04:05", "Hello") != \
+        comment_fingerprint(2, "u1", "2024-01-02 03:04:05", "Hello")
+
+
+def test_backfill_matches_the_scraper(database):
+    engine, session_factory = database
+
+    async def run():
+        async with session_factory() as db:
+            for i, (_, stored) in enumerate(CREATED_AT):
+                await db.execute(_insert_comment, {"comment": f"comment {i}", "user_id": "u1", "timestamp": stored})
+            await db.commit()
+        await backfill_fingerprints(session_factory, batch_size=2)
+        async with engine.connect() as conn:
+            return [row[0] for row in await conn.execute(text("SELECT fingerprint FROM comments ORDER BY id"))]
+
+    scraped = [comment_fingerprint(1, "u1", raw, f"comment {i}") for i, (raw, _) in enumerate(CREATED_AT)]
+    assert asyncio.run(run()) == scraped
+
+
+def test_migration_collapses_duplicates_and_rejects_new_ones(database):
+    engine, session_factory = database
+    stamp = datetime(2024, 1, 2, 3, 4, 5)
+
+    async def run():
+        async with session_factory() as db:
+            for i in range(30):
+                # 10 distinct comments, 3 copies each
+                await db.execute(_insert_comment, {"comment": f"comment {i % 10}", "user_id": "u1", "timestamp": stamp})
+            await db.commit()
+        await backfill_fingerprints(session_factory, batch_size=7)
+        await create_scan_index(engine)
+        deleted = await collapse_duplicates(session_factory, batch_size=3)
+        await create_fingerprint_index(engine)
+        async with engine.connect() as conn:
+            ids = [row[0] for row in await conn.execute(text("SELECT id FROM comments ORDER BY id"))]
+            rows = await conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))
+            indexes = {row[0] for row in rows}
+        async with session_factory() as db:
+            with pytest.raises(IntegrityError):
+                await db.execute(
+                    text("INSERT INTO comments (comment, fingerprint) VALUES ('comment 0', :fingerprint)"),
+                    {"fingerprint": comment_fingerprint(1, "u1", stamp, "comment 0")},
+                )
+        return deleted, ids, indexes
+
+    deleted, ids, indexes = asyncio.run(run())
+    assert deleted == 20
+    # The oldest copy of each comment is kept
+    assert ids == list(range(1, 11))
+    assert FINGERPRINT_INDEX in indexes and FINGERPRINT_SCAN_INDEX not in indexes
+
+
+def test_fingerprints_stay_unique_without_the_comments_index(database):
+    """What partitioning leaves: a non-unique index on comments, uniqueness in comment_fingerprints."""
+    engine, session_factory = database
+    stamp = datetime(2024, 1, 2, 3, 4, 5)
+
+    async def run():
+        async with session_factory() as db:
+            for i in range(5):
+                await db.execute(_insert_comment, {"comment": f"comment {i}", "user_id": "u1", "timestamp": stamp})
+            await db.commit()
+        await backfill_fingerprints(session_factory)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[CommentFingerprint.__table__])
+            await conn.execute(text(f"CREATE INDEX {FINGERPRINT_INDEX} ON comments (fingerprint)"))
+        added = await register_fingerprints(session_factory, batch_size=2)
+        again = await register_fingerprints(session_factory, batch_size=2)
+        async with session_factory() as db:
+            with pytest.raises(IntegrityError):
+                await db.execute(
+                    text("INSERT INTO comment_fingerprints (fingerprint) VALUES (:fingerprint)"),
+                    {"fingerprint": comment_fingerprint(1, "u1", stamp, "comment 3")},
+                )
+        rejected = await duplicates_rejected(engine)
+        async with engine.connect() as conn:
+            count = (await conn.execute(text("SELECT COUNT(*) FROM comment_fingerprints"))).scalar()
+        return added, again, rejected, count
+
+    # The check's probe is rolled back
+    assert asyncio.run(run()) == (5, 0, True, 5)
+
+
+def test_duplicates_rejected_detects_a_non_unique_table(database):
+    engine, _ = database
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE comment_fingerprints (fingerprint VARCHAR(64))"))
+        return await duplicates_rejected(engine)
+
+    assert asyncio.run(run()) is False
@@ -0,0 +1,72 @@
+"""The strained HTML parsers against the original full-document extraction."""
+import asyncio
+
+import pytest
+
+import html_extraction
+from benchmarks.fake_euronews import FakeEuronews
+from benchmarks.html_parsing import build_pages, reference
+from html_extraction import HtmlExtractor, parse_article_details, parse_article_urls
+
+PARSERS = ["html.parser"] + (["lxml"] if html_extraction.DEFAULT_PARSER == "lxml" else [])
+
+
+@pytest.fixture(scope="module")
+def pages():
+    """Listing and article pages from benchmarks/fixtures, padded outside the extracted nodes."""
+    return build_pages(10, filler_kb=20)
+
+
+@pytest.fixture(scope="module")
+def fake():
+    return FakeEuronews(pages=1, articles_per_page=20)
+
+
+def extract(kind, html, parser):
+    return parse_article_urls(html, parser) if kind == "listing" else parse_article_details(html, parser)
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_strained_parsers_match_full_soup(pages, parser):
+    for kind, html in pages:
+        assert extract(kind, html, parser) == reference(kind, html)
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_listing_entries(fake, parser):
+    ids = [fake.article_id(1, i) for i in range(20)]
+    items = [fake.listing_item.safe_substitute(fake.metadata(id)) for id in ids]
+    html = fake.listing.safe_substitute(articles="\n".join(items), next=2)
+    assert parse_article_urls(html, parser) == [{"url": fake.metadata(id)["url"], "id": id} for id in ids]
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_article_details(fake, parser):
+    metadata = fake.metadata(fake.article_id(1, 3))
+    details = parse_article_details(fake.article.safe_substitute(metadata), parser)
+    assert details["title"] == metadata["title"]
+    assert details["summary"] == metadata["summary"]
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_pages_without_the_extracted_nodes(parser):
+    assert parse_article_urls("<html><body></body></html>", parser) == []
+    assert parse_article_details("<html><body><p>No article here</p></body></html>", parser) is None
+    partial = '<article class="o-article-newsy"><p class="c-article-summary">  Only   a summary </p></article>'
+    assert parse_article_details(partial, parser) == {"title": "No Title", "summary": "Only a summary", "image": None}
+
+
+@pytest.mark.parametrize("mode", ["inline", "thread", "process"])
+def test_extractor_modes_match_full_soup(pages, mode):
+    extractor = HtmlExtractor(mode=mode, workers=1)
+
+    async def run():
+        return await asyncio.gather(*[
+            extractor.article_urls(html) if kind == "listing" else extractor.article_details(html)
+            for kind, html in pages
+        ])
+
+    try:
+        assert asyncio.run(run()) == [reference(kind, html) for kind, html in pages]
+    finally:
+        extractor.close()
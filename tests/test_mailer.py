@@ -0,0 +1,135 @@
+"""Digest batching and SMTP retries of the email dispatcher, against a local aiosmtpd sink."""
+import asyncio
+import email
+import logging
+import socket
+
+import pytest
+
+Controller = pytest.importorskip("aiosmtpd.controller").Controller
+
+from Backend.mailer import EmailDispatcher, SmtpConnection
+
+
+class Sink:
+    """Counts SMTP sessions and keeps every message; refuses the first `failures` with `reply`."""
+
+    def __init__(self, failures=0, reply="451 Try again later"):
+        self.sessions = 0
+        self.messages = []
+        self.failures = failures
+        self.reply = reply
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.failures:
+            self.failures -= 1
+            return self.reply
+        self.messages.append(envelope.content)
+        return "250 OK"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp():
+    """Start a sink and return a function building a dispatcher that sends to it."""
+    controllers = []
+
+    def serve(sink, **settings):
+        port = free_port()
+        controller = Controller(sink, hostname="127.0.0.1", port=port)
+        controller.start()
+        controllers.append(controller)
+        settings.setdefault("backoff_base", 0.01)
+        return EmailDispatcher(
+            SmtpConnection("127.0.0.1", port, user="", password="", starttls=False),
+            sender="alerts@localhost", recipient="admin@localhost", **settings,
+        )
+
+    yield serve
+    for controller in controllers:
+        controller.stop()
+
+
+def digest_body(message):
+    return email.message_from_bytes(message).get_payload()[0].get_payload(decode=True).decode("utf-8")
+
+
+def alerts(count):
+    return [{"comment": f"toxic comment <{i}>", "username": f"user {i}", "timestamp": str(i)} for i in range(count)]
+
+
+async def dispatch(dispatcher, batch):
+    """Queue every alert and wait until each one was sent, failed or dropped."""
+    dispatcher.start()
+    for alert in batch:
+        dispatcher.notify(alert)
+    while dispatcher.sent_alerts + dispatcher.failed_alerts + dispatcher.dropped < len(batch):
+        await asyncio.sleep(0.01)
+    await dispatcher.stop()
+    return dispatcher.stats()
+
+
+def test_alerts_are_sent_as_digests_over_one_session(smtp):
+    sink = Sink()
+    dispatcher = smtp(sink, window=5, max_comments=50)
+    stats = asyncio.run(dispatch(dispatcher, alerts(120)))
+
+    # Two full digests, then the rest flushed by stop() instead of waiting out the window
+    assert (stats["sent_emails"], stats["sent_alerts"], stats["retries"]) == (3, 120, 0)
+    assert sink.sessions == 1 and stats["connects"] == 1
+    bodies = [digest_body(message) for message in sink.messages]
+    assert [body.count("<li>") for body in bodies] == [50, 50, 20]
+    assert email.message_from_bytes(sink.messages[0])["Subject"] == "50 New Comment Notifications"
+    assert "toxic comment &lt;0&gt;" in bodies[0]
+
+
+def test_transient_errors_are_retried_on_a_new_session(smtp):
+    sink = Sink(failures=2)
+    dispatcher = smtp(sink, window=0.05, max_retries=3)
+    stats = asyncio.run(dispatch(dispatcher, alerts(3)))
+
+    assert (stats["sent_emails"], stats["sent_alerts"], stats["retries"], stats["failed_emails"]) == (1, 3, 2, 0)
+    assert len(sink.messages) == 1
+    assert stats["connects"] == 3
+
+
+def test_retries_give_up_after_max_retries(smtp):
+    sink = Sink(failures=10)
+    dispatcher = smtp(sink, window=0.05, max_retries=2)
+    stats = asyncio.run(dispatch(dispatcher, alerts(4)))
+
+    assert (stats["sent_emails"], stats["retries"], stats["failed_emails"], stats["failed_alerts"]) == (0, 2, 1, 4)
+    assert sink.messages == []
+
+
+def test_permanent_errors_are_not_retried(smtp):
+    sink = Sink(failures=1, reply="554 Rejected")
+    dispatcher = smtp(sink, window=0.05, max_retries=3)
+    stats = asyncio.run(dispatch(dispatcher, alerts(2)))
+
+    assert (stats["retries"], stats["failed_emails"], stats["failed_alerts"]) == (0, 1, 2)
+
+
+def test_alerts_are_dropped_without_addresses(caplog):
+    dispatcher = EmailDispatcher(SmtpConnection("127.0.0.1", free_port()), sender="", recipient="")
+
+    async def run():
+        dispatcher.start()
+        queued = [dispatcher.notify(alert) for alert in alerts(3)]
+        await dispatcher.stop()
+        return queued
+
+    with caplog.at_level(logging.WARNING, logger="Backend.mailer"):
+        assert asyncio.run(run()) == [False, False, False]
+    assert dispatcher.stats()["dropped"] == 3 and not dispatcher.stats()["enabled"]
+    assert [r.message for r in caplog.records].count('event=email_alerts_disabled reason="MAIL_FROM or MAIL_TO is not set"') == 1
@@ -0,0 +1,41 @@
+"""The NumPy scorer against the shipped Keras model."""
+import pickle
+import warnings
+
+import numpy as np
+import pytest
+
+from Backend.model_registry import MODEL_PATH, VECTORIZER_PATH
+from Backend.numpy_scorer import NumpyScorer
+from benchmarks.tfidf_transform import EDGE_CASES, synthetic_corpus
+
+
+@pytest.fixture(scope="module")
+def features():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        with open(VECTORIZER_PATH, "rb") as f:
+            vectorizer = pickle.load(f)
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    return vectorizer.transform(EDGE_CASES + synthetic_corpus(terms, 500))
+
+
+def test_matches_keras(features):
+    keras = pytest.importorskip("tensorflow").keras
+    model = keras.models.load_model(MODEL_PATH)
+    expected = model.predict(features.toarray(), verbose=0)[:, 0]
+    actual = NumpyScorer.from_h5(MODEL_PATH).predict_proba(features)
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-5)
+
+
+def test_predict_keeps_the_keras_shape(features):
+    scorer = NumpyScorer.from_h5(MODEL_PATH)
+    predictions = scorer.predict(features)
+    assert predictions.shape == (features.shape[0], 1)
+    assert np.all((predictions >= 0) & (predictions <= 1))
+
+
+def test_rejects_wrong_feature_count():
+    scorer = NumpyScorer.from_h5(MODEL_PATH)
+    with pytest.raises(ValueError):
+        scorer.predict_proba(np.zeros((1, scorer.n_features + 1), dtype=np.float32))
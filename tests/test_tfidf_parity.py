@@ -0,0 +1,70 @@
+"""The fast TF-IDF transform (Backend.tfidf) against the shipped sklearn vectorizer."""
+import pickle
+import warnings
+
+import numpy as np
+import pytest
+
+from Backend.model_registry import VECTORIZER_PATH
+from Backend.tfidf import TfidfArtifact
+from benchmarks.tfidf_transform import EDGE_CASES, synthetic_corpus
+
+OUT_OF_VOCABULARY = [
+    "qwzx zzxq xqzw",
+    "supercalifragilisticexpialidocious",
+    "ЭТО ПРОСТО ТЕКСТ",
+    "这是一个测试",
+    "🙂🙃😀",
+]
+NON_ASCII = [
+    "Ça c'est très bien, naïve café über straße",
+    "İstanbul ĞÜŞÖÇ ıiIİ",
+    "ﬁne ﬂow — “quoted” ‘words’",
+    "café vs café",
+]
+
+
+@pytest.fixture(scope="module")
+def vectorizer():
+    with warnings.catch_warnings():
+        # The pickle was written by an older scikit-learn
+        warnings.simplefilter("ignore")
+        with open(VECTORIZER_PATH, "rb") as f:
+            return pickle.load(f)
+
+
+@pytest.fixture(scope="module")
+def fast(vectorizer):
+    return TfidfArtifact.from_vectorizer(vectorizer)
+
+
+def assert_same_rows(expected, actual):
+    expected.sort_indices()
+    assert expected.shape == actual.shape
+    for row in range(expected.shape[0]):
+        a = slice(expected.indptr[row], expected.indptr[row + 1])
+        b = slice(actual.indptr[row], actual.indptr[row + 1])
+        np.testing.assert_array_equal(expected.indices[a], actual.indices[b], err_msg=f"row {row}")
+        np.testing.assert_allclose(expected.data[a], actual.data[b], rtol=0, atol=1e-12, err_msg=f"row {row}")
+
+
+@pytest.mark.parametrize("texts", [EDGE_CASES, OUT_OF_VOCABULARY, NON_ASCII], ids=["edge", "oov", "non_ascii"])
+def test_matches_sklearn(vectorizer, fast, texts):
+    assert_same_rows(vectorizer.transform(texts), fast.transform(texts))
+
+
+def test_matches_sklearn_on_synthetic_corpus(vectorizer, fast):
+    terms = sorted(fast.vocabulary, key=fast.vocabulary.get)
+    texts = synthetic_corpus(terms, 2000)
+    assert_same_rows(vectorizer.transform(texts), fast.transform(texts))
+
+
+def test_empty_and_unknown_texts_give_empty_rows(fast):
+    matrix = fast.transform(["", "   ", *OUT_OF_VOCABULARY])
+    assert matrix.nnz == 0
+    assert matrix.shape == (2 + len(OUT_OF_VOCABULARY), fast.n_features)
+
+
+def test_empty_batch(fast):
+    # sklearn refuses an empty batch; the fast path returns an empty matrix
+    assert fast.transform([]).shape == (0, fast.n_features)